@@ -23,8 +23,12 @@ from src.unsafe.chat import run_server, run_client
 from src.installer import check_files
 from src.helpers import (
     is_i2p_encryption_enabled, argon_protect, find_keys_by_alias,
-    clear_screen, set_terminal_title,
+    clear_screen, set_terminal_title, get_prewarm_settings,
+    is_tunnel_sharing_enabled, get_socket_settings, get_inbound_limits,
 )
+from src.sam import configure_sockets
+from src.gate import configure_rate_limit
+from src.sessions import start_prewarmer, stop_prewarmer, close_shared_session
 
 
 SETTINGS_FILE = "./settings.ini"
@@ -230,10 +234,17 @@ def main():
             for p in psutil.process_iter(['name'])
         )
         encryption = is_i2p_encryption_enabled()
+        configure_sockets(*get_socket_settings())
+        configure_rate_limit(*get_inbound_limits())
 
         render_header()
         render_status_bar(i2pd_running, encryption)
 
+        # Build tunnels for the next room while the user is in the menus
+        if i2pd_running and encryption:
+            pool_size, idle_timeout = get_prewarm_settings()
+            start_prewarmer(pool_size, idle_timeout, warm_shared=is_tunnel_sharing_enabled())
+
         try:
             choice = main_menu()
         except KeyboardInterrupt:
@@ -262,6 +273,8 @@ def main():
 
         elif choice == "quit":
             render_info("Shutting down Argon Client...")
+            stop_prewarmer()
+            close_shared_session()
             time.sleep(0.3)
             sys.exit(0)
 
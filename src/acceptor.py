@@ -0,0 +1,214 @@
+"""
+src/acceptor.py - Continuous inbound stream acceptor for hosted sessions
+
+Handles:
+  - Keeping `concurrency` STREAM ACCEPTs armed at all times and re-arming
+    each one as soon as a peer takes it: no timeout, no human in the loop
+  - STREAM FORWARD mode, where the bridge connects every inbound stream to a
+    local listening socket instead (re-armed if the bridge drops it)
+  - Handing each new stream, with the peer's DEST, to a callback running in
+    its own thread so a slow handshake never blocks the next accept; at most
+    `concurrency` callbacks run at once, the accepts wait for a free one
+"""
+
+import socket
+import threading
+
+from .sam import (
+    SamConnection, SamError, sam_hello, sam_stream_accept, sam_stream_forward,
+    parse_stream_header,
+)
+
+# ─── Acceptor parameters ──────────────────────────────────────────────────────
+ACCEPT_CONCURRENCY   = 2      # STREAM ACCEPTs kept armed / streams handshaking at once
+ACCEPT_RETRY_DELAY   = 2.0    # seconds before re-arming after an error, doubled each time
+ACCEPT_MAX_DELAY     = 60.0
+FORWARD_HEADER_WAIT  = 30.0   # seconds for the bridge's header line on a forwarded stream
+ACCEPT_MODES         = ("accept", "forward")
+
+
+class StreamAcceptor:
+    """
+    Accepts inbound streams of SAM session `nickname` until stop().
+    on_stream(conn, peer_dest) owns conn; on_error(exc) is told about
+    failures the acceptor is retrying.
+    """
+
+    def __init__(self, nickname: str, on_stream, concurrency: int = ACCEPT_CONCURRENCY,
+                 mode: str = "accept", on_error=None):
+        if mode not in ACCEPT_MODES:
+            raise ValueError(f"Unknown accept mode: {mode}")
+        self.nickname = nickname
+        self.on_stream = on_stream
+        self.on_error = on_error or (lambda error: None)
+        self.concurrency = max(1, concurrency)
+        self.mode = mode
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._open: set = set()       # sockets to close on stop()
+        self._slots = threading.BoundedSemaphore(self.concurrency)      # forwarded headers
+        self._handlers = threading.BoundedSemaphore(self.concurrency)   # on_stream calls
+
+    def set_handler(self, on_stream):
+        """Route the next streams elsewhere (e.g. once a 1:1 chat started)."""
+        self.on_stream = on_stream
+
+    def start(self):
+        if self.mode == "forward":
+            threading.Thread(target=self._forward_loop, name="sam-forward", daemon=True).start()
+        else:
+            for slot in range(self.concurrency):
+                threading.Thread(target=self._accept_loop, name=f"sam-accept-{slot}",
+                                 daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            pending, self._open = list(self._open), set()
+        for sock in pending:
+            _close_quietly(sock)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    # ── Bookkeeping ──────────────────────────────────────────────────────────
+
+    def _track(self, sock) -> bool:
+        with self._lock:
+            if self.stopped:
+                _close_quietly(sock)
+                return False
+            self._open.add(sock)
+            return True
+
+    def _untrack(self, sock):
+        with self._lock:
+            self._open.discard(sock)
+
+    def _failed(self, error: Exception, delay: float) -> float:
+        """Report, wait, and return the next delay (0 means stop)."""
+        if self.stopped:
+            return 0
+        self.on_error(error)
+        if self._stop.wait(delay):
+            return 0
+        return min(delay * 2, ACCEPT_MAX_DELAY)
+
+    def _dispatch(self, conn, line: str):
+        try:
+            header = parse_stream_header(line)
+        except SamError as e:
+            _close_quietly(conn)
+            self.on_error(e)
+            return
+
+        # Blocks the accept (or forwarded stream) until a handler is free
+        self._handlers.acquire()
+        if self.stopped:
+            self._handlers.release()
+            _close_quietly(conn)
+            return
+
+        def run():
+            try:
+                self.on_stream(conn, header.dest)
+            except Exception:
+                _close_quietly(conn)
+            finally:
+                self._handlers.release()
+
+        threading.Thread(target=run, name="sam-inbound", daemon=True).start()
+
+    # ── STREAM ACCEPT mode ───────────────────────────────────────────────────
+
+    def _accept_loop(self):
+        delay = ACCEPT_RETRY_DELAY
+        while not self.stopped:
+            conn = None
+            try:
+                conn = sam_hello()
+                if not self._track(conn):
+                    return
+                sam_stream_accept(conn, self.nickname, timeout=None)
+                # Blocks until someone connects, however long that takes
+                header = conn.read_line()
+                self._untrack(conn)
+                if not header:
+                    _close_quietly(conn)
+                    continue
+                delay = ACCEPT_RETRY_DELAY
+                self._dispatch(conn, header)
+            except Exception as e:
+                if conn is not None:
+                    self._untrack(conn)
+                    _close_quietly(conn)
+                delay = self._failed(e, delay)
+                if not delay:
+                    return
+
+    # ── STREAM FORWARD mode ──────────────────────────────────────────────────
+
+    def _forward_loop(self):
+        """Keep one forward armed; re-arm it if the bridge closes the control socket."""
+        delay = ACCEPT_RETRY_DELAY
+        while not self.stopped:
+            listener = control = None
+            try:
+                listener = socket.create_server(("127.0.0.1", 0))
+                if not self._track(listener):
+                    return   # stopped meanwhile; _track closed it
+                control = sam_hello()
+                if not self._track(control):
+                    return   # stop() closed the listener with the rest
+                sam_stream_forward(control, self.nickname, listener.getsockname()[1])
+                delay = ACCEPT_RETRY_DELAY
+                threading.Thread(target=self._forward_listen, args=(listener,),
+                                 name="sam-forward-listen", daemon=True).start()
+                # The forward lives as long as the control socket: wait for EOF
+                while control.recv(4096):
+                    pass
+                raise ConnectionError("SAM bridge dropped the STREAM FORWARD")
+            except Exception as e:
+                for sock in (listener, control):
+                    if sock is not None:
+                        self._untrack(sock)
+                        _close_quietly(sock)
+                delay = self._failed(e, delay)
+                if not delay:
+                    return
+
+    def _forward_listen(self, listener):
+        while not self.stopped:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            # Bound how many forwarded streams are still sending their header
+            self._slots.acquire()
+            threading.Thread(target=self._forward_header, args=(SamConnection(sock),),
+                             daemon=True).start()
+
+    def _forward_header(self, conn):
+        try:
+            conn.settimeout(FORWARD_HEADER_WAIT)
+            header = conn.read_line()
+            conn.settimeout(None)
+        except Exception:
+            header = None
+        try:
+            if not header or self.stopped:
+                _close_quietly(conn)
+                return
+            self._dispatch(conn, header)
+        finally:
+            # Held until a handler took the stream: waiting streams stay bounded too
+            self._slots.release()
+
+
+def _close_quietly(sock):
+    try:
+        sock.close()
+    except Exception:
+        pass
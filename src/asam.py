@@ -0,0 +1,308 @@
+"""
+src/asam.py - asyncio SAM v3 client for Argon Messenger
+
+Coroutine versions of the commands in src/sam.py. Every SAM connection is an
+asyncio StreamReader/StreamWriter pair, so one event loop can hold hundreds of
+control connections and data streams without a thread per socket.
+
+Once STREAM CONNECT/ACCEPT succeeds, the connection's reader/writer ARE the
+I2P stream; the StreamReader keeps any bytes received past the status line.
+With STREAM FORWARD the bridge dials a local asyncio server for each inbound
+stream instead, so one control connection serves any number of peers.
+
+Nothing in the client uses this module yet: the chat loop is threaded and
+runs on src/sam.py. The tests drive it against the emulator.
+"""
+
+import asyncio
+
+from . import sam
+from .sam import (
+    HELLO_CMD, SIGNATURE_TYPE, SESSION_OPTIONS, MAX_LINE_SIZE,
+    SamError, SamReply, parse_sam_reply, check_reply, dest_from_reply, parse_stream_header,
+)
+
+# ─── Framing (same wire format as ecchat) ─────────────────────────────────────
+FRAME_HEADER_SIZE = 4
+MAX_FRAME_SIZE    = 1_000_000
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Connection
+# ──────────────────────────────────────────────────────────────────────────────
+
+class AsyncSamConnection:
+    """A SAM socket driven by asyncio streams."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host: str | None = None, port: int | None = None):
+        """Connect to the SAM bridge (defaults to sam.SAM_HOST:sam.SAM_PORT)."""
+        reader, writer = await asyncio.open_connection(
+            host or sam.SAM_HOST, port or sam.SAM_PORT, limit=MAX_LINE_SIZE
+        )
+        return cls(reader, writer)
+
+    async def send_line(self, line: str):
+        self.writer.write((line + "\n").encode())
+        await self.writer.drain()
+
+    async def read_line(self) -> str | None:
+        """Next line without its newline, or None on EOF."""
+        try:
+            raw = await self.reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            raise SamError(f"SAM line exceeds {MAX_LINE_SIZE} bytes")
+        if not raw.endswith(b'\n'):
+            return None
+        return raw.rstrip(b'\r\n').decode()
+
+    async def read_reply(self) -> SamReply:
+        line = await self.read_line()
+        if line is None:
+            raise SamError("SAM bridge closed the connection")
+        return parse_sam_reply(line)
+
+    async def command(self, line: str) -> SamReply:
+        await self.send_line(line)
+        return await self.read_reply()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SAM commands
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def hello(host: str | None = None, port: int | None = None) -> AsyncSamConnection:
+    """Open a SAM connection and do the HELLO handshake"""
+    conn = await AsyncSamConnection.open(host, port)
+    try:
+        check_reply(await conn.command(HELLO_CMD), "HELLO", "REPLY", "SAM handshake")
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+async def dest_generate(conn: AsyncSamConnection) -> tuple[str, str]:
+    """Generate a new I2P DEST, returns (pub, priv)"""
+    return dest_from_reply(await conn.command(f"DEST GENERATE SIGNATURE_TYPE={SIGNATURE_TYPE}"))
+
+
+async def create_session(conn: AsyncSamConnection, nickname: str, privkey: str,
+                         options: str = ""):
+    """Create a STREAM session bound to this control connection"""
+    reply = await conn.command(
+        f"SESSION CREATE STYLE=STREAM ID={nickname} DESTINATION={privkey} "
+        f"{SESSION_OPTIONS} {options}".rstrip()
+    )
+    check_reply(reply, "SESSION", "STATUS", "SESSION CREATE")
+
+
+async def create_primary_session(conn: AsyncSamConnection, nickname: str, privkey: str,
+                                 options: str = ""):
+    """Create a SAM 3.3 PRIMARY session that subsessions can be added to"""
+    reply = await conn.command(
+        f"SESSION CREATE STYLE=PRIMARY ID={nickname} DESTINATION={privkey} "
+        f"{SESSION_OPTIONS} {options}".rstrip()
+    )
+    check_reply(reply, "SESSION", "STATUS", "SESSION CREATE PRIMARY")
+
+
+async def session_add(conn: AsyncSamConnection, sub_id: str, style: str = "STREAM",
+                      listen_port: int = 0, options: str = ""):
+    """Attach a subsession to the PRIMARY session owned by conn"""
+    cmd = f"SESSION ADD STYLE={style} ID={sub_id} FROM_PORT={listen_port} LISTEN_PORT={listen_port}"
+    if options:
+        cmd += " " + options
+    check_reply(await conn.command(cmd), "SESSION", "STATUS", "SESSION ADD")
+
+
+async def session_remove(conn: AsyncSamConnection, sub_id: str):
+    """Detach a subsession from its PRIMARY session"""
+    reply = await conn.command(f"SESSION REMOVE ID={sub_id}")
+    check_reply(reply, "SESSION", "STATUS", "SESSION REMOVE")
+
+
+async def naming_lookup(conn: AsyncSamConnection, name: str) -> str:
+    """Resolve a name (.i2p, .b32.i2p or ME) to a full base64 DEST"""
+    reply = await conn.command(f"NAMING LOOKUP NAME={name}")
+    check_reply(reply, "NAMING", "REPLY", "NAMING LOOKUP")
+    return reply.get("VALUE")
+
+
+async def stream_connect(nickname: str, dest_pub: str, to_port: int = 0,
+                         host: str | None = None, port: int | None = None) -> AsyncSamConnection:
+    """Open a new SAM connection and turn it into a stream to dest_pub"""
+    conn = await hello(host, port)
+    try:
+        cmd = f"STREAM CONNECT ID={nickname} DESTINATION={dest_pub}"
+        if to_port:
+            cmd += f" TO_PORT={to_port}"
+        reply = await conn.command(cmd)
+        check_reply(reply, "STREAM", "STATUS", "STREAM CONNECT")
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+async def stream_accept(nickname: str, host: str | None = None,
+                        port: int | None = None) -> tuple[AsyncSamConnection, str]:
+    """
+    Open a new SAM connection and wait for one inbound stream on it.
+    Returns (connection, peer_dest). The peer header line sent by the bridge
+    ('<dest> FROM_PORT=n TO_PORT=n') is consumed here.
+    """
+    conn = await hello(host, port)
+    try:
+        reply = await conn.command(f"STREAM ACCEPT ID={nickname}")
+        check_reply(reply, "STREAM", "STATUS", "STREAM ACCEPT")
+        line = await conn.read_line()
+        if not line:
+            raise SamError("STREAM ACCEPT closed before a peer connected")
+        header = parse_stream_header(line)
+    except BaseException:
+        await conn.close()
+        raise
+    return conn, header.dest
+
+
+async def stream_forward(nickname: str, forward_port: int, forward_host: str = "127.0.0.1",
+                         silent: bool = False, host: str | None = None,
+                         port: int | None = None) -> AsyncSamConnection:
+    """
+    Open a new SAM connection and have the bridge connect every inbound
+    stream of the session to forward_host:forward_port. The forward lasts
+    as long as the returned connection stays open.
+    """
+    conn = await hello(host, port)
+    try:
+        cmd = f"STREAM FORWARD ID={nickname} PORT={forward_port} HOST={forward_host}"
+        if silent:
+            cmd += " SILENT=true"
+        check_reply(await conn.command(cmd), "STREAM", "STATUS", "STREAM FORWARD")
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+class AsyncSamSession:
+    """
+    A STREAM session kept alive by its control connection.
+    Each connect()/accept()/forward() gets its own SAM connection on the
+    same session.
+    """
+
+    def __init__(self, control: AsyncSamConnection, nickname: str, pub: str,
+                 host: str | None = None, port: int | None = None):
+        self.control = control
+        self.nickname = nickname
+        self.pub = pub
+        self.host = host
+        self.port = port
+
+    @classmethod
+    async def create(cls, nickname: str, privkey: str | None = None,
+                     host: str | None = None, port: int | None = None, options: str = ""):
+        """
+        Create a session; a fresh DEST is generated when privkey is None.
+        For a given privkey, the bridge tells us the public DEST (NAMING
+        LOOKUP ME on the session's control connection). options are extra
+        i2cp options, e.g. a tunnel profile (src/tunnels.py).
+        """
+        control = await hello(host, port)
+        try:
+            pub = None
+            if privkey is None:
+                pub, privkey = await dest_generate(control)
+            await create_session(control, nickname, privkey, options)
+            if pub is None:
+                pub = await naming_lookup(control, "ME")
+        except BaseException:
+            await control.close()
+            raise
+        return cls(control, nickname, pub, host, port)
+
+    async def connect(self, dest_pub: str, to_port: int = 0) -> AsyncSamConnection:
+        return await stream_connect(self.nickname, dest_pub, to_port, self.host, self.port)
+
+    async def accept(self) -> tuple[AsyncSamConnection, str]:
+        return await stream_accept(self.nickname, self.host, self.port)
+
+    async def forward(self, on_stream) -> tuple[asyncio.AbstractServer, AsyncSamConnection]:
+        """
+        Serve every inbound stream with `await on_stream(conn, peer_dest)`,
+        through one STREAM FORWARD to a local server instead of an ACCEPT
+        per stream. Returns (server, forward connection): close both to stop.
+        """
+        async def handle(reader, writer):
+            conn = AsyncSamConnection(reader, writer)
+            try:
+                header = parse_stream_header(await conn.read_line() or "")
+            except SamError:
+                await conn.close()
+                return
+            await on_stream(conn, header.dest)
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, limit=MAX_LINE_SIZE)
+        try:
+            forward_port = server.sockets[0].getsockname()[1]
+            conn = await stream_forward(self.nickname, forward_port,
+                                        host=self.host, port=self.port)
+        except BaseException:
+            server.close()
+            raise
+        return server, conn
+
+    async def close(self):
+        """Closing the control connection tears the session down."""
+        await self.control.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Framed messages over an established stream
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def write_frame(conn: AsyncSamConnection, payload: bytes):
+    """Send [4 bytes BE length][payload]"""
+    conn.writer.write(len(payload).to_bytes(FRAME_HEADER_SIZE, 'big'))
+    conn.writer.write(payload)
+    await conn.writer.drain()
+
+
+async def read_frame(conn: AsyncSamConnection, max_size: int = MAX_FRAME_SIZE) -> bytes | None:
+    """Return one frame payload, or None when the stream is closed."""
+    try:
+        header = await conn.reader.readexactly(FRAME_HEADER_SIZE)
+        length = int.from_bytes(header, 'big')
+        if length > max_size:
+            # Skip the payload first, so the caller may keep reading the stream
+            while length:
+                length -= len(await conn.reader.readexactly(min(length, 64 * 1024)))
+            raise SamError(f"Frame of {int.from_bytes(header, 'big')} bytes exceeds limit ({max_size})")
+        return await conn.reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
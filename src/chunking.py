@@ -0,0 +1,112 @@
+"""
+src/chunking.py - Long messages split into independently sealed chunks
+
+Handles:
+  - Cutting a message's UTF-8 bytes into bounded chunks, each compressed
+    and encrypted on its own by the pipeline, so neither side ever holds a
+    whole ciphertext and no frame comes near MAX_FRAME_SIZE
+  - Reassembler: incremental reassembly on the receiving side. Each chunk
+    is decoded as it arrives, with a cap on the message size and on the
+    number of messages being assembled at once
+
+Wire format (body of a TEXT frame on CHANNEL_LONG_TEXT, src/frames.py):
+    [4 bytes BE message id][codec payload of one chunk]
+FLAG_MORE is set on every chunk but the last. Chunks of one message arrive
+in order (the ReliableChannel keeps order); chunks of different messages
+may interleave, hence the id.
+"""
+
+import codecs
+import struct
+from collections import OrderedDict
+
+# ─── Parameters ───────────────────────────────────────────────────────────────
+CHUNK_SIZE       = 16 * 1024           # message bytes per chunk, before compression
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024    # largest reassembled message we accept (UTF-8 bytes)
+MAX_ASSEMBLING   = 4                   # messages reassembled at once, oldest dropped past it
+_MESSAGE_ID      = struct.Struct('>I')
+CHUNK_HEADER     = _MESSAGE_ID.size
+
+
+class MessageTooLarge(Exception):
+    """A message over the size limit: refused before sending, or dropped while reassembling."""
+
+
+def split(data: bytes, size: int = CHUNK_SIZE):
+    """Yield (chunk, last) views over data, size bytes at a time."""
+    view = memoryview(data)
+    for start in range(0, len(data), size):
+        yield view[start:start + size], start + size >= len(data)
+
+
+def pack_chunk(message_id: int, payload: bytes) -> bytes:
+    return _MESSAGE_ID.pack(message_id & 0xFFFFFFFF) + payload
+
+
+def unpack_chunk(body) -> tuple[int, memoryview]:
+    """(message id, codec payload); ValueError on a truncated body."""
+    if len(body) < CHUNK_HEADER:
+        raise ValueError("Truncated chunk")
+    return _MESSAGE_ID.unpack_from(body)[0], memoryview(body)[CHUNK_HEADER:]
+
+
+class _Assembly:
+    __slots__ = ("decoder", "parts", "size")
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.parts: list[str] = []
+        self.size = 0
+
+
+class Reassembler:
+    """
+    Rebuilds chunked messages. feed() takes each decoded chunk (message
+    bytes after decryption and decompression) and returns the text once the
+    last chunk is in. The remaining chunks of a dropped message are ignored,
+    so a partial message is never delivered.
+    """
+
+    def __init__(self, max_size: int = MAX_MESSAGE_SIZE, max_assembling: int = MAX_ASSEMBLING):
+        self.max_size = max_size
+        self.max_assembling = max_assembling
+        self._assemblies: OrderedDict[int, _Assembly] = OrderedDict()
+        self._dropped: OrderedDict[int, None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._assemblies)
+
+    def feed(self, message_id: int, data: bytes, last: bool) -> str | None:
+        """
+        Add one chunk. Raises MessageTooLarge past max_size and
+        UnicodeDecodeError on invalid UTF-8; either way the message is dropped.
+        """
+        if message_id in self._dropped:
+            if last:
+                del self._dropped[message_id]
+            return None
+        assembly = self._assemblies.get(message_id)
+        if assembly is None:
+            assembly = self._assemblies[message_id] = _Assembly()
+            if len(self._assemblies) > self.max_assembling:
+                # A sender that never finished
+                self.discard(next(iter(self._assemblies)))
+        assembly.size += len(data)
+        try:
+            if assembly.size > self.max_size:
+                raise MessageTooLarge(f"Message exceeds {self.max_size} bytes")
+            assembly.parts.append(assembly.decoder.decode(data, final=last))
+        except Exception:
+            self.discard(message_id)
+            raise
+        if not last:
+            return None
+        del self._assemblies[message_id]
+        return "".join(assembly.parts)
+
+    def discard(self, message_id: int):
+        """Drop a message, and whatever chunks of it still arrive."""
+        self._assemblies.pop(message_id, None)
+        self._dropped[message_id] = None
+        while len(self._dropped) > self.max_assembling:
+            self._dropped.popitem(last=False)
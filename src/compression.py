@@ -0,0 +1,188 @@
+"""
+src/compression.py - Negotiated compression stage for chat payloads
+
+Handles:
+  - Compressing message bytes before the codec encrypts them, only above a
+    size threshold (short lines do not shrink, they only cost CPU)
+  - zlib from the standard library, and zstd when the optional `zstandard`
+    package is installed; each also with a preset dictionary of typical
+    chat text, which is what makes mid-sized messages compress at all
+  - Using only a method the peer listed in its session hello
+    (src/handshake.py), so it can always decode what we send; without one,
+    payloads go out and come in unchanged, prefix or not
+  - Per-session counters (messages and bytes before/after)
+
+Wire format of a packed payload:
+    uncompressed : the bytes unchanged (what older peers send and expect)
+    compressed   : COMPRESSED_PREFIX + [1 byte method] + compressed bytes
+    escaped      : COMPRESSED_PREFIX + METHOD_STORED + bytes that happened
+                   to start with COMPRESSED_PREFIX
+
+Compressing before encryption makes the ciphertext length depend on how
+redundant the text is; payloads under the threshold are never compressed.
+"""
+
+import zlib
+
+# ─── Wire constants ───────────────────────────────────────────────────────────
+COMPRESSED_PREFIX = b'\x00Z'                # never the start of typed text
+
+METHOD_STORED    = 0
+METHOD_ZLIB      = 1
+METHOD_ZLIB_DICT = 2
+METHOD_ZSTD      = 3
+METHOD_ZSTD_DICT = 4
+
+# Best first. The '1' in the dictionary names is CHAT_DICTIONARY's version:
+# a changed dictionary needs a new name, or peers would decode garbage.
+METHODS = {
+    "zstd-dict1": METHOD_ZSTD_DICT,
+    "zstd":       METHOD_ZSTD,
+    "zlib-dict1": METHOD_ZLIB_DICT,
+    "zlib":       METHOD_ZLIB,
+}
+
+# ─── Parameters ───────────────────────────────────────────────────────────────
+COMPRESS_THRESHOLD = 256          # bytes; smaller payloads are sent as they are
+ZLIB_LEVEL         = 6
+ZSTD_LEVEL         = 3
+MAX_DECOMPRESSED   = 4_000_000    # refuse anything inflating past this
+
+# Frequent chat fragments (English and French). zlib and zstd both match new
+# text against it, so even a few hundred bytes find back-references.
+CHAT_DICTIONARY = (
+    "https://www. http:// .com .org .i2p .b32.i2p ok okay yes no thanks thank you "
+    "please sorry hello hi hey bye see you later good morning good night "
+    "I think I don't know what do you mean I'm not sure can you send me the file "
+    "let me know when you are ready did you get my message the connection dropped "
+    "oui non merci bonjour salut bonsoir d'accord je ne sais pas je pense que "
+    "est-ce que tu peux m'envoyer le fichier c'est bon à plus tard "
+    "Traceback (most recent call last):\n  File \"\", line , in \nError: Exception: "
+    "def class return import from self None True False \n    \n        "
+    "the and that this with for are was have not but what all when there which "
+    "your they will would about been from them then than also into more some "
+    "les des une que qui dans pour pas sur est avec tout mais comme plus "
+).encode('utf-8')
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def available_methods() -> list[str]:
+    """Method names this process can encode and decode, best first."""
+    have_zstd = _zstd() is not None
+    return [name for name in METHODS if have_zstd or not name.startswith("zstd")]
+
+
+def is_compressed(data: bytes) -> bool:
+    return data[:len(COMPRESSED_PREFIX)] == COMPRESSED_PREFIX
+
+
+# ─── Codecs ───────────────────────────────────────────────────────────────────
+
+def _compress(method: int, data: bytes) -> bytes:
+    if method in (METHOD_ZLIB, METHOD_ZLIB_DICT):
+        kwargs = {"zdict": CHAT_DICTIONARY} if method == METHOD_ZLIB_DICT else {}
+        compressor = zlib.compressobj(ZLIB_LEVEL, **kwargs)
+        return compressor.compress(data) + compressor.flush()
+    zstandard = _zstd()
+    kwargs = {"dict_data": _zstd_dictionary(zstandard)} if method == METHOD_ZSTD_DICT else {}
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL, **kwargs).compress(data)
+
+
+def _decompress(method: int, data: bytes) -> bytes:
+    if method in (METHOD_ZLIB, METHOD_ZLIB_DICT):
+        kwargs = {"zdict": CHAT_DICTIONARY} if method == METHOD_ZLIB_DICT else {}
+        decompressor = zlib.decompressobj(**kwargs)
+        out = decompressor.decompress(data, MAX_DECOMPRESSED)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Decompressed payload exceeds {MAX_DECOMPRESSED} bytes")
+        return out
+    zstandard = _zstd()
+    if zstandard is None:
+        raise ValueError("zstd payload received but zstandard is not installed")
+    kwargs = {"dict_data": _zstd_dictionary(zstandard)} if method == METHOD_ZSTD_DICT else {}
+    return zstandard.ZstdDecompressor(**kwargs).decompress(data, max_output_size=MAX_DECOMPRESSED)
+
+
+_zstd_dict = None
+
+
+def _zstd_dictionary(zstandard):
+    global _zstd_dict
+    if _zstd_dict is None:
+        _zstd_dict = zstandard.ZstdCompressionDict(
+            CHAT_DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    return _zstd_dict
+
+
+# ─── Per-session stage ────────────────────────────────────────────────────────
+
+class Compressor:
+    """
+    The compression stage of one chat session.
+    Nothing is compressed until negotiate() finds a method the peer shares.
+    """
+
+    def __init__(self, methods: list[str] | None = None,
+                 threshold: int = COMPRESS_THRESHOLD):
+        allowed = available_methods()
+        self.methods = [m for m in allowed if methods is None or m in methods]
+        self.threshold = threshold
+        self.method: str | None = None     # agreed with the peer
+        self.stats = {
+            "sent": 0, "sent_compressed": 0, "sent_bytes": 0, "sent_wire_bytes": 0,
+            "received": 0, "received_compressed": 0,
+        }
+
+    def negotiate(self, method: str | None):
+        """Use method (agreed in the session hello), or stop compressing."""
+        self.method = method if method in self.methods else None
+
+    def pack(self, data: bytes) -> bytes:
+        self.stats["sent"] += 1
+        self.stats["sent_bytes"] += len(data)
+        packed = data
+        if self.method is not None and len(data) >= self.threshold:
+            method = METHODS[self.method]
+            compressed = COMPRESSED_PREFIX + bytes([method]) + _compress(method, data)
+            if len(compressed) < len(data):
+                packed = compressed
+                self.stats["sent_compressed"] += 1
+        if packed is data and self.method is not None and is_compressed(data):
+            packed = COMPRESSED_PREFIX + bytes([METHOD_STORED]) + data
+        self.stats["sent_wire_bytes"] += len(packed)
+        return packed
+
+    def unpack(self, payload: bytes) -> bytes:
+        """
+        Inverse of pack(); ValueError on a payload we cannot decode. Until a
+        method is agreed the peer sends plain bytes, whatever they start with.
+        """
+        self.stats["received"] += 1
+        if self.method is None or not is_compressed(payload):
+            return payload
+        header = len(COMPRESSED_PREFIX) + 1
+        if len(payload) < header:
+            raise ValueError("Truncated compressed payload")
+        method = payload[len(COMPRESSED_PREFIX)]
+        body = payload[header:]
+        if method == METHOD_STORED:
+            return bytes(body)
+        if method not in METHODS.values():
+            raise ValueError(f"Unknown compression method {method}")
+        self.stats["received_compressed"] += 1
+        return _decompress(method, body)
+
+    def summary(self) -> str:
+        s = self.stats
+        saved = s["sent_bytes"] - s["sent_wire_bytes"]
+        share = saved / s["sent_bytes"] if s["sent_bytes"] else 0.0
+        return (f"{self.method or 'none'}: {s['sent_compressed']}/{s['sent']} sent compressed, "
+                f"{saved} bytes saved ({share:.0%} of original), "
+                f"{s['received_compressed']}/{s['received']} received compressed")
@@ -0,0 +1,159 @@
+"""
+src/connector.py - Racing STREAM CONNECT with retry/backoff for Argon Messenger
+
+Handles:
+  - Retrying STREAM CONNECT with exponential backoff while the peer's
+    leaseSet is not found yet (typical right after the host publishes)
+  - Racing several attempts at once, each on its own SAM control connection:
+    one or more per destination, so several DESTs of the same contact (or a
+    second, staggered try at one DEST) compete
+  - Keeping the first stream that succeeds and cancelling the others by
+    closing their SAM connections
+  - Resolving .b32.i2p targets (cached NAMING LOOKUP, see src/resolver.py)
+    on the attempt's own SAM connection
+
+Errors that retrying cannot fix (bad session ID, malformed DEST) stop the
+attempt that hit them right away.
+"""
+
+import threading
+
+from .sam import SamError, sam_hello, sam_stream_connect, split_dest_port
+from .resolver import resolve
+
+# ─── Race parameters ──────────────────────────────────────────────────────────
+RACE_WIDTH       = 2      # concurrent attempts per destination
+RACE_STAGGER     = 3.0    # seconds between the start of two attempts at one DEST
+RETRY_BASE_DELAY = 2.0    # seconds, doubled after every failed attempt
+RETRY_MAX_DELAY  = 30.0
+MAX_ATTEMPTS     = 5      # per racing slot
+
+# SAM results worth another try: the leaseSet was not found or the peer was slow
+RETRYABLE_RESULTS = {"CANT_REACH_PEER", "TIMEOUT", "PEER_NOT_FOUND", "KEY_NOT_FOUND"}
+
+
+class ConnectRace:
+    """
+    Race STREAM CONNECT attempts from session `nickname` to `targets`
+    ('DEST' or 'DEST:PORT' strings, DEST may be a .b32.i2p address). run() returns (connection, target) of
+    the first stream that connected.
+    """
+
+    def __init__(self, nickname: str, targets: list[str], width: int = RACE_WIDTH,
+                 max_attempts: int = MAX_ATTEMPTS, stagger: float = RACE_STAGGER,
+                 on_attempt=None):
+        if not targets:
+            raise ValueError("No destination to connect to")
+        self.nickname = nickname
+        self.targets = list(targets)
+        self.width = max(1, width)
+        self.max_attempts = max(1, max_attempts)
+        self.stagger = stagger
+        self.on_attempt = on_attempt or (lambda index, attempt: None)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._inflight: set = set()
+        self._winner = None
+        self._errors: list[Exception] = []
+
+    def run(self, timeout: float | None = None):
+        workers = [
+            threading.Thread(target=self._slot, args=(index, slot),
+                             name=f"connect-{index}.{slot}", daemon=True)
+            for index in range(len(self.targets))
+            for slot in range(self.width)
+        ]
+        for worker in workers:
+            worker.start()
+        finished = threading.Thread(target=self._wait_all, args=(workers,), daemon=True)
+        finished.start()
+        self._done.wait(timeout)
+        self.cancel()
+        with self._lock:
+            if self._winner is not None:
+                return self._winner
+            errors = list(self._errors)
+        if not errors:
+            raise SamError("STREAM CONNECT timed out")
+        raise errors[-1]
+
+    def cancel(self):
+        """Stop every attempt still in flight (the winner is left alone)."""
+        self._done.set()
+        with self._lock:
+            losers = list(self._inflight)
+            self._inflight.clear()
+        for conn in losers:
+            _close_quietly(conn)
+
+    def _wait_all(self, workers):
+        for worker in workers:
+            worker.join()
+        self._done.set()
+
+    def _slot(self, index: int, slot: int):
+        dest, to_port = split_dest_port(self.targets[index])
+        # Later slots on the same DEST start staggered: a hedge, not a burst
+        if slot and self._done.wait(self.stagger * slot):
+            return
+        delay = RETRY_BASE_DELAY
+        for attempt in range(1, self.max_attempts + 1):
+            if self._done.is_set():
+                return
+            self.on_attempt(index, attempt)
+            try:
+                conn = sam_hello()
+            except Exception as e:
+                self._failed(e)
+            else:
+                with self._lock:
+                    if self._done.is_set():
+                        _close_quietly(conn)
+                        return
+                    self._inflight.add(conn)
+                try:
+                    sam_stream_connect(conn, self.nickname, resolve(dest, conn), to_port)
+                except Exception as e:
+                    with self._lock:
+                        self._inflight.discard(conn)
+                    _close_quietly(conn)
+                    if self._done.is_set():
+                        return
+                    self._failed(e)
+                    if isinstance(e, SamError) and e.result not in RETRYABLE_RESULTS:
+                        return
+                else:
+                    self._won(conn, index)
+                    return
+            if self._done.wait(delay):
+                return
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    def _failed(self, error: Exception):
+        with self._lock:
+            self._errors.append(error)
+
+    def _won(self, conn, index: int):
+        with self._lock:
+            self._inflight.discard(conn)
+            if self._winner is None and not self._done.is_set():
+                self._winner = (conn, self.targets[index])
+                conn = None
+        if conn is not None:
+            _close_quietly(conn)   # lost the race by a hair
+        self.cancel()
+
+
+def race_connect(nickname: str, targets: list[str], width: int = RACE_WIDTH,
+                 max_attempts: int = MAX_ATTEMPTS, timeout: float | None = None,
+                 on_attempt=None):
+    """Return (connection, target) for the first of targets to accept a stream."""
+    return ConnectRace(nickname, targets, width, max_attempts,
+                       on_attempt=on_attempt).run(timeout)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
@@ -0,0 +1,291 @@
+"""
+src/datagram.py - Low-latency SAM DATAGRAM transport for short chat frames
+
+Handles:
+  - A repliable DATAGRAM session whose inbound datagrams the bridge forwards
+    to a local UDP socket: no stream setup and no streaming window per message
+  - A light ack/retry layer: per-peer sequence numbers, retransmit with
+    exponential backoff, duplicate suppression
+  - Falling back to the stream for payloads too big for one datagram, or
+    when a datagram is never acknowledged. The stream copy keeps the
+    datagram's seq, so the receiver drops it if the datagram got through
+    after all (only its acks were lost)
+
+Each side learns the other's datagram DEST from an offer frame sent over the
+chat stream, so datagrams are only sent to a peer that is listening for them.
+Datagrams are delivered as they arrive: a lost one never holds up the
+messages behind it.
+
+Envelope inside each datagram:
+  [1 byte kind][8 bytes BE seq][body]
+    DATA : seq of this datagram, body = payload
+    ACK  : seq being acknowledged, no body
+Stream copy of an unacknowledged datagram:
+  RESENT_PREFIX + [8 bytes BE seq] + payload
+"""
+
+import random
+import socket
+import string
+import struct
+import threading
+import time
+
+from . import sam
+from .sam import (
+    sam_hello, sam_dest_generate, sam_create_datagram_session,
+    datagram_header, parse_forwarded_datagram,
+)
+
+# ─── Envelope ─────────────────────────────────────────────────────────────────
+KIND_DATA     = 0x01
+KIND_ACK      = 0x02
+_ENVELOPE     = struct.Struct('>BQ')
+_SEQ          = struct.Struct('>Q')
+OFFER_PREFIX  = b'\x00ARGON-DGRAM\x00'          # never the start of a PGP message
+RESENT_PREFIX = b'\x00ARGON-DGRAM-RESENT\x00'   # a datagram's stream copy
+
+# ─── Transport parameters ─────────────────────────────────────────────────────
+DATAGRAM_MAX_PAYLOAD = 8 * 1024   # bigger payloads go over the stream
+RETRY_TIMEOUT        = 3.0        # seconds before the first retransmit, doubled after
+RETRY_LIMIT          = 4          # sends before falling back to the stream
+DEDUP_WINDOW         = 1024       # out-of-order seqs remembered per peer
+UDP_RECV_SIZE        = 65535
+
+
+class DatagramSession:
+    """
+    A DATAGRAM session (own control socket + local UDP socket) shared by
+    every DatagramChannel of a chat or room. Inbound datagrams are routed to
+    the channel registered for their sender's DEST.
+    """
+
+    def __init__(self, conn, nickname: str, pub: str, udp: socket.socket):
+        self.conn = conn
+        self.nickname = nickname
+        self.pub = pub
+        self.udp = udp
+        self._routes: dict = {}   # peer DEST -> DatagramChannel
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    @classmethod
+    def create(cls, options: str = ""):
+        """
+        Generate a DEST, bind a local UDP socket and create the session
+        (options: extra i2cp options such as a tunnel profile).
+        """
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        conn = None
+        try:
+            udp.bind(("127.0.0.1", 0))
+            conn = sam_hello()
+            pub, priv = sam_dest_generate(conn)
+            nickname = "dgram_" + ''.join(random.choices(string.ascii_letters + string.digits, k=6))
+            sam_create_datagram_session(conn, nickname, priv, udp.getsockname()[1],
+                                        options=options)
+        except Exception:
+            udp.close()
+            if conn is not None:
+                conn.close()
+            raise
+        session = cls(conn, nickname, pub, udp)
+        threading.Thread(target=session._reader, name="dgram-rx", daemon=True).start()
+        return session
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def register(self, dest: str, channel):
+        with self._lock:
+            self._routes[dest] = channel
+
+    def unregister(self, dest: str, channel=None):
+        with self._lock:
+            if channel is None or self._routes.get(dest) is channel:
+                self._routes.pop(dest, None)
+
+    def send(self, dest: str, data: bytes):
+        self.udp.sendto(datagram_header(self.nickname, dest) + data,
+                        (sam.SAM_HOST, sam.SAM_UDP_PORT))
+
+    def _reader(self):
+        while not self.closed:
+            try:
+                packet, _ = self.udp.recvfrom(UDP_RECV_SIZE)
+            except OSError:
+                break
+            parsed = parse_forwarded_datagram(packet)
+            if parsed is None:
+                continue
+            sender, data = parsed
+            with self._lock:
+                channel = self._routes.get(sender)
+            if channel is not None:
+                channel._on_datagram(data)
+
+    def close(self):
+        """Closing the control socket destroys the SAM session."""
+        self._closed.set()
+        for sock in (self.conn, self.udp):
+            try:
+                sock.close()
+            except Exception:
+                pass
+
+
+class DatagramChannel:
+    """
+    The datagram path to one peer, next to its stream.
+
+    on_payload(bytes) gets every new DATA payload. fallback(bytes) is called
+    with the stream copy of payloads that were never acknowledged, for the
+    caller to send over the stream; the peer hands it to handle_resent().
+    send() returns False when the payload must take the stream instead (no
+    offer from the peer yet, or too big).
+    """
+
+    def __init__(self, session: DatagramSession, on_payload, fallback):
+        self.session = session
+        self.on_payload = on_payload
+        self.fallback = fallback
+        self.peer: str | None = None
+        self._next_seq = 1
+        self._pending: dict[int, list] = {}   # seq -> [payload, sends, deadline]
+        self._floor = 0                       # every seq <= floor was delivered
+        self._seen: set[int] = set()          # delivered seqs above floor
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._retry_thread: threading.Thread | None = None
+
+    # ── Offer exchange (over the stream) ─────────────────────────────────────
+
+    def offer(self) -> bytes:
+        """Frame to send over the stream so the peer can reach us."""
+        return OFFER_PREFIX + self.session.pub.encode()
+
+    def handle_offer(self, payload: bytes) -> bool:
+        """Consume the peer's offer; False if payload is not an offer."""
+        if not payload.startswith(OFFER_PREFIX):
+            return False
+        dest = payload[len(OFFER_PREFIX):].decode('ascii', 'replace')
+        if self.peer is not None:
+            self.session.unregister(self.peer, self)
+        self.peer = dest
+        self.session.register(dest, self)
+        return True
+
+    def handle_resent(self, payload: bytes) -> bool:
+        """
+        Consume the stream copy of a datagram, delivered unless the datagram
+        itself already was; False if payload is not one.
+        """
+        if not payload.startswith(RESENT_PREFIX):
+            return False
+        start = len(RESENT_PREFIX) + _SEQ.size
+        if len(payload) >= start and self._mark_seen(_SEQ.unpack_from(payload, len(RESENT_PREFIX))[0]):
+            try:
+                self.on_payload(payload[start:])
+            except Exception:
+                pass
+        return True
+
+    # ── Sending ──────────────────────────────────────────────────────────────
+
+    def send(self, payload: bytes) -> bool:
+        if (self.peer is None or self.closed or self.session.closed
+                or len(payload) > DATAGRAM_MAX_PAYLOAD):
+            return False
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending[seq] = [payload, 1, time.monotonic() + RETRY_TIMEOUT]
+            if self._retry_thread is None:
+                self._retry_thread = threading.Thread(target=self._retry_loop,
+                                                      name="dgram-retry", daemon=True)
+                self._retry_thread.start()
+            self._cond.notify_all()
+        self._transmit(KIND_DATA, seq, payload)
+        return True
+
+    def _transmit(self, kind: int, seq: int, body: bytes = b''):
+        try:
+            self.session.send(self.peer, _ENVELOPE.pack(kind, seq) + body)
+        except (OSError, TypeError):
+            pass   # counted as a lost datagram, the retry loop takes over
+
+    def _retry_loop(self):
+        while not self.closed:
+            resend, give_up = [], []
+            with self._cond:
+                now = time.monotonic()
+                for seq, entry in list(self._pending.items()):
+                    payload, sends, deadline = entry
+                    if deadline > now:
+                        continue
+                    if sends >= RETRY_LIMIT:
+                        del self._pending[seq]
+                        give_up.append(RESENT_PREFIX + _SEQ.pack(seq) + payload)
+                    else:
+                        entry[1] = sends + 1
+                        entry[2] = now + RETRY_TIMEOUT * (2 ** sends)
+                        resend.append((seq, payload))
+                wait = min((e[2] for e in self._pending.values()), default=None)
+            for seq, payload in resend:
+                self._transmit(KIND_DATA, seq, payload)
+            for payload in give_up:
+                try:
+                    self.fallback(payload)
+                except Exception:
+                    pass
+            with self._cond:
+                if not self.closed:
+                    self._cond.wait(None if wait is None else max(0.05, wait - time.monotonic()))
+
+    # ── Receiving ────────────────────────────────────────────────────────────
+
+    def _on_datagram(self, data: bytes):
+        if len(data) < _ENVELOPE.size or self.closed:
+            return
+        kind, seq = _ENVELOPE.unpack_from(data)
+        if kind == KIND_ACK:
+            with self._cond:
+                self._pending.pop(seq, None)
+            return
+        if kind != KIND_DATA:
+            return
+        # Ack every copy: the first ack may be the one that got lost
+        self._transmit(KIND_ACK, seq)
+        if self._mark_seen(seq):
+            try:
+                self.on_payload(data[_ENVELOPE.size:])
+            except Exception:
+                pass
+
+    def _mark_seen(self, seq: int) -> bool:
+        """Record seq; False if it was already delivered."""
+        with self._cond:
+            if seq <= self._floor or seq in self._seen:
+                return False
+            self._seen.add(seq)
+            while self._floor + 1 in self._seen:
+                self._floor += 1
+                self._seen.discard(self._floor)
+            if len(self._seen) > DEDUP_WINDOW:
+                # A datagram that never arrived: stop waiting for the gap
+                self._floor = max(self._seen) - DEDUP_WINDOW
+                self._seen = {s for s in self._seen if s > self._floor}
+            return True
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def close(self):
+        self._closed.set()
+        if self.peer is not None:
+            self.session.unregister(self.peer, self)
+        with self._cond:
+            self._pending.clear()
+            self._cond.notify_all()
@@ -1,5 +1,4 @@
 # src/chat.py
-import socket
 import threading
 import random
 import string
@@ -11,121 +10,32 @@ import os
 from pgpy import PGPKey, PGPMessage
 import datetime
 import sys
-import select
-from .helpers import clear_screen, set_terminal_title
-from .tui import render_dest_display, render_chat_header, render_success, render_info, render_error, console, wait_for_enter
-
-SAM_HOST = "127.0.0.1"
-SAM_PORT = 7656
+from .helpers import (
+    clear_screen, set_terminal_title, is_tunnel_sharing_enabled, get_transport_mode,
+    get_diagnostics_settings, get_accept_settings, get_heartbeat_interval, get_address_format,
+    is_armored_wire, get_compression_settings, is_frame_mac_enabled, get_symmetric_modes,
+)
+from .tui import render_dest_display, render_chat_header, render_link_title, render_success, render_info, render_error, render_timings, console, wait_for_enter
+
+from .sam import (
+    sam_hello, sam_dest_generate,
+    sam_create_session, b32_address,
+)
+from .sessions import take_warm_session, get_shared_session
+from .transport import SamBackend
+from .pipeline import MessagePipeline, PgpCodec
+from .sendqueue import SendQueueFull
+from .chunking import MessageTooLarge
+from .reliable import accept_resume
+from .metrics import start_flow, export_jsonl
+from .connector import RACE_WIDTH, MAX_ATTEMPTS
+from .tunnels import profile_names, default_profile, profile_options
 
 # ----------------- Helpers -----------------
 def generate_random_id(length=8):
     """generate a random ID per session"""
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
-def recv_line(sock):
-    """read a line that ends with \\n from the socket"""
-
-    data = b''
-    while True:
-        ch = sock.recv(1)
-        if not ch:
-            return None
-        data += ch
-        if ch == b'\n':
-            break
-    return data.decode()
-
-def send_line(sock, line):
-    """Send a line that ends with \n"""
-
-    sock.sendall((line + "\n").encode())
-
-# --- New helper: read exact N bytes (blocking until N read or EOF) ---
-def recv_exact(sock, n):
-    """read exactly n octets from socket, or none if EOF"""
-    buf = b''
-    while len(buf) < n:
-        chunk = sock.recv(n - len(buf))
-        if not chunk:
-            return None
-        buf += chunk
-    return buf
-
-# ----------------- SAM -----------------
-def sam_hello():
-    """The HELLO handshake"""
-    s = socket.create_connection((SAM_HOST, SAM_PORT))
-    send_line(s, "HELLO VERSION MIN=3.1 MAX=3.3")
-    resp = recv_line(s)
-    if not resp or "RESULT=OK" not in resp:
-        raise Exception("Handshake SAM failed : " + str(resp))
-    return s
-
-def sam_dest_generate(s):
-    """Generating the I2P DEST"""
-
-    send_line(s, "DEST GENERATE SIGNATURE_TYPE=7")
-    resp = b''
-    while True:
-        chunk = s.recv(1024)
-        if not chunk:
-            break
-        resp += chunk
-        if b'\n' in resp:
-            break
-    resp = resp.decode().strip()
-    pub = priv = None
-    for line in resp.split('\n'):
-        if line.startswith("DEST REPLY"):
-            parts = line.split()
-            for part in parts:
-                if part.startswith("PUB="):
-                    pub = part.split('=', 1)[1]
-                elif part.startswith("PRIV="):
-                    priv = part.split('=', 1)[1]
-    if not pub or not priv:
-        raise Exception(f"Invalid DEST GENERATE : {resp}")
-    return pub, priv
-
-def sam_create_session(s, nickname, privkey):
-    '''creating the I2P session'''
-
-    cmd = f"SESSION CREATE STYLE=STREAM ID={nickname} DESTINATION={privkey} i2cp.leaseSetEncType=4 SIGNATURE_TYPE=7"
-    send_line(s, cmd)
-    line = recv_line(s)
-    if not line.startswith("SESSION STATUS") or "RESULT=OK" not in line:
-        raise Exception("SESSION CREATE failed : " + str(line))
-
-def sam_stream_connect(s, nickname, dest_pub):
-    """Ask for A SAM connexion with the given DEST"""
-
-    send_line(s, f"STREAM CONNECT ID={nickname} DESTINATION={dest_pub}")
-    line = recv_line(s)
-    if not line.startswith("STREAM STATUS") or "RESULT=OK" not in line:
-        raise Exception("STREAM CONNECT failed: " + line)
-
-def sam_stream_accept(s, nickname, timeout=30):
-    """wait for an inbound connexion"""
-    send_line(s, f"STREAM ACCEPT ID={nickname}")
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            readable, _, _ = select.select([s], [], [], 1.0)
-            if s in readable:
-                line = recv_line(s)
-                if line and line.startswith("STREAM STATUS"):
-                    if "RESULT=OK" in line:
-                        print(Fore.GREEN + "[CONECTED & ENCRYPTED]" + Style.RESET_ALL)
-                        return True
-                    else:
-                        raise Exception(Fore.RED + "Failed STREAM ACCEPT: " + line)
-        except socket.timeout:
-            continue
-        except Exception as e:
-            raise e
-    raise Exception("Timeout: No inbound connexion after 30s")
-
 # ----------------- PGP -----------------
 def encrypt_message(msg, pubkey):
     """Return the armored ASCII string"""
@@ -137,13 +47,14 @@ def encrypt_message(msg, pubkey):
 
 def pgp_decrypt_message(private_key_obj, pgp_blob_bytes):
     """
-    Unencrypt Armored PGP (bytes)
+    Unencrypt PGP from the wire (binary packets or armored)
     private_key_obj: object PGPKey (unlocked) returned from decrypt_private_key.
-    pgp_blob_bytes: bytes of the armored message.
+    pgp_blob_bytes: bytes of the message.
     """
     try:
-        if isinstance(pgp_blob_bytes, bytes):
-            pgp_blob = pgp_blob_bytes.decode('utf-8', errors='ignore')
+        if isinstance(pgp_blob_bytes, (bytes, bytearray, memoryview)):
+            # Binary packets must not go through a text decode
+            pgp_blob = bytes(pgp_blob_bytes)
         else:
             pgp_blob = str(pgp_blob_bytes)
         msg_obj = PGPMessage.from_blob(pgp_blob)
@@ -157,30 +68,6 @@ def pgp_decrypt_message(private_key_obj, pgp_blob_bytes):
     except Exception as e:
         raise
 
-# ----------------- Binary framing protocol helpers -----------------
-def send_framed_message(sock, payload_bytes):
-    """
-    Send: [4 bytes BE length][payload_bytes]
-    This prevent TCP fragmentation bt specifing the number of bytes 
-    """
-    length = len(payload_bytes)
-    header = length.to_bytes(4, 'big')
-    sock.sendall(header + payload_bytes)
-
-def recv_framed_message(sock):
-    """
-    read the header 4 bytes,
-    return the bytes of the payload, or None if socket got closed.
-    """
-    hdr = recv_exact(sock, 4)
-    if hdr is None:
-        return None
-    length = int.from_bytes(hdr, 'big')
-    if length == 0:
-        return b''
-    data = recv_exact(sock, length)
-    return data
-
 # ----------------- Chat input with Ctrl+Q menu ─────────────────
 def _chat_input(prompt):
     """
@@ -275,102 +162,221 @@ def show_chat_menu():
 
 
 # ----------------- Chat -----------------
-def chat_session(sock, private_key_file, pubkey_remote):
-    render_info("Accessing encrypted PRIVKEY...")
+def _chat_loop(send_text, encrypted=True, link_stats=None):
+    """
+    Read lines from the user until Ctrl+C; send_text(msg) delivers each one.
+    link_stats() returns the heartbeat's LinkStats for the header, if any.
+    Returns when sending fails.
+    """
+    render_chat_header(encrypted, link_stats() if link_stats else None)
+    while True:
+        msg = _chat_input("\033[96mYou: \033[0m")
+
+        if msg is None:
+            # Ctrl+Q was pressed -> show action menu
+            action = show_chat_menu()
+            if action == "audio":
+                render_info("Audio message: not yet implemented")
+            elif action == "file":
+                render_info("File transfer: not yet implemented")
+            # "cancel" -> back to chat
+            continue
 
-    # Decrypt the private key once per session
-    try:
-        private_key = decrypt_private_key(private_key_file)
-        #If the Argon2 password is correct we can use the privatekey.
-        render_success("Private Key successfully unlocked")
-    except Exception as e:
-        render_error(f"Unable to decrypt PRIVATE KEY: {e}")
-        return
+        if not msg:
+            continue
+        try:
+            send_text(msg)
+        except SendQueueFull as e:
+            # The link is behind: this line is dropped, the chat goes on
+            print(Fore.YELLOW + f"\n[Message not sent, link too slow: {e}]" + Style.RESET_ALL)
+        except MessageTooLarge as e:
+            print(Fore.YELLOW + f"\n[Message not sent, too large: {e}]" + Style.RESET_ALL)
+        except Exception as e:
+            print(Fore.RED + f"\n[Unable to send message: {e}]" + Style.RESET_ALL)
+            break
 
-    # reception thread using the framing logic
-    def receive():
-        peer_connected = False
-        while True:
-            try:
-                length_bytes = sock.recv(4)
-                if not length_bytes or len(length_bytes) < 4:
-                    render_info("Connection closed by remote")
-                    break
-                length = int.from_bytes(length_bytes, "big")
-                if length <= 0 or length > 1_000_000:  # sanity check
-                    continue
-                payload = recv_exact(sock, length)
-                if not payload:
-                    render_info("Connection closed by remote")
-                    break
 
-                try:
-                    clear_text = pgp_decrypt_message(private_key, payload)
-                    timestamp = time.strftime("%H:%M:%S")
-                    print(Fore.MAGENTA + f"\r[{timestamp}] Remote: {clear_text}\n" + Fore.CYAN + "You: ", end='')
-                except Exception:
-                    # First failed decrypt = SAM handshake, show connected once
-                    if not peer_connected:
-                        peer_connected = True
-                        render_success("Peer connected")
-                    # Subsequent failed decrypts are silently ignored
-                    # (own messages echoed back, malformed data, etc.)
-
-            except (ConnectionResetError, ConnectionAbortedError, OSError):
+def run_chat(sock, codec, reconnect=None, resume=None, acceptor=None, tunnel_options=""):
+    """
+    Chat over an established stream with the shared message pipeline.
+    The codec decides the mode: PgpCodec (encrypted) or PlainCodec (unsafe).
+    Joining side: reconnect() re-dials after a drop.
+    Hosting side: resume is the (session_id, delivered) RESUME already read
+    from sock, and acceptor (a running StreamAcceptor) brings the peer's
+    later streams back into the same chat.
+    tunnel_options (a tunnel profile) also apply to the datagram session.
+    """
+    def on_message(text):
+        timestamp = time.strftime("%H:%M:%S")
+        print(Fore.MAGENTA + f"\r[{timestamp}] Remote: {text}\n" + Fore.CYAN + "You: ", end='')
+
+    peer_seen = threading.Event()
+
+    def on_state(state):
+        if state == "resumed":
+            if peer_seen.is_set():
+                render_success("Session resumed")
+            else:
+                peer_seen.set()
+                render_success("Peer connected")
+        elif state == "detached":
+            if acceptor is not None:
+                render_info("Connection lost, waiting for the peer to reconnect...")
+            else:
                 render_info("Connection lost")
-                break
-            except Exception as e:
-                print(Fore.RED + f"\n[Reception error: {e}]" + Style.RESET_ALL)
-                break
+                if reconnect is None:
+                    pipeline.close()
+        elif state == "dead":
+            render_info("Peer stopped responding (heartbeat), dropping the stream")
+        elif state == "reconnecting":
+            render_info("Reconnecting to peer...")
+        elif state == "lost":
+            render_error("Could not reconnect to peer, chat session ended")
+        elif state == "send_failed":
+            render_error(f"A queued message could not be sent: {pipeline.send_error}")
+        elif state == "negotiated":
+            render_info(f"Negotiated: {pipeline.negotiated.describe()}")
+        elif state == "message_too_large":
+            render_error("A message from the peer exceeded the size limit and was dropped")
+        elif state == "hello_rejected":
+            render_error("Peer hello rejected (bad signature or wrong session), keeping defaults")
+
+    def on_backpressure(active, depth):
+        if active:
+            render_info(f"Slow link: {depth} messages waiting to be sent")
+        else:
+            render_info("Queued messages sent")
 
-    threading.Thread(target=receive, daemon=True).start()
+    dgram_session = None
+    if get_transport_mode() == "datagram":
+        # Short messages skip the stream; unacked or big ones still use it
+        try:
+            from .datagram import DatagramSession
+            dgram_session = DatagramSession.create(tunnel_options)
+        except Exception as e:
+            render_info(f"Datagram transport unavailable, using streams only: {e}")
+
+    compressor = None
+    methods, threshold = get_compression_settings()
+    if methods != []:
+        from .compression import Compressor
+        compressor = Compressor(methods, threshold)
+
+    # Sequence numbers + acks: messages typed during a drop are resent on resume
+    session_id, peer_delivered = resume or (None, None)
+    pipeline = MessagePipeline(codec, on_message, on_state, reconnect, dgram_session,
+                               session_id=session_id, heartbeat=get_heartbeat_interval(),
+                               on_link=render_link_title, compressor=compressor,
+                               on_backpressure=on_backpressure, frame_mac=is_frame_mac_enabled(),
+                               symmetric_modes=get_symmetric_modes())
+    pipeline.attach(sock, peer_delivered)
+
+    if acceptor is not None:
+        def on_stream(conn, peer_dest):
+            again = accept_resume(conn)
+            if again is None or again[0] != pipeline.channel.session_id:
+                conn.close()   # someone else: this chat is 1:1
+                return
+            pipeline.channel.attach(conn, again[1])
+        acceptor.set_handler(on_stream)
 
-    render_chat_header(True)
     try:
-        while True:
-            msg = _chat_input("\033[96mYou: \033[0m")
-
-            if msg is None:
-                # Ctrl+Q was pressed -> show action menu
-                action = show_chat_menu()
-                if action == "audio":
-                    render_info("Audio message: not yet implemented")
-                elif action == "file":
-                    render_info("File transfer: not yet implemented")
-                # "cancel" -> back to chat
-                continue
-
-            if not msg:
-                continue
-            # Encrypt the message before sending
-            try:
-                armored = encrypt_message(msg, pubkey_remote)
-                if isinstance(armored, str):
-                    armored_bytes = armored.encode('utf-8')
-                else:
-                    armored_bytes = bytes(armored)
-
-                # Send framed message (4 bytes length + payload)
-                send_framed_message(sock, armored_bytes)
-            except Exception as e:
-                print(Fore.RED + f"\n[Unable to send message: {e}]" + Style.RESET_ALL)
-                break
+        _chat_loop(pipeline.send_text, codec.encrypted, pipeline.channel.link_stats)
+    except (KeyboardInterrupt, BrokenPipeError, OSError):
+        render_info("Chat session ended")
+    finally:
+        if acceptor is not None:
+            acceptor.stop()
+        pipeline.close()
+        if compressor is not None and compressor.stats["sent"]:
+            render_info(f"Compression {compressor.summary()}")
+        if get_diagnostics_settings()[0]:
+            render_info(f"Send queue: {pipeline.queue.summary()}")
+        if pipeline.session is not None and get_diagnostics_settings()[0]:
+            render_info(f"Session {pipeline.session.summary()}")
+        if pipeline.gate.dropped or get_diagnostics_settings()[0]:
+            render_info(f"Inbound frames: {pipeline.gate.summary()}")
+
+
+def room_session(room):
+    """Host side of a multi-peer room: everything typed is fanned out to all peers"""
+    def send(msg):
+        if room.peer_count() == 0:
+            render_info("No peer connected yet, message not sent")
+            return
+        room.broadcast(msg)
 
+    try:
+        _chat_loop(send)
     except (KeyboardInterrupt, BrokenPipeError, OSError):
         render_info("Chat session ended")
     finally:
-        try:
-            sock.close()
-        except:
-            pass
+        room.close()
+
+
+def _render_room_event(kind, label, text):
+    """Print Room events in the same style as the 1:1 receive thread"""
+    if kind == "message":
+        timestamp = time.strftime("%H:%M:%S")
+        print(Fore.MAGENTA + f"\r[{timestamp}] {label}: {text}\n" + Fore.CYAN + "You: ", end='')
+    elif kind == "join":
+        render_success(f"{label} joined the room")
+    elif kind == "resume":
+        render_success(f"{label} reconnected")
+    elif kind == "leave":
+        render_info(f"{label} {text}")
+    elif kind == "timeout":
+        render_info(f"{label} stopped responding, waiting for it to reconnect")
+    elif kind == "negotiated":
+        render_info(f"{label} negotiated: {text}")
+    else:
+        render_error(text)
 
-# ----------------- Room functions -----------------
+
+def _select_member_key(exclude):
+    """Pick one more public key from the keychain; returns a PGPKey or None"""
+    from InquirerPy import inquirer
+    from .tui import INQUIRER_STYLE
+    from .keychain import load_register, PUBLIC_DIR
+
+    choices = [
+        {"name": f"[{e['ID']}] {e['Alias'] or e['Filename']}", "value": e['Filename']}
+        for e in load_register()
+        if e["Type"] == "public" and e["Filename"] not in exclude
+    ]
+    if not choices:
+        render_info("No other public key in the keychain.")
+        return None, None
+    choices.append({"name": "<- Back", "value": None})
+    filename = inquirer.select(
+        message="Add member PUBLIC key",
+        choices=choices,
+        pointer=">",
+        qmark=">>",
+        style=INQUIRER_STYLE,
+    ).execute()
+    if filename is None:
+        return None, None
+    with open(os.path.join(PUBLIC_DIR, filename), 'r') as f:
+        return filename, PGPKey.from_blob(f.read())[0]
 
 # ----------------- Room functions -----------------
+def _finish_flow(timer):
+    """Show and/or export the phase timings of a connection flow (settings.ini)"""
+    show, metrics_file = get_diagnostics_settings()
+    if show:
+        render_timings(timer.flow, timer.spans)
+    if metrics_file:
+        try:
+            export_jsonl(metrics_file, timer.spans)
+        except OSError as e:
+            render_error(f"Unable to write metrics: {e}")
+
+
 def join_room(pubkey_remote_file, private_key_file):
     """Join an existing I2P Destination — invite-aware encrypted workflow"""
     from .invites import check_dynamic_invites, load_address_book
-    from .tui import text_prompt, INQUIRER_STYLE
+    from .tui import text_prompt, select_tunnel_profile, INQUIRER_STYLE
     from InquirerPy import inquirer
     from InquirerPy.separator import Separator
     import gc
@@ -391,18 +397,20 @@ def join_room(pubkey_remote_file, private_key_file):
             pubkey_remote = PGPKey.from_blob(f.read())[0]
 
         clear_screen()
+        timer = start_flow("join_room")
 
         # ── Step 1: decrypt private key once (needed for invite parsing)
         from .encrypt import decrypt_private_key
         render_info("Unlocking private key for invite verification...")
         try:
-            priv_key_obj = decrypt_private_key(private_path)
+            priv_key_obj = decrypt_private_key(private_path, timer)
         except Exception as e:
             render_error(f"Failed to unlock private key: {e}")
             return
 
         # ── Step 2: Scan dynamic invites ─────────────────────────────
-        dest_ba = check_dynamic_invites(priv_key_obj)
+        with timer.phase("invite_scan"):
+            dest_ba = check_dynamic_invites(priv_key_obj)
 
         # ── Step 3: Fallback menu if no dynamic invite was accepted ──
         if dest_ba is None:
@@ -439,28 +447,59 @@ def join_room(pubkey_remote_file, private_key_file):
                     return
 
         # ── Step 4: Connect using DEST from bytearray ─────────────────
+        # The DEST stays in the bytearray for the whole chat so a dropped
+        # stream can be re-dialled; it is wiped when the chat ends.
         try:
-            dest_str = dest_ba.decode("utf-8")
-
-            client_session_id = "client_" + generate_random_id(6)
-
-            s1 = sam_hello()
-            pub, priv = sam_dest_generate(s1)
-            sam_create_session(s1, client_session_id, priv)
-
-            s2 = sam_hello()
-            sam_stream_connect(s2, client_session_id, dest_str)
-
+            profile = select_tunnel_profile(profile_names(), default_profile())
+            tunnel_opts = profile_options(profile)
+            # Shared and pre-warmed tunnels were built with the configured profile
+            configured = profile == default_profile()
+
+            if configured and is_tunnel_sharing_enabled():
+                # Outbound streams of every room share the PRIMARY tunnels
+                with timer.phase("shared_subsession"):
+                    client_session_id = get_shared_session().client_subsession()
+            elif configured and (warm := take_warm_session()) is not None:
+                # Tunnels were built while the user was in the menus
+                client_session_id, s1 = warm.nickname, warm.conn
+            else:
+                client_session_id = "client_" + generate_random_id(6)
+
+                with timer.phase("sam_hello"):
+                    s1 = sam_hello()
+                with timer.phase("dest_generate"):
+                    _, priv = sam_dest_generate(s1)
+                with timer.phase("session_create", profile=profile):
+                    sam_create_session(s1, client_session_id, priv, tunnel_opts)
+
+            def on_attempt(index, attempt):
+                if attempt > 1:
+                    render_info(f"Peer not reachable yet, retrying ({attempt}/{MAX_ATTEMPTS})...")
+
+            # Retries while the host's leaseSet propagates; every DEST known
+            # for the contact (one per line) races in parallel.
+            backend = SamBackend(client_session_id, race_width=RACE_WIDTH,
+                                 max_attempts=MAX_ATTEMPTS, on_attempt=on_attempt)
+
+            # Bound to the bytearray itself: reconnects read it, the wipe below zeroes it
+            def connect(dest=dest_ba):
+                return backend.connect(dest.decode("utf-8"))
+
+            with timer.phase("stream_connect"):
+                s2 = connect()
             render_success("Connected! You can start chatting")
+            _finish_flow(timer)
+
+            # The key unlocked in step 1 is reused: no second Argon2 run
+            run_chat(s2, PgpCodec(priv_key_obj, pubkey_remote, is_armored_wire()), reconnect=connect,
+                     tunnel_options=tunnel_opts)
 
         finally:
             # Wipe DEST from memory regardless of what happens
             dest_ba[:] = b'\x00' * len(dest_ba)
-            del dest_ba, dest_str
+            del dest_ba
             gc.collect()
 
-        chat_session(s2, private_path, pubkey_remote)
-
     except Exception as e:
         render_error(f"Error joining room: {e}")
         import traceback
@@ -471,7 +510,8 @@ def create_room(private_key_file, pubkey_remote_file):
     """Create session and accept incoming users ==> encrypted workflow"""
     time.sleep(1)
     clear_screen()
-    
+    shared = None   # set when the room is a subsession of the shared PRIMARY session
+
     #looking for the private and public keys passed 
     try:
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -492,7 +532,7 @@ def create_room(private_key_file, pubkey_remote_file):
             pubkey_remote = PGPKey.from_blob(pubkey_remote_content)[0]
 
         from InquirerPy import inquirer
-        from .tui import INQUIRER_STYLE
+        from .tui import INQUIRER_STYLE, select_tunnel_profile
         from .encrypt import decrypt_private_key
         
         room_type = inquirer.select(
@@ -506,15 +546,21 @@ def create_room(private_key_file, pubkey_remote_file):
             style=INQUIRER_STYLE
         ).execute()
 
+        profile = select_tunnel_profile(profile_names(), default_profile())
+        tunnel_opts = profile_options(profile)
+        # Shared and pre-warmed tunnels were built with the configured profile
+        configured = profile == default_profile()
+
         main_session_id = "host_" + generate_random_id(6)
-        render_info(f"Creating room for session: {main_session_id}")
+        room_port = 0
+        timer = start_flow("create_room")
 
         priv_key_obj = None
 
         if room_type == "static":
             from .i2p_identity import get_or_create_static_i2p_dest
             render_info("Unlocking private key to access static identity...")
-            priv_key_obj = decrypt_private_key(private_path)
+            priv_key_obj = decrypt_private_key(private_path, timer)
             
             from .keychain import load_register
             entries = load_register()
@@ -524,27 +570,51 @@ def create_room(private_key_file, pubkey_remote_file):
                     alias = e["Alias"] or "Host"
                     break
             
-            pub, priv = get_or_create_static_i2p_dest(priv_key_obj, priv_key_obj.pubkey, alias)
+            pub, priv = get_or_create_static_i2p_dest(priv_key_obj, priv_key_obj.pubkey, alias, timer)
             
-            s = sam_hello()
-            sam_create_session(s, main_session_id, priv)
+            render_info(f"Creating room for session: {main_session_id}")
+            with timer.phase("sam_hello"):
+                s = sam_hello()
+            with timer.phase("session_create", room="static", profile=profile):
+                sam_create_session(s, main_session_id, priv, tunnel_opts)
+        elif configured and is_tunnel_sharing_enabled():
+            # Room becomes a subsession of the shared PRIMARY session
+            with timer.phase("shared_add_room"):
+                shared = get_shared_session()
+                main_session_id, room_port = shared.add_room()
+            render_info(f"Creating room for session: {main_session_id} (shared tunnels, port {room_port})")
+            pub = shared.pub
+        elif configured and (warm := take_warm_session()) is not None:
+            main_session_id, s, pub = warm.nickname, warm.conn, warm.pub
+            render_info(f"Creating room for session: {main_session_id} (pre-warmed)")
         else:
-            s = sam_hello()
-            pub, priv = sam_dest_generate(s)
-            sam_create_session(s, main_session_id, priv)
+            render_info(f"Creating room for session: {main_session_id}")
+            with timer.phase("sam_hello"):
+                s = sam_hello()
+            with timer.phase("dest_generate"):
+                pub, priv = sam_dest_generate(s)
+            with timer.phase("session_create", room="dynamic", profile=profile):
+                sam_create_session(s, main_session_id, priv, tunnel_opts)
 
         render_success("Destination generated!")
         time.sleep(0.5)
         clear_screen()
-        render_dest_display(pub)
+        # A .b32.i2p address is ~60 chars instead of ~520: invites and pastes shrink
+        address = b32_address(pub) if get_address_format() == "b32" else pub
+        render_dest_display(f"{address}:{room_port}" if room_port else address)
         console.print()
 
+        # Everyone whose key is listed here can read the room
+        member_files = [pubkey_remote_file]
+        member_keys = [pubkey_remote]
+
         while True:
             action = inquirer.select(
-                message="Room Options",
+                message=f"Room Options ({len(member_keys)} member key(s))",
                 choices=[
                     {"name": "  Start waiting for inbound connection", "value": "listen"},
                     {"name": "  Generate PGP Signed Invite", "value": "invite"},
+                    {"name": "  Add member public key", "value": "member"},
                     {"name": "  Cancel room", "value": "cancel"}
                 ],
                 pointer=">",
@@ -563,7 +633,7 @@ def create_room(private_key_file, pubkey_remote_file):
                 try:
                     if priv_key_obj is None:
                         render_info("Unlocking private key to sign the invite...")
-                        priv_key_obj = decrypt_private_key(private_path)
+                        priv_key_obj = decrypt_private_key(private_path, timer)
 
                     entries = load_register()
                     sender_alias = "Host"
@@ -572,27 +642,55 @@ def create_room(private_key_file, pubkey_remote_file):
                             sender_alias = e["Alias"] or "Host"
                             break
 
-                    export_invite(
-                        sender_priv_key=priv_key_obj,
-                        sender_alias=sender_alias,
-                        sender_fingerprint=priv_key_obj.fingerprint,
-                        recipient_pub_key=pubkey_remote,
-                        dest=pub,
-                        invite_type=room_type
-                    )
+                    # One invite per member, each encrypted to that member
+                    for member_key in member_keys:
+                        with timer.phase("invite_export"):
+                            export_invite(
+                                sender_priv_key=priv_key_obj,
+                                sender_alias=sender_alias,
+                                sender_fingerprint=priv_key_obj.fingerprint,
+                                recipient_pub_key=member_key,
+                                dest=address,
+                                invite_type=room_type,
+                                port=room_port
+                            )
                 except Exception as e:
                     render_error(f"Failed to generate invite: {e}")
 
+            elif action == "member":
+                filename, member_key = _select_member_key(member_files)
+                if member_key is not None:
+                    member_files.append(filename)
+                    member_keys.append(member_key)
+                    render_success(f"Member added: {filename}")
+
             elif action == "listen":
                 break
 
-        render_info("Waiting for inbound connection...")
+        if priv_key_obj is None:
+            render_info("Accessing encrypted PRIVKEY...")
+            priv_key_obj = decrypt_private_key(private_path, timer)
+            render_success("Private Key successfully unlocked")
 
-        s2 = sam_hello()
-        sam_stream_accept(s2, main_session_id)
-        render_success("Contact connected! Start chatting")
+        # The room keeps accepting peers on the same session until it is closed
+        from .room import Room
+        dgram_session = None
+        if get_transport_mode() == "datagram":
+            try:
+                from .datagram import DatagramSession
+                with timer.phase("datagram_session"):
+                    dgram_session = DatagramSession.create(tunnel_opts)
+            except Exception as e:
+                render_info(f"Datagram transport unavailable, using streams only: {e}")
+        room = Room(priv_key_obj, member_keys, _render_room_event,
+                    datagram_session=dgram_session, heartbeat=get_heartbeat_interval(),
+                    armored=is_armored_wire(), frame_mac=is_frame_mac_enabled(),
+                    symmetric_modes=get_symmetric_modes())
+        room.serve(main_session_id, *get_accept_settings())
+        render_info("Waiting for inbound connections...")
+        _finish_flow(timer)
 
-        chat_session(s2, private_path, pubkey_remote)
+        room_session(room)
 
     except Exception as e:
         render_error(f"Error creating room: {e}")
@@ -600,3 +698,6 @@ def create_room(private_key_file, pubkey_remote_file):
         traceback.print_exc()
         input()
         return
+    finally:
+        if shared is not None:
+            shared.remove(main_session_id)
@@ -3,6 +3,7 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from argon2.low_level import hash_secret_raw, Type
 import os
 import getpass
+from contextlib import nullcontext
 import warnings
 from cryptography.utils import CryptographyDeprecationWarning
 from pgpy.constants import PubKeyAlgorithm, KeyFlags, HashAlgorithm, SymmetricKeyAlgorithm, CompressionAlgorithm
@@ -19,12 +20,40 @@ warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
 
 # ===================== Fonctions =====================
 
-def pgp_encrypt(pubkey, message):
-    """Encrypt a string with PGP"""
-    message_obj = PGPMessage.new(message)
-    encrypted_message = pubkey.encrypt(message_obj)
+def pgp_encrypt(pubkey, message, compress=True):
+    """Encrypt a string with PGP (compress=False: the data is already compressed)"""
+    if compress:
+        message_obj = PGPMessage.new(message)
+    else:
+        message_obj = PGPMessage.new(message, compression=CompressionAlgorithm.Uncompressed)
+    with warnings.catch_warnings():
+        # Keys made before Uncompressed was in their preferences: pgpy only warns
+        warnings.filterwarnings("ignore", message="Selected compression algorithm not in key preferences")
+        encrypted_message = pubkey.encrypt(message_obj)
     return encrypted_message
 
+def pgp_encrypt_multi(pubkeys, message):
+    """Encrypt a string once for several recipients (one shared session key)"""
+    if len(pubkeys) == 1:
+        return pgp_encrypt(pubkeys[0], message)
+    message_obj = PGPMessage.new(message)
+    cipher = SymmetricKeyAlgorithm.AES256
+    sessionkey = cipher.gen_key()
+    for pubkey in pubkeys:
+        message_obj = pubkey.encrypt(message_obj, cipher=cipher, sessionkey=sessionkey)
+    del sessionkey
+    return message_obj
+
+def pgp_wire_bytes(message, armored=False):
+    """
+    A PGPMessage as sent in a frame: raw OpenPGP packets, a third smaller
+    than ASCII armor and with no CRC/line wrapping to compute. Armor stays
+    for files on disk (invites, identities) and for armored=True.
+    """
+    if armored:
+        return str(message).encode('utf-8')
+    return bytes(message)
+
 def pgp_decrypt_message(private_key, encrypted_data):
     """Decrypt a PGP message with a private key IN MEM"""
     try:
@@ -69,8 +98,13 @@ def pgp_decrypt_message(private_key, encrypted_data):
         raise Exception(f"[ERROR] - unable to decrypt {e}")
 
 
-def decrypt_private_key(private_key_path):
-    """Decrypt the PRIVATEKEY w/ Argon2 + AES encryption."""
+def decrypt_private_key(private_key_path, timer=None):
+    """
+    Decrypt the PRIVATEKEY w/ Argon2 + AES encryption.
+    timer: optional FlowTimer (src/metrics.py) to time each step.
+    """
+    phase = timer.phase if timer is not None else (lambda name: nullcontext())
+
     with open(private_key_path, "rb") as f:
         data = f.read()
 
@@ -78,26 +112,29 @@ def decrypt_private_key(private_key_path):
     nonce = data[16:28]
     ciphertext = data[28:]
 
-    password = getpass.getpass("Please enter your secret : ").encode()
-
-    key = hash_secret_raw(
-        secret=password,
-        salt=salt,
-        time_cost=2,
-        memory_cost=102400,
-        parallelism=8,
-        hash_len=32,
-        type=Type.I
-    )
-
-    aesgcm = AESGCM(key)
-    try:
-        private_key_bytes = aesgcm.decrypt(nonce, ciphertext, None)
-    except Exception as e:
-        # InvalidTag means wrong password
-        raise Exception("Wrong password or corrupted key file.")
+    with phase("password_prompt"):
+        password = getpass.getpass("Please enter your secret : ").encode()
+
+    with phase("argon2_kdf"):
+        key = hash_secret_raw(
+            secret=password,
+            salt=salt,
+            time_cost=2,
+            memory_cost=102400,
+            parallelism=8,
+            hash_len=32,
+            type=Type.I
+        )
+
+    with phase("key_decrypt"):
+        aesgcm = AESGCM(key)
+        try:
+            private_key_bytes = aesgcm.decrypt(nonce, ciphertext, None)
+        except Exception as e:
+            # InvalidTag means wrong password
+            raise Exception("Wrong password or corrupted key file.")
 
-    private_key = PGPKey.from_blob(private_key_bytes.decode())[0]
+        private_key = PGPKey.from_blob(private_key_bytes.decode())[0]
 
     # Nettoyage mémoire
     del private_key_bytes
@@ -163,7 +200,8 @@ def generate_keypair(name: str, email: str):
         usage={KeyFlags.Sign, KeyFlags.Certify},
         hashes=[HashAlgorithm.SHA256, HashAlgorithm.SHA512],
         ciphers=[SymmetricKeyAlgorithm.AES256],
-        compression=[CompressionAlgorithm.ZLIB, CompressionAlgorithm.BZ2, CompressionAlgorithm.ZIP]
+        compression=[CompressionAlgorithm.ZLIB, CompressionAlgorithm.BZ2, CompressionAlgorithm.ZIP,
+                     CompressionAlgorithm.Uncompressed]
     )
 
     primary.add_subkey(subkey, usage={KeyFlags.EncryptCommunications, KeyFlags.EncryptStorage})
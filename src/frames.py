@@ -0,0 +1,132 @@
+"""
+src/frames.py - Typed, multiplexed frames for Argon Messenger
+
+Handles:
+  - A versioned header on every payload a chat stream carries:
+      [1 byte version][1 byte type][2 bytes BE channel][1 byte flags][body]
+  - Frame types (text, file chunk, control, receipt) and well-known
+    channels, so the receiver dispatches on the header instead of guessing
+    from whether a payload decrypts
+  - Multiplexer: several logical streams (chat, long messages, file
+    transfer, receipts)
+    over one SAM stream, so a new feature never costs another tunnel
+    handshake. Bulk channels only get part of the retransmit window and
+    send bounded chunks, so interactive text never waits behind them
+  - Typed frames only once the session hello (src/handshake.py) says the
+    peer reads them: peers without one get bare payloads
+
+Link-level acks, pings and resumes stay in the ReliableChannel envelope
+(src/reliable.py); typed frames ride in its DATA frames. Versions 0x01-0x0F
+never start a PGP packet, ASCII armor or an offer, but they can start plain
+text (a tab, a newline): a payload is only parsed as a frame once the hello
+says the peer sends them.
+"""
+
+import struct
+from typing import NamedTuple
+
+# ─── Header ───────────────────────────────────────────────────────────────────
+FRAME_VERSION   = 1
+MAX_VERSION     = 0x0F
+_HEADER         = struct.Struct('>BBHB')
+FRAME_HEADER    = _HEADER.size
+
+# ─── Frame types ──────────────────────────────────────────────────────────────
+TYPE_TEXT       = 0x01   # a chat message (codec payload)
+TYPE_FILE_CHUNK = 0x02   # a piece of a file transfer
+TYPE_CONTROL    = 0x03   # session control between the two clients
+TYPE_RECEIPT    = 0x04   # delivery / read receipt
+
+# ─── Flags ────────────────────────────────────────────────────────────────────
+FLAG_MORE       = 0x01   # more frames of the same message follow
+FLAG_MAC        = 0x02   # the body ends with a session MAC tag (src/gate.py)
+
+# ─── Channels ─────────────────────────────────────────────────────────────────
+CHANNEL_CONTROL   = 0
+CHANNEL_CHAT      = 1
+CHANNEL_FILES     = 2
+CHANNEL_RECEIPTS  = 3
+CHANNEL_LONG_TEXT = 4   # messages too long for one frame, in chunks (src/chunking.py)
+BULK_CHANNELS     = frozenset({CHANNEL_FILES, CHANNEL_LONG_TEXT})
+
+BULK_CHUNK_SIZE   = 16 * 1024   # bulk bodies are cut to this: text waits one chunk at most
+
+
+class Frame(NamedTuple):
+    """A parsed typed frame; body is a view into the received payload."""
+    version: int
+    type: int
+    channel: int
+    flags: int
+    body: memoryview
+
+
+def pack_frame(channel: int, frame_type: int, body: bytes, flags: int = 0) -> bytes:
+    return _HEADER.pack(FRAME_VERSION, frame_type, channel, flags) + body
+
+
+def is_frame(payload: bytes) -> bool:
+    """True if payload carries a typed header (of any version)."""
+    return len(payload) >= FRAME_HEADER and 1 <= payload[0] <= MAX_VERSION
+
+
+def parse_frame(payload: bytes) -> Frame | None:
+    """The typed frame in payload, or None for a bare (legacy) payload."""
+    if not is_frame(payload):
+        return None
+    version, frame_type, channel, flags = _HEADER.unpack_from(payload)
+    return Frame(version, frame_type, channel, flags, memoryview(payload)[FRAME_HEADER:])
+
+
+class Multiplexer:
+    """
+    Logical channels over one chat stream.
+
+    send(payload, channel) is the writer underneath (the pipeline picks the
+    stream or datagram path and the window share from the channel).
+    Frames are only typed once peer_version is set from the peer's hello;
+    until then, and for peers without one, send() hands the bare body down.
+    """
+
+    def __init__(self, send):
+        self._send = send
+        self._handlers: dict = {}
+        self.peer_version: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.peer_version is not None
+
+    def register(self, channel: int, handler):
+        """handler(frame) is called for every frame on channel."""
+        self._handlers[channel] = handler
+
+    # ── Frames ───────────────────────────────────────────────────────────────
+
+    def check(self, channel: int):
+        """Raise unless frames on channel can reach the peer."""
+        if not self.enabled and channel != CHANNEL_CHAT:
+            raise Exception("Peer does not support multiplexed channels")
+
+    def send(self, channel: int, frame_type: int, body: bytes, flags: int = 0):
+        self.check(channel)
+        if not self.enabled:
+            self._send(body, channel)
+            return
+        self._send(pack_frame(channel, frame_type, body, flags), channel)
+
+    def dispatch(self, payload: bytes) -> bool:
+        """
+        Route a typed frame to its channel's handler (True). False means
+        payload is bare and left to the caller, as is everything before the
+        peer's hello. Frames of an unknown version or channel are dropped.
+        """
+        if not self.enabled:
+            return False
+        frame = parse_frame(payload)
+        if frame is None:
+            return False
+        handler = self._handlers.get(frame.channel)
+        if frame.version == FRAME_VERSION and handler is not None:
+            handler(frame)
+        return True
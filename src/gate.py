@@ -0,0 +1,262 @@
+"""
+src/gate.py - Cheap checks on inbound payloads before they are decrypted
+
+Handles:
+  - TokenBucket: a per-connection budget for payloads headed for the codec.
+    A payload over the budget is dropped and counted, never waited for: the
+    reader thread also carries the acks, pings and resumes of the link, so
+    a flood only ever costs rate decryptions a second and nothing else
+  - OpenPGP screening without parsing the message: the leading packet
+    headers must be PKESK packets followed by encrypted data, and one PKESK
+    must name a key we hold (binary packets, or the first lines of armor)
+  - The optional per-session MAC: each end seals a random key to the peer in
+    its session hello (src/handshake.py) and checks the tags the peer puts on
+    typed frames with it, so frames from anyone else never reach the codec.
+    Once both hellos offered one, untagged frames and bare payloads are refused
+  - Sealed payloads of the symmetric session mode (src/symmetric.py) skip
+    the OpenPGP checks once the key exchange is done: opening one is
+    already cheaper than screening
+  - Counters of passed and dropped payloads, by reason
+
+A payload that passes can still fail to decrypt: this only rules out what
+is certain to fail, at a fraction of the cost of trying.
+"""
+
+import base64
+import hashlib
+import hmac
+import threading
+import time
+
+from .symmetric import is_sealed
+
+# ─── Rate limit ───────────────────────────────────────────────────────────────
+INBOUND_RATE     = 100.0         # codec payloads per second, per connection
+INBOUND_BURST    = 200.0         # payloads accepted at once before the rate applies
+RATE_UNIT        = 64 * 1024     # a payload costs one token more per RATE_UNIT bytes
+
+# ─── Session MAC ──────────────────────────────────────────────────────────────
+MAC_KEY_SIZE     = 32
+MAC_TAG_SIZE     = 16            # truncated HMAC-SHA256
+
+# ─── OpenPGP screening ────────────────────────────────────────────────────────
+_TAG_PKESK       = 1
+_TAG_SKESK       = 3
+_DATA_TAGS       = frozenset({9, 18, 20})   # SED, SEIPD, AEAD encrypted data
+_WILDCARD_KEY_ID = bytes(8)                 # anonymous recipient: any key may match
+MAX_RECIPIENTS   = 64                       # PKESK packets walked before giving up
+ARMOR_BEGIN      = b'-----BEGIN PGP MESSAGE-----'
+ARMOR_SCAN       = 16 * 1024                # bytes of armor decoded to find the PKESKs
+
+DROP_REASONS = ("rate_limited", "bad_mac", "malformed", "wrong_recipient", "undecryptable")
+
+
+def configure_rate_limit(rate: float = INBOUND_RATE, burst: float = INBOUND_BURST):
+    """Set the limit every gate created from now on applies (rate 0: unlimited)."""
+    global INBOUND_RATE, INBOUND_BURST
+    INBOUND_RATE = max(0.0, rate)
+    INBOUND_BURST = max(1.0, burst)
+
+
+class TokenBucket:
+    """rate tokens a second, at most burst saved up; rate 0 never runs out."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, cost: float = 1.0) -> bool:
+        """Take cost tokens if there are that many; never blocks."""
+        if self.rate <= 0:
+            return True
+        cost = min(cost, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens < cost:
+                return False
+            self._tokens -= cost
+            return True
+
+
+# ─── OpenPGP ──────────────────────────────────────────────────────────────────
+
+def pgp_key_ids(key) -> frozenset | None:
+    """8-byte ids of a pgpy key and its subkeys; None for anything else."""
+    fingerprint = getattr(key, "fingerprint", None)
+    if fingerprint is None:
+        return None
+    ids = {fingerprint.keyid} | set(getattr(key, "subkeys", {}))
+    return frozenset(bytes.fromhex(str(key_id)) for key_id in ids)
+
+
+def _packet_header(data, offset: int) -> tuple[int, int, int] | None:
+    """
+    (tag, body offset, body length) of the OpenPGP packet at offset, with
+    length -1 when it is not given up front; None if data ends first.
+    """
+    if offset + 2 > len(data):
+        return None
+    first = data[offset]
+    if first & 0x40:   # new format
+        tag, octet = first & 0x3F, data[offset + 1]
+        if octet < 192:
+            return tag, offset + 2, octet
+        if octet < 224:
+            if offset + 3 > len(data):
+                return None
+            return tag, offset + 3, ((octet - 192) << 8) + data[offset + 2] + 192
+        if octet == 255:
+            if offset + 6 > len(data):
+                return None
+            return tag, offset + 6, int.from_bytes(data[offset + 2:offset + 6], 'big')
+        return tag, offset + 2, -1   # partial body length
+    tag, size = (first >> 2) & 0x0F, (1, 2, 4, 0)[first & 0x03]
+    if size == 0:
+        return tag, offset + 1, -1   # indeterminate length
+    if offset + 1 + size > len(data):
+        return None
+    return tag, offset + 1 + size, int.from_bytes(data[offset + 1:offset + 1 + size], 'big')
+
+
+def screen_pgp(data, key_ids, complete: bool = True) -> str | None:
+    """
+    None if data may be an OpenPGP message for one of key_ids, else why it
+    cannot be. complete=False means data is only the start of the message.
+    """
+    offset = 0
+    for _ in range(MAX_RECIPIENTS):
+        if offset < len(data) and not data[offset] & 0x80:
+            return "malformed"
+        header = _packet_header(data, offset)
+        if header is None:
+            return "malformed" if complete else None
+        tag, body, length = header
+        if tag in _DATA_TAGS:
+            return "wrong_recipient"   # no session key packet for us came first
+        if tag not in (_TAG_PKESK, _TAG_SKESK) or length < 0:
+            return "malformed"
+        if tag == _TAG_PKESK:
+            if body + 9 > len(data):
+                return "malformed" if complete else None
+            if length < 10 or data[body] != 3:
+                return "malformed"
+            key_id = bytes(data[body + 1:body + 9])
+            if key_id in key_ids or key_id == _WILDCARD_KEY_ID:
+                return None
+        offset = body + length
+    return "malformed"
+
+
+def _dearmor_head(data) -> tuple[bytes, bool] | None:
+    """(the first decoded bytes of ASCII armor, whether that is all of it), or None."""
+    head = bytes(data[:ARMOR_SCAN]).replace(b'\r', b'')
+    start = head.find(b'\n\n')
+    if start < 0:
+        return None
+    body = head[start + 2:]
+    end = body.find(b'\n=')   # checksum line; base64 lines never start with '='
+    if end < 0:
+        end = body.find(b'\n-----')
+    complete = end >= 0
+    if complete:
+        body = body[:end]
+    elif len(data) <= ARMOR_SCAN:
+        return None   # all of it was scanned and it never ends: truncated
+    body = body.replace(b'\n', b'')
+    try:
+        return base64.b64decode(body[:len(body) // 4 * 4], validate=True), complete
+    except ValueError:
+        return None
+
+
+# ─── Session MAC ──────────────────────────────────────────────────────────────
+
+def frame_tag(key: bytes, context: bytes, body) -> bytes:
+    """The tag of body (a typed frame's payload) under key; context binds it to a session and channel."""
+    mac = hmac.new(key, context, hashlib.sha256)
+    mac.update(body)
+    return mac.digest()[:MAC_TAG_SIZE]
+
+
+# ─── Per-connection gate ──────────────────────────────────────────────────────
+
+class InboundGate:
+    """
+    Screens the payloads of one connection before they reach the codec.
+
+    key_ids: ids from pgp_key_ids(), or None to skip the OpenPGP checks
+    (unsafe mode). mac_key: the key we sealed to the peer, or None. Once a
+    tagged frame has checked out, or mac_required is set (both hellos
+    offered a MAC), untagged ones are refused.
+    """
+
+    def __init__(self, key_ids=None, mac_key: bytes | None = None,
+                 rate: float | None = None, burst: float | None = None):
+        self.key_ids = key_ids
+        self.mac_key = mac_key
+        self.mac_seen = False
+        self.mac_required = False
+        self.accept_sealed = False   # set once a symmetric session exists
+        self.bucket = TokenBucket(INBOUND_RATE if rate is None else rate,
+                                  INBOUND_BURST if burst is None else burst)
+        self.stats = dict.fromkeys(("passed",) + DROP_REASONS, 0)
+
+    def admit(self, size: int) -> bool:
+        """Charge a payload of size bytes to the rate limit; False if it is dropped."""
+        if self.bucket.take(1 + size // RATE_UNIT):
+            return True
+        self.drop("rate_limited")
+        return False
+
+    def screen(self, payload, tagged: bool = False, context: bytes = b'',
+               header: int = 0) -> memoryview | None:
+        """
+        payload (its tag stripped) if it may go to the codec, None if it
+        was dropped. tagged: the frame says it ends with a MAC tag over
+        context + payload. header: bytes before the codec payload (a chunk
+        header), covered by the tag but not screened as OpenPGP.
+        """
+        if not self.admit(len(payload)):
+            return None
+        view = memoryview(payload)
+        if tagged:
+            if (self.mac_key is None or len(view) < MAC_TAG_SIZE or not hmac.compare_digest(
+                    frame_tag(self.mac_key, context, view[:-MAC_TAG_SIZE]), view[-MAC_TAG_SIZE:])):
+                return self.drop("bad_mac")
+            view = view[:-MAC_TAG_SIZE]
+            self.mac_seen = True
+        elif self.mac_seen or self.mac_required:
+            return self.drop("bad_mac")
+        codec_payload = view[header:]
+        if self.key_ids is not None and not (self.accept_sealed and is_sealed(codec_payload)):
+            reason = self._screen_pgp(codec_payload)
+            if reason is not None:
+                return self.drop(reason)
+        self.stats["passed"] += 1
+        return view
+
+    def _screen_pgp(self, data) -> str | None:
+        if bytes(data[:len(ARMOR_BEGIN)]) != ARMOR_BEGIN:
+            return screen_pgp(data, self.key_ids)
+        head = _dearmor_head(data)
+        if head is None:
+            return "malformed"
+        return screen_pgp(head[0], self.key_ids, complete=head[1])
+
+    def drop(self, reason: str) -> None:
+        self.stats[reason] += 1
+        return None
+
+    @property
+    def dropped(self) -> int:
+        return sum(self.stats[reason] for reason in DROP_REASONS)
+
+    def summary(self) -> str:
+        s = self.stats
+        reasons = ", ".join(f"{s[r]} {r.replace('_', ' ')}" for r in DROP_REASONS if s[r])
+        return f"{s['passed']} passed, {self.dropped} dropped" + (f" ({reasons})" if reasons else "")
@@ -0,0 +1,150 @@
+"""
+src/handshake.py - Session-open hello and capability negotiation
+
+Handles:
+  - The hello frame both ends send first on every (re)attached chat stream:
+    protocol version, typed frame version, compression methods, payload
+    encodings (binary / armored), symmetric session modes, the largest
+    frame and the largest chunked message (src/chunking.py) the sender
+    accepts
+  - Signing the hello with the sender's PGP key and checking it against the
+    key we expect; the hello names the chat's session id, so it cannot be
+    replayed into another chat
+  - The sender's frame MAC key (src/gate.py), sealed to the receiver's key
+  - The sender's ephemeral X25519 key for the symmetric session mode
+    (src/symmetric.py), authenticated by the hello signature
+  - negotiate(): the fastest settings both ends support
+
+Wire format (a payload of the reliable channel):
+  HELLO_PREFIX + [2 bytes BE body length][body: UTF-8 JSON][signature]
+The signature is a detached binary OpenPGP signature of the body, empty in
+unsafe mode. A peer that never sends a hello gets the defaults: bare
+payloads, no compression and the configured armor setting.
+"""
+
+import json
+import struct
+from typing import NamedTuple
+
+from .transport import MAX_FRAME_SIZE
+
+# ─── Wire constants ───────────────────────────────────────────────────────────
+CONTROL_PREFIX   = b'\x00ARGON-'                 # every in-band control payload
+HELLO_PREFIX     = CONTROL_PREFIX + b'HELLO\x00'  # never the start of a PGP message
+PROTOCOL_VERSION = 1
+MAX_HELLO_SIZE   = 16 * 1024
+_BODY_LENGTH     = struct.Struct('>H')
+
+PAYLOAD_BINARY   = "binary"
+PAYLOAD_ARMORED  = "armored"
+
+
+class HandshakeError(Exception):
+    """A hello that cannot be trusted: malformed, badly signed or for another session."""
+
+
+class Hello(NamedTuple):
+    """What one end supports."""
+    version: int
+    session: str            # hex session id of the chat
+    frames: int             # typed frame version (src/frames.py), 0 for bare payloads
+    compression: list       # method names, preferred first
+    payloads: list          # encodings accepted, preferred first
+    symmetric: list         # symmetric session modes, preferred first
+    max_frame: int          # largest frame the sender accepts
+    max_message: int = 0    # largest chunked message it reassembles, 0 for none
+    mac: str = ""           # base64 MAC key sealed to the receiver, "" for no tags
+    ephemeral: str = ""     # base64 X25519 public key, "" without symmetric modes
+
+
+class Negotiated(NamedTuple):
+    """What this end uses towards the peer."""
+    version: int
+    frames: int
+    compression: str | None
+    armored: bool
+    symmetric: str | None
+    max_frame: int          # largest frame we may send
+    max_message: int = 0    # largest chunked message we may send, 0 for none
+    mac: bool = False       # tag our typed frames with the peer's MAC key
+
+    def describe(self) -> str:
+        return (f"protocol v{self.version}, "
+                f"{'typed frames v%d' % self.frames if self.frames else 'bare payloads'}, "
+                f"{'armored' if self.armored else 'binary'} payloads, "
+                f"compression {self.compression or 'off'}, "
+                f"symmetric mode {self.symmetric or 'off'}, "
+                f"frame MAC {'on' if self.mac else 'off'}, "
+                f"max frame {self.max_frame // 1024} KB, "
+                + (f"chunked messages up to {self.max_message // 1024} KB"
+                   if self.max_message else "no chunked messages"))
+
+
+def is_control(payload) -> bool:
+    """True for in-band control payloads (hello, offers), known or not."""
+    return bytes(payload[:len(CONTROL_PREFIX)]) == CONTROL_PREFIX
+
+
+def is_hello(payload) -> bool:
+    return bytes(payload[:len(HELLO_PREFIX)]) == HELLO_PREFIX
+
+
+def pack_hello(hello: Hello, sign=None) -> bytes:
+    """The hello payload; sign(body) -> signature bytes, if given."""
+    body = json.dumps(hello._asdict(), separators=(',', ':'), sort_keys=True).encode()
+    signature = sign(body) if sign is not None else b''
+    return HELLO_PREFIX + _BODY_LENGTH.pack(len(body)) + body + signature
+
+
+def parse_hello(payload: bytes, verify=None, session: bytes | None = None) -> Hello:
+    """
+    Parse and check a peer's hello. verify(body, signature) -> bool must
+    accept the signature (None skips the check, for unsafe mode); session
+    is the id the hello must name. Raises HandshakeError.
+    """
+    if len(payload) > MAX_HELLO_SIZE:
+        raise HandshakeError(f"Hello exceeds {MAX_HELLO_SIZE} bytes")
+    offset = len(HELLO_PREFIX) + _BODY_LENGTH.size
+    if len(payload) < offset:
+        raise HandshakeError("Truncated hello")
+    (length,) = _BODY_LENGTH.unpack_from(payload, len(HELLO_PREFIX))
+    body = bytes(payload[offset:offset + length])
+    signature = bytes(payload[offset + length:])
+    if len(body) != length:
+        raise HandshakeError("Truncated hello")
+    if verify is not None and not verify(body, signature):
+        raise HandshakeError("Hello signature does not match the peer's key")
+    try:
+        fields = json.loads(body)
+        hello = Hello(
+            version=int(fields["version"]),
+            session=str(fields["session"]),
+            frames=int(fields.get("frames", 0)),
+            compression=[str(m) for m in fields.get("compression", [])],
+            payloads=[str(p) for p in fields.get("payloads", [PAYLOAD_ARMORED])],
+            symmetric=[str(m) for m in fields.get("symmetric", [])],
+            max_frame=int(fields.get("max_frame", MAX_FRAME_SIZE)),
+            max_message=max(0, int(fields.get("max_message", 0))),
+            mac=str(fields.get("mac", "")),
+            ephemeral=str(fields.get("ephemeral", "")),
+        )
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HandshakeError(f"Malformed hello: {e}")
+    if session is not None and hello.session != session.hex():
+        raise HandshakeError("Hello belongs to another session")
+    return hello
+
+
+def negotiate(ours: Hello, theirs: Hello) -> Negotiated:
+    """Our preferences, restricted to what the peer said it can decode."""
+    return Negotiated(
+        version=min(ours.version, theirs.version),
+        frames=min(ours.frames, theirs.frames),
+        compression=next((m for m in ours.compression if m in theirs.compression), None),
+        armored=PAYLOAD_BINARY not in theirs.payloads,
+        symmetric=next((m for m in ours.symmetric if m in theirs.symmetric), None)
+                  if ours.ephemeral and theirs.ephemeral else None,
+        max_frame=max(1024, min(theirs.max_frame, MAX_FRAME_SIZE)),
+        max_message=theirs.max_message if ours.frames and theirs.frames else 0,
+        mac=bool(theirs.mac) and bool(ours.frames and theirs.frames),
+    )
@@ -32,6 +32,131 @@ def is_i2p_encryption_enabled():
         # Return True by default in case of error
         return True
 
+def read_setting(section, key, default=None):
+    """Read a raw value from settings.ini, or default if it is missing"""
+    config = configparser.ConfigParser()
+    try:
+        config.read(SETTINGS_FILE)
+        return config.get(section, key, fallback=default)
+    except Exception as e:
+        print(f"Error reading settings.ini: {e}")
+        return default
+
+def read_section(section):
+    """Every key/value of a settings.ini section as a dict (empty if missing)"""
+    config = configparser.ConfigParser()
+    try:
+        config.read(SETTINGS_FILE)
+        return dict(config[section]) if config.has_section(section) else {}
+    except Exception as e:
+        print(f"Error reading settings.ini: {e}")
+        return {}
+
+def is_tunnel_sharing_enabled():
+    """Check if rooms may share one SAM PRIMARY session (one tunnel set)"""
+    return str(read_setting('I2P Network', 'share_tunnels', 'false')).lower() == 'true'
+
+def get_prewarm_settings():
+    """Return (pool_size, idle_timeout_seconds) for the SAM session pre-warmer"""
+    try:
+        pool_size = int(read_setting('I2P Network', 'prewarm_sessions', '1'))
+    except ValueError:
+        pool_size = 1
+    try:
+        idle_timeout = float(read_setting('I2P Network', 'prewarm_idle_timeout', '600'))
+    except ValueError:
+        idle_timeout = 600.0
+    return max(0, min(pool_size, 2)), max(30.0, idle_timeout)
+
+def get_transport_mode():
+    """'datagram' to send short messages as SAM datagrams, 'stream' otherwise"""
+    mode = str(read_setting('I2P Network', 'transport', 'stream')).lower()
+    return mode if mode in ('stream', 'datagram') else 'stream'
+
+def get_accept_settings():
+    """Return (concurrency, mode) for hosts: armed STREAM ACCEPTs and 'accept' or 'forward'"""
+    try:
+        concurrency = int(read_setting('I2P Network', 'accept_concurrency', '2'))
+    except ValueError:
+        concurrency = 2
+    mode = str(read_setting('I2P Network', 'accept_mode', 'accept')).lower()
+    return max(1, min(concurrency, 8)), mode if mode in ('accept', 'forward') else 'accept'
+
+def get_heartbeat_interval():
+    """Seconds between stream heartbeats (0 disables them)"""
+    try:
+        interval = float(read_setting('I2P Network', 'heartbeat_interval', '10'))
+    except ValueError:
+        interval = 10.0
+    return 0.0 if interval <= 0 else max(2.0, interval)
+
+def get_address_format():
+    """'b32' to share .b32.i2p addresses in invites and on screen, 'full' for base64 DESTs"""
+    fmt = str(read_setting('I2P Network', 'address_format', 'b32')).lower()
+    return fmt if fmt in ('b32', 'full') else 'b32'
+
+def get_socket_settings():
+    """Return (low_latency, buffer_bytes) for SAM sockets from [I2P Network]"""
+    low_latency = str(read_setting('I2P Network', 'low_latency_sockets', 'true')).lower() == 'true'
+    try:
+        buffer_kb = int(read_setting('I2P Network', 'socket_buffer_kb', '256'))
+    except ValueError:
+        buffer_kb = 256
+    return low_latency, max(0, min(buffer_kb, 16384)) * 1024
+
+def get_inbound_limits():
+    """Return (payloads per second, burst) decrypted per connection, from [CRYPTOGRAPHY & OPSEC]; rate 0 is unlimited"""
+    try:
+        rate = float(read_setting('CRYPTOGRAPHY & OPSEC', 'inbound_rate', '100'))
+        burst = float(read_setting('CRYPTOGRAPHY & OPSEC', 'inbound_burst', '200'))
+    except ValueError:
+        rate, burst = 100.0, 200.0
+    return max(0.0, min(rate, 10000.0)), max(1.0, min(burst, 100000.0))
+
+def is_frame_mac_enabled():
+    """Ask chat peers to tag their frames with a per-session MAC, checked before decryption"""
+    return str(read_setting('CRYPTOGRAPHY & OPSEC', 'frame_mac', 'true')).lower() == 'true'
+
+def get_symmetric_modes():
+    """
+    Symmetric session modes from [CRYPTOGRAPHY & OPSEC]: None for every
+    available mode, [] when off (PGP for every message), else the listed names
+    """
+    raw = str(read_setting('CRYPTOGRAPHY & OPSEC', 'symmetric_modes', 'auto')).strip().lower()
+    if raw == 'auto':
+        return None
+    if raw in ('off', 'none', ''):
+        return []
+    return [m.strip() for m in raw.split(',') if m.strip()]
+
+def is_armored_wire():
+    """ASCII-armored PGP in chat frames (for older peers); binary packets otherwise"""
+    return str(read_setting('CRYPTOGRAPHY & OPSEC', 'armored_wire', 'false')).lower() == 'true'
+
+def get_compression_settings():
+    """
+    Return (methods, threshold) from [Compression]: methods is None for every
+    available method, [] when compression is off, else the listed names
+    """
+    raw = str(read_setting('Compression', 'methods', 'auto')).strip().lower()
+    try:
+        threshold = int(read_setting('Compression', 'threshold', '256'))
+    except ValueError:
+        threshold = 256
+    if raw == 'auto':
+        methods = None
+    elif raw in ('off', 'none', ''):
+        methods = []
+    else:
+        methods = [m.strip() for m in raw.split(',') if m.strip()]
+    return methods, max(0, threshold)
+
+def get_diagnostics_settings():
+    """Return (show_timings, metrics_file or None) from the [Diagnostics] section"""
+    show = str(read_setting('Diagnostics', 'show_timings', 'false')).lower() == 'true'
+    metrics_file = str(read_setting('Diagnostics', 'metrics_file', '')).strip()
+    return show, metrics_file or None
+
 def argon_protect(private_key_file, output_file):
     """Protects private key by encrypting it with user password"""
     with open(private_key_file, "rb") as f:
@@ -25,6 +25,7 @@ from .tui import (
     confirm_action, INQUIRER_STYLE, ACCENT, OK, WARN, ERR, CYAN
 )
 from .keychain import load_register, PUBLIC_DIR
+from .sam import is_b32_address
 
 # ─── Paths ────────────────────────────────────────────────────────────────────
 DYNAMIC_DIR  = "./storage/DEST/dynamic"
@@ -111,14 +112,40 @@ def _validate_payload(payload: dict) -> str | None:
     except ValueError:
         return f"Invalid timestamp format: {payload['timestamp']}"
 
-    # Validate DEST is non-empty and looks like base64-ish I2P address
+    # DEST is either a full base64 I2P destination or its .b32.i2p address
     dest = payload["dest"]
-    if len(dest) < 300:
+    if not is_b32_address(dest) and len(dest) < 300:
         return f"DEST too short to be valid ({len(dest)} chars)"
 
+    # Optional virtual port (room hosted on a shared PRIMARY session)
+    port = payload.get("port", 0)
+    if not isinstance(port, int) or isinstance(port, bool) or not 0 <= port < 65536:
+        return f"Invalid port: {port!r}"
+
     return None
 
 
+def _dest_bytearray(payload: dict) -> bytearray:
+    """DEST (plus ':port' when the room uses a virtual port) as a wipeable bytearray."""
+    dest = payload["dest"]
+    if payload.get("port"):
+        dest = f"{dest}:{payload['port']}"
+    return bytearray(dest.encode("utf-8"))
+
+
+def _has_line(dest_ba: bytearray, line: bytearray) -> bool:
+    """True if line is one of dest_ba's lines, compared in place (no copies to wipe)."""
+    with memoryview(dest_ba) as view:
+        start = 0
+        while start <= len(dest_ba):
+            end = dest_ba.find(b"\n", start)
+            end = len(dest_ba) if end < 0 else end
+            if view[start:end] == line:
+                return True
+            start = end + 1
+    return False
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Anti-Replay: Nonce
 # ──────────────────────────────────────────────────────────────────────────────
@@ -372,7 +399,7 @@ def check_dynamic_invites(private_key) -> bytearray | None:
 
         if action == "connect" or action == "view":
             # Store DEST as mutable bytearray for memory hygiene
-            dest_ba = bytearray(payload["dest"].encode("utf-8"))
+            dest_ba = _dest_bytearray(payload)
             _delete_invite(filepath)
             return dest_ba
 
@@ -391,7 +418,9 @@ def check_dynamic_invites(private_key) -> bytearray | None:
 def load_address_book(private_key) -> bytearray | None:
     """
     Scan contacts/ for static entries, let user pick one with arrows.
-    Returns bytearray of DEST (caller must wipe after use), or None.
+    Returns bytearray of DEST (caller must wipe after use), or None. When the
+    same contact saved several static DESTs, all of them are returned, one
+    per line, newest first after the selected one.
     """
     contact_files = [
         f for f in os.listdir(CONTACTS_DIR)
@@ -446,7 +475,23 @@ def load_address_book(private_key) -> bytearray | None:
         render_error("Could not retrieve contact data.")
         return None
 
-    dest_ba = bytearray(payload["dest"].encode("utf-8"))
+    # Other static entries signed by the same contact race the selected one
+    fingerprint = payload.get("sender_fingerprint")
+    others = sorted(
+        (p for f, p in parsed_cache.items()
+         if f != selected and fingerprint and p.get("sender_fingerprint") == fingerprint),
+        key=lambda p: p.get("timestamp", ""), reverse=True,
+    )
+    dest_ba = _dest_bytearray(payload)
+    for other in others:
+        extra = _dest_bytearray(other)
+        if not _has_line(dest_ba, extra):
+            dest_ba += b"\n"
+            dest_ba += extra
+        extra[:] = b'\x00' * len(extra)
+    if others:
+        count = dest_ba.count(b"\n") + 1
+        render_info(f"{count} known destination(s) for this contact")
     return dest_ba
 
 
@@ -461,9 +506,12 @@ def export_invite(
     recipient_pub_key,
     dest: str,
     invite_type: str = "dynamic",
+    port: int = 0,
 ) -> str:
     """
     Create a PGP signed+encrypted invite blob.
+    dest may be the full DEST or its .b32.i2p address (several times smaller).
+    port is the room's virtual port when it is hosted on a shared session.
     Returns the file path of the saved invite.
     """
     payload = {
@@ -475,6 +523,8 @@ def export_invite(
         "timestamp":          _now_utc().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "dest":               dest,
     }
+    if port:
+        payload["port"] = port
 
     json_str = json.dumps(payload)
     message  = PGPMessage.new(json_str)
@@ -0,0 +1,156 @@
+"""
+src/metrics.py - Connection phase timing for Argon Messenger
+
+Handles:
+  - Monotonic-clock spans around each phase of a connection flow
+    (Argon2 unlock, SAM hello, DEST generate, tunnel build, stream connect...)
+  - A bounded in-process registry of every recorded span
+  - Per-phase summaries and JSON lines export
+
+Only flow names, phase names, durations and short identifier-like labels are
+recorded. Label values that do not look like an identifier (anything long,
+or with base64 punctuation) are replaced, so a DEST, key or passphrase can
+never reach the registry or an export file.
+"""
+
+import itertools
+import json
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import NamedTuple
+
+MAX_SPANS       = 10_000     # oldest spans are dropped past this
+_SAFE_LABEL     = re.compile(r'^[A-Za-z0-9_\-]{1,32}$')
+REDACTED        = "redacted"
+
+
+class Span(NamedTuple):
+    """One timed phase of a flow."""
+    flow: str
+    flow_id: int
+    phase: str
+    started: float      # wall clock (for export only)
+    duration: float     # seconds, from time.monotonic()
+    ok: bool
+    labels: dict
+
+    def as_dict(self) -> dict:
+        return {
+            **self.labels,
+            "flow": self.flow,
+            "flow_id": self.flow_id,
+            "phase": self.phase,
+            "ts": round(self.started, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "ok": self.ok,
+        }
+
+
+def _safe_labels(labels: dict) -> dict:
+    safe = {}
+    for key, value in labels.items():
+        if not _SAFE_LABEL.match(str(key)):
+            continue
+        if isinstance(value, bool) or isinstance(value, (int, float)):
+            safe[key] = value
+        elif isinstance(value, str) and _SAFE_LABEL.match(value):
+            safe[key] = value
+        else:
+            safe[key] = REDACTED
+    return safe
+
+
+class MetricsRegistry:
+    """Thread-safe store of recorded spans."""
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self._spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._flow_ids = itertools.count(1)
+
+    def next_flow_id(self) -> int:
+        return next(self._flow_ids)
+
+    def record(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, flow: str | None = None) -> list[Span]:
+        with self._lock:
+            return [s for s in self._spans if flow is None or s.flow == flow]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self, flow: str | None = None) -> dict:
+        """{(flow, phase): {count, mean_ms, median_ms, max_ms}} over recorded spans."""
+        grouped: dict = {}
+        for span in self.spans(flow):
+            grouped.setdefault((span.flow, span.phase), []).append(span.duration * 1000)
+        return {
+            key: {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values),
+                "median_ms": statistics.median(values),
+                "max_ms": max(values),
+            }
+            for key, values in grouped.items()
+        }
+
+    def export_jsonl(self, path: str, spans: list[Span] | None = None) -> int:
+        """Append spans (default: all) to path as JSON lines; returns the count."""
+        spans = self.spans() if spans is None else spans
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.as_dict()) + "\n")
+        return len(spans)
+
+
+registry = MetricsRegistry()
+
+
+class FlowTimer:
+    """Times the phases of one connection flow (join_room, create_room, ...)."""
+
+    def __init__(self, flow: str, reg: MetricsRegistry | None = None):
+        self.flow = flow
+        self.registry = reg or registry
+        self.flow_id = self.registry.next_flow_id()
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def phase(self, name: str, **labels):
+        """Record how long the block takes; failures are recorded with ok=False."""
+        started = time.time()
+        t0 = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            span = Span(self.flow, self.flow_id, name, started,
+                        time.monotonic() - t0, ok, _safe_labels(labels))
+            self.spans.append(span)
+            self.registry.record(span)
+
+    @property
+    def total(self) -> float:
+        return sum(span.duration for span in self.spans)
+
+
+def start_flow(flow: str) -> FlowTimer:
+    """A FlowTimer recording into the process-wide registry."""
+    return FlowTimer(flow)
+
+
+def export_jsonl(path: str, spans: list[Span] | None = None) -> int:
+    return registry.export_jsonl(path, spans)
@@ -0,0 +1,680 @@
+"""
+src/pipeline.py - The message pipeline shared by every chat mode
+
+Handles:
+  - Codecs turning message bytes into wire payloads: PGP (encrypted mode)
+    or as-is (unsafe mode); they also sign and check the session hello
+  - The hello exchanged on every attach (src/handshake.py), which switches
+    both ends to typed frames, compression and binary payloads when shared
+  - MessagePipeline: UTF-8 -> compression (src/compression.py) -> codec ->
+    typed frame on the chat channel (src/frames.py) -> ReliableChannel
+    (framing, seq/ack, resume) -> backend stream, with the optional
+    datagram path for short frames
+  - The symmetric session mode (src/symmetric.py): once both hellos carry
+    an ephemeral X25519 key, messages are sealed with AES-GCM or
+    ChaCha20-Poly1305 under ratcheting keys instead of PGP
+  - The inbound gate (src/gate.py): rate limit, OpenPGP recipient check and
+    the optional frame MAC, before any payload reaches the codec
+  - Long messages sent in chunks sealed one by one (src/chunking.py) on
+    their own bulk channel, and reassembled as the chunks arrive
+  - Other channels (file transfer, receipts) multiplexed on the same stream
+  - A prioritized send queue (src/sendqueue.py): compression, encryption and
+    writes run on the connection's writer thread, never on the input thread
+  - A loopback benchmark of the whole pipeline, without I2P latency:
+      python -m src.pipeline --backend unix --codec pgp --messages 200
+
+Encrypted and unsafe chats are the same pipeline with a different codec, so
+framing and transport work applies to both.
+"""
+
+import argparse
+import base64
+import itertools
+import os
+import statistics
+import threading
+import time
+
+from .reliable import ReliableChannel, HEARTBEAT_INTERVAL
+from .frames import (
+    Multiplexer, FRAME_VERSION, FRAME_HEADER, CHANNEL_CONTROL, CHANNEL_CHAT, CHANNEL_RECEIPTS,
+    CHANNEL_LONG_TEXT, BULK_CHANNELS, TYPE_TEXT, FLAG_MORE, FLAG_MAC,
+)
+from .gate import InboundGate, MAC_KEY_SIZE, MAC_TAG_SIZE, frame_tag, pgp_key_ids
+from .symmetric import EphemeralKey, SymmetricSession, available_modes, is_sealed
+from .chunking import (
+    Reassembler, MessageTooLarge, CHUNK_SIZE, CHUNK_HEADER, split, pack_chunk, unpack_chunk,
+)
+from .handshake import (
+    Hello, PROTOCOL_VERSION, PAYLOAD_BINARY, PAYLOAD_ARMORED, HandshakeError,
+    is_control, is_hello, pack_hello, parse_hello, negotiate,
+)
+from .transport import MAX_FRAME_SIZE
+from .sendqueue import (
+    SendQueue, SEND_QUEUE_SIZE, DRAIN_TIMEOUT, PRIORITY_CONTROL, PRIORITY_TEXT, PRIORITY_BULK,
+)
+
+SEND_TIMEOUT   = 30   # seconds a message may wait for retransmit window space
+HELLO_WAIT     = 10   # seconds messages wait for the peer's hello when we offer a MAC
+FRAME_OVERHEAD = 9 + FRAME_HEADER   # reliable envelope + typed frame header
+
+
+def channel_priority(channel: int) -> int:
+    """Send queue class of a frame channel: control > text > bulk."""
+    if channel in (CHANNEL_CONTROL, CHANNEL_RECEIPTS):
+        return PRIORITY_CONTROL
+    return PRIORITY_BULK if channel in BULK_CHANNELS else PRIORITY_TEXT
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Codecs
+# ──────────────────────────────────────────────────────────────────────────────
+
+class PlainCodec:
+    """Unsafe mode: message bytes as-is (I2P still encrypts the tunnel)."""
+
+    encrypted = False
+
+    def encode(self, data: bytes) -> bytes:
+        return data
+
+    def decode(self, payload: bytes) -> bytes:
+        return payload
+
+    def sign(self, body: bytes) -> bytes:
+        return b''   # no keys in unsafe mode: the hello goes unsigned
+
+    def verify(self, body: bytes, signature: bytes) -> bool:
+        return True
+
+    def configure(self, negotiated):
+        pass
+
+    def key_ids(self):
+        return None   # nothing to screen payloads against
+
+
+class PgpCodec:
+    """
+    Encrypted mode: PGP to the remote key, decrypted with ours.
+    Messages go out as raw OpenPGP packets (armored=True sends ASCII armor,
+    for peers that predate binary payloads, until their hello says
+    otherwise); both forms are accepted.
+    """
+
+    encrypted = True
+
+    def __init__(self, private_key, remote_pubkey, armored: bool = False):
+        self.private_key = private_key      # unlocked PGPKey
+        self.remote_pubkey = remote_pubkey
+        self.armored = armored
+
+    def encode(self, data: bytes) -> bytes:
+        from .encrypt import pgp_encrypt, pgp_wire_bytes
+        from .compression import is_compressed
+        if is_compressed(data):
+            # Already compressed by the pipeline: no second pass inside PGP
+            message = pgp_encrypt(self.remote_pubkey, bytes(data), compress=False)
+        else:
+            try:
+                # Plain text goes out as a UTF-8 literal, as older peers expect
+                message = pgp_encrypt(self.remote_pubkey, data.decode('utf-8'))
+            except UnicodeDecodeError:
+                # A chunk of a long message, cut inside a character
+                message = pgp_encrypt(self.remote_pubkey, bytes(data))
+        return pgp_wire_bytes(message, self.armored)
+
+    def decode(self, payload: bytes) -> bytes:
+        from pgpy import PGPMessage
+        # from_blob unarmors ASCII armor and parses binary packets as they are
+        message = PGPMessage.from_blob(payload)
+        clear = self.private_key.decrypt(message).message
+        return clear.encode('utf-8') if isinstance(clear, str) else bytes(clear)
+
+    def sign(self, body: bytes) -> bytes:
+        return bytes(self.private_key.sign(body))
+
+    def verify(self, body: bytes, signature: bytes) -> bool:
+        from pgpy import PGPSignature
+        try:
+            return bool(self.remote_pubkey.verify(body, PGPSignature.from_blob(signature)))
+        except Exception:
+            return False   # unparsable, or made by another key
+
+    def configure(self, negotiated):
+        self.armored = negotiated.armored
+
+    def key_ids(self):
+        return pgp_key_ids(self.private_key)
+
+    def seal(self, data: bytes) -> bytes:
+        """data encrypted to the remote key, as binary packets (not a chat message)."""
+        from .encrypt import pgp_encrypt, pgp_wire_bytes
+        return pgp_wire_bytes(pgp_encrypt(self.remote_pubkey, bytes(data), compress=False))
+
+    def open(self, sealed: bytes) -> bytes:
+        return self.decode(sealed)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pipeline
+# ──────────────────────────────────────────────────────────────────────────────
+
+class MessagePipeline:
+    """
+    One chat conversation over any backend stream.
+
+    on_message(text) gets every decoded message; payloads the codec rejects
+    (malformed, or not encrypted for us) are silently dropped.
+    Every attach sends a hello signed by the codec; the peer's hello sets
+    self.negotiated (and fires on_state("negotiated"), or "hello_rejected"
+    if it does not check out). Until then messages go out as bare codec
+    payloads, uncompressed; after it as typed TEXT frames on the chat
+    channel. In encrypted mode the hellos also set up self.session (unless
+    symmetric_modes is [], None meaning every available mode), which then
+    seals messages in place of the codec. Inbound payloads pass self.gate first (with frame_mac, the
+    peer is asked to tag its frames, and once both hellos offered a MAC
+    nothing untagged is accepted; messages wait up to HELLO_WAIT for the
+    peer's hello so that ours are tagged too). Messages over CHUNK_SIZE go out in chunks when the peer's hello
+    allows it (on_state("message_too_large") when one of the peer's is
+    dropped). register() other channels on self.mux and send on them with
+    send_frame(). compressor is a compression.Compressor.
+    Sends are queued (at most queue_size waiting) and run by a writer
+    thread; on_backpressure(active, depth) fires when the queue fills up and
+    drains again. A send that fails on the writer thread fires
+    on_state("send_failed") right away, with the error in self.send_error;
+    later messages are not affected.
+    on_state, reconnect, session_id, heartbeat and on_link are passed to the
+    ReliableChannel (a host adopts the session_id of the peer's RESUME). The pipeline owns
+    datagram_session and closes it with the chat, unless datagram_shared (a room's).
+    answer_hello: send no hello on attach, answer the peer's instead, for a
+    codec that only knows who the peer is once it checked their hello (the
+    host side of a room). Nothing, not even the datagram offer, goes out
+    before that answer, and everything but hellos from the peer is dropped
+    until one checks out (self.hello_accepted).
+    """
+
+    def __init__(self, codec, on_message, on_state=None, reconnect=None,
+                 datagram_session=None, send_timeout: float = SEND_TIMEOUT,
+                 session_id: bytes | None = None, heartbeat: float = HEARTBEAT_INTERVAL,
+                 on_link=None, compressor=None, queue_size: int = SEND_QUEUE_SIZE,
+                 on_backpressure=None, frame_mac: bool = True, rate_limit=None,
+                 symmetric_modes: list[str] | None = None, datagram_shared: bool = False,
+                 answer_hello: bool = False):
+        self.codec = codec
+        self.on_message = on_message
+        self.on_state = on_state or (lambda state: None)
+        self.send_timeout = send_timeout
+        self.channel = ReliableChannel(self._on_payload, on_state, reconnect, session_id,
+                                       heartbeat=heartbeat, on_link=on_link)
+        self.queue = SendQueue(queue_size, self._ready, on_backpressure, self._on_send_error)
+        self.send_error: Exception | None = None   # the last send that failed on the writer
+        self.negotiated = None
+        self.hello_accepted = False   # a hello from the peer checked out
+        self.compressor = compressor
+        self.mux = Multiplexer(self._send_frame)
+        self.mux.register(CHANNEL_CHAT, self._on_chat_frame)
+        self.mux.register(CHANNEL_LONG_TEXT, self._on_long_text_frame)
+        self.reassembler = Reassembler()
+        self._message_ids = itertools.count()
+        # rate_limit: (payloads per second, burst), the configured one if None
+        self.gate = InboundGate(codec.key_ids(),
+                                os.urandom(MAC_KEY_SIZE) if frame_mac and codec.encrypted else None,
+                                *(rate_limit or (None, None)))
+        self._sealed_mac: str | None = None   # our MAC key as sent in the hello
+        self._peer_mac: bytes | None = None   # the key the peer checks our tags with
+        self._hello_deadline: float | None = None   # messages wait for the peer's hello until then
+        # The PGP keys authenticate one X25519 exchange (signed hellos)
+        self.symmetric_modes = [m for m in available_modes()
+                                if symmetric_modes is None or m in symmetric_modes] if codec.encrypted else []
+        self.ephemeral = EphemeralKey() if self.symmetric_modes else None
+        self.session: SymmetricSession | None = None
+        self.answer_hello = answer_hello
+        self.datagram_shared = datagram_shared
+        self.dgram = None
+        if datagram_session is not None:
+            from .datagram import DatagramChannel
+            self.dgram = DatagramChannel(datagram_session, self._on_payload, self._send_stream)
+
+    def attach(self, sock, peer_delivered: int | None = None):
+        self.channel.attach(sock, peer_delivered)
+        if self._hello_deadline is None:
+            self._hello_deadline = time.monotonic() + HELLO_WAIT
+        if not self.answer_hello:
+            self.channel.send(pack_hello(self.hello(), self.codec.sign))
+            if self.dgram is not None:
+                self.channel.send(self.dgram.offer())
+
+    # ── Handshake ────────────────────────────────────────────────────────────
+
+    def hello(self) -> Hello:
+        return Hello(
+            version=PROTOCOL_VERSION,
+            session=self.channel.session_id.hex(),
+            frames=FRAME_VERSION,
+            compression=self.compressor.methods if self.compressor is not None else [],
+            payloads=[PAYLOAD_BINARY, PAYLOAD_ARMORED],
+            symmetric=self.symmetric_modes,
+            max_frame=MAX_FRAME_SIZE,
+            max_message=self.reassembler.max_size,
+            mac=self._mac_offer(),
+            ephemeral=base64.b64encode(self.ephemeral.public).decode('ascii') if self.ephemeral else "",
+        )
+
+    def _mac_offer(self) -> str:
+        if self.gate.mac_key is None:
+            return ""
+        if self._sealed_mac is None:
+            self._sealed_mac = base64.b64encode(self.codec.seal(self.gate.mac_key)).decode('ascii')
+        return self._sealed_mac
+
+    def _on_hello(self, payload: bytes):
+        if not self.gate.admit(len(payload)):
+            return
+        try:
+            theirs = parse_hello(payload, self.codec.verify, self.channel.session_id)
+        except HandshakeError:
+            self.on_state("hello_rejected")
+            return
+        self.hello_accepted = True
+        negotiated = negotiate(self.hello(), theirs)
+        if not self.answer_hello:
+            self._apply_hello(negotiated, theirs)
+            return
+        # On the writer, so nothing typed or sealed leaves before our hello
+        try:
+            self.queue.put(PRIORITY_CONTROL, lambda: self._answer_hello(negotiated, theirs))
+        except ConnectionError:
+            pass   # closing
+
+    def _answer_hello(self, negotiated, theirs: Hello):
+        self._apply_hello(negotiated, theirs)
+        self.channel.send(pack_hello(self.hello(), self.codec.sign), timeout=self.send_timeout)
+        if self.dgram is not None:
+            self.channel.send(self.dgram.offer(), timeout=self.send_timeout)
+
+    def _apply_hello(self, negotiated, theirs: Hello):
+        self.mux.peer_version = negotiated.frames or None
+        if self.compressor is not None:
+            self.compressor.negotiate(negotiated.compression)
+        self.codec.configure(negotiated)
+        self._peer_mac = None
+        # Both ends offered a MAC: from here on the peer tags every frame
+        self.gate.mac_required = negotiated.mac and self.gate.mac_key is not None
+        if negotiated.mac:
+            try:
+                key = self.codec.open(base64.b64decode(theirs.mac))
+                self._peer_mac = bytes(key) if len(key) == MAC_KEY_SIZE else None
+            except Exception:
+                pass   # not sealed to us: send untagged, the peer will drop them
+        self._start_session(negotiated, theirs)
+        self.negotiated = negotiated
+        self.on_state("negotiated")
+
+    def _start_session(self, negotiated, theirs: Hello):
+        if not negotiated.symmetric:
+            self.session = None
+            self.gate.accept_sealed = False
+            return
+        try:
+            peer_public = base64.b64decode(theirs.ephemeral)
+            if self.session is not None and self.session.peer_public == peer_public:
+                return   # same exchange (a re-sent hello): the ratchet goes on
+            self.session = SymmetricSession(negotiated.symmetric, self.ephemeral, peer_public,
+                                            self.channel.session_id, self.symmetric_modes)
+        except ValueError:
+            self.session = None   # unusable key: stay on PGP
+        self.gate.accept_sealed = self.session is not None
+
+    def _encode(self, data: bytes) -> bytes:
+        session = self.session
+        return session.seal(data) if session is not None else self.codec.encode(data)
+
+    def _decode(self, payload: bytes) -> bytes:
+        if self.codec.encrypted and is_sealed(payload):
+            if self.session is None:
+                raise ValueError("Sealed payload before the key exchange")
+            return self.session.open(payload)
+        return self.codec.decode(payload)
+
+    # ── Sending (producer side) ──────────────────────────────────────────────
+
+    def send_text(self, text: str, block: bool = False):
+        """
+        Queue a message. Raises SendQueueFull when the queue is at its limit
+        (unless block, which waits up to send_timeout) and MessageTooLarge
+        when the peer cannot take it.
+        """
+        data = text.encode('utf-8')
+        max_message = self.negotiated.max_message if self.negotiated is not None else 0
+        if len(data) > CHUNK_SIZE and max_message:
+            if len(data) > max_message:
+                raise MessageTooLarge(f"{len(data)} bytes, the peer accepts up to {max_message}")
+            # Chunks ride the bulk class, so lines typed meanwhile overtake them
+            message_id, chunks = next(self._message_ids), split(data)
+            self.queue.put(PRIORITY_BULK, lambda: self._write_chunk(message_id, chunks),
+                           block, self.send_timeout)
+            return
+        limit = self.negotiated.max_frame if self.negotiated is not None else MAX_FRAME_SIZE
+        if len(data) + FRAME_OVERHEAD > limit:
+            # No chunks before the peer's hello: refused here, not on the writer
+            raise MessageTooLarge(f"{len(data)} bytes, the peer takes up to {limit} in one message")
+        self.queue.put(PRIORITY_TEXT, lambda: self._write_text(data), block, self.send_timeout)
+
+    def send_frame(self, channel: int, frame_type: int, body: bytes, flags: int = 0,
+                   block: bool = True):
+        """Queue a typed frame on another channel (the peer must have offered typed frames)."""
+        self.mux.check(channel)
+        self.queue.put(channel_priority(channel),
+                       lambda: self.mux.send(channel, frame_type, body, flags),
+                       block, self.send_timeout)
+
+    def _on_send_error(self, error: Exception):
+        self.send_error = error
+        self.on_state("send_failed")
+
+    # ── Sending (writer thread) ──────────────────────────────────────────────
+
+    def _ready(self, priority: int) -> bool:
+        if priority != PRIORITY_CONTROL and self._awaiting_hello():
+            return False
+        # Bulk waits for its share of the window here, not inside send(),
+        # so the writer stays free for text and control frames meanwhile
+        return priority != PRIORITY_BULK or self.channel.has_window(bulk=True)
+
+    def _awaiting_hello(self) -> bool:
+        # A peer that also offered a MAC drops untagged messages once it has
+        # our hello, and we can only tag them once we have its MAC key
+        return (self.gate.mac_key is not None and self.negotiated is None
+                and self._hello_deadline is not None and time.monotonic() < self._hello_deadline)
+
+    def _write_text(self, data: bytes):
+        if self.compressor is not None:
+            data = self.compressor.pack(data)
+        payload = self._encode(data)
+        limit = self.negotiated.max_frame if self.negotiated is not None else MAX_FRAME_SIZE
+        if len(payload) + FRAME_OVERHEAD + MAC_TAG_SIZE > limit:
+            raise MessageTooLarge(f"{len(payload)} bytes encoded, the peer accepts up to {limit}")
+        self._send_sealed(CHANNEL_CHAT, payload)
+
+    def _write_chunk(self, message_id: int, chunks):
+        """Seal and send the next chunk of a long message; returns the job for the rest."""
+        chunk, last = next(chunks)
+        data = bytes(chunk)
+        if self.compressor is not None:
+            data = self.compressor.pack(data)
+        body = pack_chunk(message_id, self._encode(data))
+        self._send_sealed(CHANNEL_LONG_TEXT, body, 0 if last else FLAG_MORE)
+        if not last:
+            return lambda: self._write_chunk(message_id, chunks)
+
+    def _send_sealed(self, channel: int, body: bytes, flags: int = 0):
+        """A codec payload as a TEXT frame, tagged if the peer asked for it."""
+        if self._peer_mac is not None and self.mux.enabled:
+            body += frame_tag(self._peer_mac, self._mac_context(channel), body)
+            flags |= FLAG_MAC
+        self.mux.send(channel, TYPE_TEXT, body, flags)
+
+    def _mac_context(self, channel: int) -> bytes:
+        return self.channel.session_id + channel.to_bytes(2, 'big')
+
+    def _send_frame(self, payload: bytes, channel: int):
+        if channel in BULK_CHANNELS:
+            self.channel.send(payload, timeout=self.send_timeout, bulk=True)
+        elif self.dgram is None or not self.dgram.send(payload):
+            self._send_stream(payload)
+
+    def _send_stream(self, payload: bytes):
+        self.channel.send(payload, timeout=self.send_timeout)
+
+    def _on_payload(self, payload: bytes):
+        if is_hello(payload):
+            self._on_hello(payload)
+            return
+        if self.answer_hello and not self.hello_accepted:
+            return   # not yet known to be a member: never decrypted, shown or relayed
+        if self.dgram is not None and (self.dgram.handle_offer(payload)
+                                       or self.dgram.handle_resent(payload)):
+            return
+        if is_control(payload) or self.mux.dispatch(payload):
+            return   # unknown control payloads are never fed to the codec
+        payload = self.gate.screen(payload)
+        if payload is not None:
+            self._on_text(bytes(payload))   # bare payload from a peer without typed frames
+
+    def _screen(self, frame, header: int = 0):
+        return self.gate.screen(frame.body, bool(frame.flags & FLAG_MAC),
+                                self._mac_context(frame.channel), header)
+
+    def _on_chat_frame(self, frame):
+        if frame.type == TYPE_TEXT:
+            payload = self._screen(frame)
+            if payload is not None:
+                self._on_text(bytes(payload))
+
+    def _on_long_text_frame(self, frame):
+        if frame.type != TYPE_TEXT:
+            return
+        try:
+            message_id, payload = unpack_chunk(frame.body)
+        except ValueError:
+            return
+        body = self._screen(frame, CHUNK_HEADER)
+        if body is None:
+            self.reassembler.discard(message_id)
+            return
+        payload = body[CHUNK_HEADER:]
+        try:
+            data = self._decode(bytes(payload))
+            if self.compressor is not None:
+                data = self.compressor.unpack(data)
+            text = self.reassembler.feed(message_id, data, not frame.flags & FLAG_MORE)
+        except MessageTooLarge:
+            self.on_state("message_too_large")
+            return
+        except Exception:
+            self.gate.drop("undecryptable")
+            self.reassembler.discard(message_id)
+            return
+        if text is not None:
+            self.on_message(text)
+
+    def _on_text(self, payload: bytes):
+        try:
+            data = self._decode(payload)
+            if self.compressor is not None:
+                data = self.compressor.unpack(data)
+            text = data.decode('utf-8')
+        except Exception:
+            self.gate.drop("undecryptable")
+            return
+        self.on_message(text)
+
+    def close(self, drain: bool = True):
+        # Messages typed just before leaving still go out if the link is up
+        self.queue.close(DRAIN_TIMEOUT if drain and self.channel.attached else 0)
+        self.channel.close()
+        if self.dgram is not None:
+            self.dgram.close()
+            if not self.datagram_shared:
+                self.dgram.session.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Loopback benchmark
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _ephemeral_key():
+    """An in-memory RSA key pair shaped like the ones generate_keypair() writes."""
+    from pgpy import PGPKey, PGPUID
+    from pgpy.constants import PubKeyAlgorithm, KeyFlags, HashAlgorithm, SymmetricKeyAlgorithm
+
+    primary = PGPKey.new(PubKeyAlgorithm.RSAEncryptOrSign, 2048)
+    subkey = PGPKey.new(PubKeyAlgorithm.RSAEncryptOrSign, 2048)
+    primary.add_uid(PGPUID.new("bench", email="bench@argon.local"),
+                    usage={KeyFlags.Sign, KeyFlags.Certify},
+                    hashes=[HashAlgorithm.SHA256], ciphers=[SymmetricKeyAlgorithm.AES256])
+    primary.add_subkey(subkey, usage={KeyFlags.EncryptCommunications, KeyFlags.EncryptStorage})
+    return primary
+
+
+def _connect_pair(backend_name: str):
+    """Return (to_close, client_sock, server_sock) connected over backend_name."""
+    from .transport import get_backend, UnixBackend
+    if backend_name == "pair":
+        a, b = UnixBackend.pair()
+        return [], a, b
+    if backend_name == "sam":
+        from .sam import sam_hello, sam_dest_generate, sam_create_session
+        to_close, pubs = [], []
+        for nickname in ("bench_host", "bench_client"):
+            conn = sam_hello()
+            to_close.append(conn)
+            pub, priv = sam_dest_generate(conn)
+            sam_create_session(conn, nickname, priv)
+            pubs.append(pub)
+        backend = get_backend("sam", "bench_host", pubs[0])
+        client_backend = get_backend("sam", "bench_client")
+    else:
+        backend = client_backend = get_backend(backend_name)
+        to_close = [backend]
+    address = backend.listen()
+    accepted = {}
+    acceptor = threading.Thread(target=lambda: accepted.setdefault("sock", backend.accept(30)))
+    acceptor.start()
+    client = client_backend.connect(address)
+    acceptor.join()
+    return to_close, client, accepted["sock"]
+
+
+def run_benchmark(backend_name: str = "pair", codec_name: str = "plain",
+                  messages: int = 200, size: int = 200, compress: bool = False,
+                  bulk_kb: int = 0, inbound_rate: float = 0, symmetric: bool = True) -> dict:
+    """
+    Send messages one way through two pipelines and time each of them.
+    bulk_kb > 0 runs a file-channel transfer of that size alongside;
+    inbound_rate > 0 rate-limits the receiver's gate (payloads a second,
+    the ones over it are dropped);
+    symmetric=False keeps PGP for every message.
+    """
+    if codec_name == "pgp":
+        key_a, key_b = _ephemeral_key(), _ephemeral_key()
+        codec_a, codec_b = PgpCodec(key_a, key_b.pubkey), PgpCodec(key_b, key_a.pubkey)
+    else:
+        codec_a = codec_b = PlainCodec()
+
+    to_close, sock_a, sock_b = _connect_pair(backend_name)
+    latencies = []
+    done = threading.Event()
+
+    def on_message(text):
+        latencies.append(time.perf_counter() - float(text.split(' ', 1)[0]))
+        if len(latencies) == messages:
+            done.set()
+
+    def compressor():
+        if not compress:
+            return None
+        from .compression import Compressor
+        return Compressor()
+
+    modes = None if symmetric else []
+    sender = MessagePipeline(codec_a, lambda text: None, compressor=compressor(),
+                             symmetric_modes=modes)
+    # Like a host that read the RESUME first: the hellos name the same session
+    receiver = MessagePipeline(codec_b, on_message, compressor=compressor(),
+                               session_id=sender.channel.session_id,
+                               rate_limit=(inbound_rate, max(1.0, inbound_rate)),
+                               symmetric_modes=modes)
+    sender.attach(sock_a)
+    receiver.attach(sock_b)
+    deadline = time.monotonic() + 10
+    while sender.negotiated is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    bulk_received = []
+    if bulk_kb:
+        from .frames import CHANNEL_FILES, TYPE_FILE_CHUNK, BULK_CHUNK_SIZE
+        receiver.mux.register(CHANNEL_FILES, lambda frame: bulk_received.append(len(frame.body)))
+        chunk = os.urandom(BULK_CHUNK_SIZE)
+
+        def transfer():
+            try:
+                for _ in range(bulk_kb * 1024 // BULK_CHUNK_SIZE):
+                    sender.send_frame(CHANNEL_FILES, TYPE_FILE_CHUNK, chunk)
+            except ConnectionError:
+                pass   # the benchmark ended first
+
+        threading.Thread(target=transfer, daemon=True).start()
+    # Chat-like filler, so compression sees realistic text
+    filler = "did you get my message, I think the connection dropped again. "
+    padding = (filler * (size // len(filler) + 1))[:max(0, size - 20)]
+    started = time.perf_counter()
+    try:
+        for _ in range(messages):
+            sender.send_text(f"{time.perf_counter():.9f} {padding}", block=True)
+        # Payloads over the receiver's rate limit never arrive: count them as done
+        deadline = time.monotonic() + 60 + messages
+        while len(latencies) + receiver.gate.stats["rate_limited"] < messages:
+            if done.wait(0.05):
+                break
+            if time.monotonic() > deadline:
+                raise Exception(f"Only {len(latencies)}/{messages} messages arrived")
+        elapsed = time.perf_counter() - started
+    finally:
+        sender.close()
+        receiver.close()
+        for item in to_close:
+            item.close()
+    return {
+        "backend": backend_name,
+        "codec": codec_name,
+        "messages": messages,
+        "delivered": len(latencies),
+        "elapsed_s": elapsed,
+        "msg_per_s": len(latencies) / elapsed,
+        "latency_median_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+        "negotiated": sender.negotiated.describe() if sender.negotiated else "no hello",
+        "compression": sender.compressor.summary() if sender.compressor else "off",
+        "bulk_received_kb": sum(bulk_received) // 1024,
+        "send_queue": sender.queue.summary(),
+        "session": sender.session.summary() if sender.session else "off (PGP per message)",
+        "inbound": receiver.gate.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat message pipeline")
+    parser.add_argument("--backend", default="pair", choices=["pair", "unix", "tcp", "sam"],
+                        help="'sam' runs against the in-process SAM emulator")
+    parser.add_argument("--codec", default="plain", choices=["plain", "pgp"])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--size", type=int, default=200, help="approximate message length")
+    parser.add_argument("--compress", action="store_true", help="enable the compression stage")
+    parser.add_argument("--bulk", type=int, default=0, metavar="KB",
+                        help="send a file-channel transfer of KB alongside the messages")
+    parser.add_argument("--no-symmetric", dest="symmetric", action="store_false",
+                        help="encrypt every message with PGP instead of the symmetric session")
+    parser.add_argument("--inbound-rate", type=float, default=0, metavar="N",
+                        help="rate-limit the receiver to N payloads a second (default: off)")
+    args = parser.parse_args(argv)
+
+    if args.backend == "sam":
+        from . import sam
+        from .sam_emulator import SamEmulator
+        with SamEmulator() as emulator:
+            sam.SAM_HOST, sam.SAM_PORT = emulator.host, emulator.port
+            result = run_benchmark(args.backend, args.codec, args.messages, args.size,
+                                   args.compress, args.bulk, args.inbound_rate,
+                                   args.symmetric)
+    else:
+        result = run_benchmark(args.backend, args.codec, args.messages, args.size,
+                               args.compress, args.bulk, args.inbound_rate,
+                               args.symmetric)
+
+    for key, value in result.items():
+        print(f"{key:>18}: {value:.3f}" if isinstance(value, float) else f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+src/reliable.py - Sequence-numbered frames, acks and resume for Argon Messenger
+
+Handles:
+  - A per-session sequence number on every data frame
+  - Cumulative acks and a bounded retransmit buffer on the sender
+  - Resuming on a new stream from the last acked sequence (duplicates dropped)
+  - Automatic reconnect to the same peer with exponential backoff
+  - A heartbeat: PING/PONG frames on an idle stream measure the round-trip
+    time, keep the tunnels warm and spot a dead peer without waiting for
+    the next send to fail
+  - Write coalescing: frames queued while another thread is writing go out
+    together in that thread's next sendmsg() call
+
+Envelope inside each length-prefixed frame:
+  [1 byte kind][8 bytes BE seq/ack][body]
+    DATA   : seq of this frame, body = payload
+    ACK    : highest contiguous seq delivered so far, no body
+    RESUME : highest contiguous seq delivered so far, body = 16-byte session id
+    PING   : sender's monotonic clock in ns, no body
+    PONG   : the PING value echoed back, no body
+Both ends send RESUME first on every (re)attached stream; each side then
+retransmits whatever the other has not delivered yet. Peers that predate
+PING/PONG ignore them; a stream is only declared dead once its peer has
+answered a PING.
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from .transport import FrameReader, FrameTooLarge, recv_framed_message, send_frames
+
+# ─── Envelope ─────────────────────────────────────────────────────────────────
+KIND_DATA       = 0x01
+KIND_ACK        = 0x02
+KIND_RESUME     = 0x03
+KIND_PING       = 0x04
+KIND_PONG       = 0x05
+SESSION_ID_SIZE = 16
+_ENVELOPE       = struct.Struct('>BQ')
+
+# ─── Retransmit / reconnect parameters ────────────────────────────────────────
+RETRANSMIT_WINDOW      = 256    # unacked frames kept for resend
+RECONNECT_BASE_DELAY   = 1.0    # seconds, doubled after each failed attempt
+RECONNECT_MAX_DELAY    = 60.0
+RECONNECT_MAX_ATTEMPTS = 8
+RESUME_TIMEOUT         = 30.0   # seconds to wait for the peer's RESUME frame
+BULK_WINDOW_SHARE      = 0.5    # part of the window bulk payloads may fill
+
+# ─── Heartbeat parameters ─────────────────────────────────────────────────────
+HEARTBEAT_INTERVAL     = 10.0   # seconds between PINGs (0 disables the heartbeat)
+HEARTBEAT_MISSES       = 3      # intervals of silence before the peer is dead
+RTT_ALPHA              = 1 / 8  # smoothing gains from RFC 6298
+RTT_BETA               = 1 / 4
+
+
+class LinkStats(NamedTuple):
+    """Heartbeat measurements for the current stream (times in ms)."""
+    rtt_ms: float | None        # last sample
+    srtt_ms: float | None       # smoothed
+    jitter_ms: float | None     # smoothed deviation (RFC 6298 RTTVAR)
+    idle_s: float               # seconds since the peer last sent anything
+    pings: int
+    pongs: int
+
+
+def read_resume(sock) -> tuple[bytes, int] | None:
+    """
+    Read the RESUME frame a peer sends first on a new stream.
+    Returns (session_id, peer_delivered), or None if it is not a RESUME.
+    """
+    frame = recv_framed_message(sock)
+    if frame is None or len(frame) != _ENVELOPE.size + SESSION_ID_SIZE:
+        return None
+    kind, delivered = _ENVELOPE.unpack_from(frame)
+    if kind != KIND_RESUME:
+        return None
+    return bytes(frame[_ENVELOPE.size:]), delivered
+
+
+def accept_resume(sock, timeout: float = RESUME_TIMEOUT) -> tuple[bytes, int] | None:
+    """read_resume() on a freshly accepted stream, giving up after timeout."""
+    try:
+        sock.settimeout(timeout)
+        resume = read_resume(sock)
+        sock.settimeout(None)
+    except (OSError, ValueError):
+        return None
+    return resume
+
+
+class ReliableChannel:
+    """
+    One logical chat session that can outlive the stream carrying it.
+
+    on_payload(bytes) is called once per DATA frame, in order.
+    on_state(state) receives "resumed" (peer's RESUME processed), "detached"
+    (stream dropped), "reconnecting" and "lost" (gave up).
+    reconnect() returns a new connected socket; without it the channel just
+    waits for attach() (host side, where the peer dials back in).
+    Every `heartbeat` seconds a PING goes out; on_link(LinkStats) gets each
+    new RTT sample and on_state("dead") fires before a silent stream is
+    dropped.
+    """
+
+    def __init__(self, on_payload, on_state=None, reconnect=None,
+                 session_id: bytes | None = None, window: int = RETRANSMIT_WINDOW,
+                 heartbeat: float = HEARTBEAT_INTERVAL, on_link=None):
+        self.session_id = session_id or os.urandom(SESSION_ID_SIZE)
+        self.on_payload = on_payload
+        self.on_state = on_state or (lambda state: None)
+        self.reconnect = reconnect
+        self.window = window
+        self.heartbeat = heartbeat
+        self.on_link = on_link or (lambda stats: None)
+        self._sock = None
+        self._generation = 0
+        self._synced = False          # peer's RESUME seen on the current stream
+        self._next_seq = 1
+        self._unacked: deque = deque()  # (seq, payload, bulk)
+        self._bulk_unacked = 0
+        self._delivered = 0
+        self._outbox: deque = deque()    # (sock, frame) not written yet
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()   # held by the thread flushing _outbox
+        self._closed = threading.Event()
+        self._reset_link()
+
+    @property
+    def attached(self) -> bool:
+        return self._sock is not None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    # ── Stream management ────────────────────────────────────────────────────
+
+    def attach(self, sock, peer_delivered: int | None = None):
+        """
+        Carry the session over sock. Pass peer_delivered when the peer's
+        RESUME frame was already read (see read_resume).
+        """
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            old, self._sock = self._sock, sock
+            self._synced = False
+            self._reset_link()
+        if old is not None:
+            _close_quietly(old)
+        self._write(sock, _ENVELOPE.pack(KIND_RESUME, self._delivered) + self.session_id)
+        if peer_delivered is not None:
+            self._on_resume(peer_delivered)
+        threading.Thread(target=self._reader, args=(sock, generation),
+                         name="reliable-rx", daemon=True).start()
+        if self.heartbeat > 0:
+            threading.Thread(target=self._heartbeat, args=(sock, generation),
+                             name="reliable-ping", daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        with self._cond:
+            sock, self._sock = self._sock, None
+            self._cond.notify_all()
+        if sock is not None:
+            _close_quietly(sock)
+
+    # ── Sending ──────────────────────────────────────────────────────────────
+
+    def has_window(self, bulk: bool = False) -> bool:
+        """True if send(bulk=bulk) would not wait for window space right now."""
+        with self._cond:
+            if bulk and self._bulk_unacked >= max(1, int(self.window * BULK_WINDOW_SHARE)):
+                return False
+            return len(self._unacked) < self.window
+
+    def send(self, payload: bytes, timeout: float | None = None, bulk: bool = False):
+        """
+        Queue payload under the next sequence number and write it if the
+        stream is up. Blocks while the retransmit window is full; bulk
+        payloads (file transfers) only get BULK_WINDOW_SHARE of it, so the
+        rest is always there for interactive frames.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        bulk_limit = max(1, int(self.window * BULK_WINDOW_SHARE))
+        with self._cond:
+            while not self.closed and (len(self._unacked) >= self.window
+                                       or bulk and self._bulk_unacked >= bulk_limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Peer is not acknowledging, retransmit window full")
+                self._cond.wait(remaining)
+            if self.closed:
+                raise ConnectionError("Session closed")
+            seq = self._next_seq
+            self._next_seq += 1
+            self._unacked.append((seq, payload, bulk))
+            self._bulk_unacked += bulk
+            # Until the peer's RESUME is replayed, new frames only go to
+            # the buffer so the peer never sees a gap. Queueing under _cond
+            # keeps the outbox in sequence order.
+            sock = self._sock if self._synced else None
+            if sock is not None:
+                self._outbox.append((sock, _ENVELOPE.pack(KIND_DATA, seq) + payload))
+        if sock is not None:
+            self._flush()
+
+    def _write(self, sock, frame: bytes):
+        self._outbox.append((sock, frame))
+        self._flush()
+
+    def _flush(self):
+        """
+        Write the outbox. A frame queued while the stream is idle leaves at
+        once; frames queued while another thread is writing are picked up by
+        that thread and leave together in its next sendmsg() call.
+        """
+        outbox = self._outbox
+        while self._write_lock.acquire(blocking=False):
+            try:
+                # Only the lock holder pops, so these are all there
+                batch = [outbox.popleft() for _ in range(len(outbox))]
+                for sock, frames in _by_stream(batch):
+                    try:
+                        send_frames(sock, frames)
+                    except OSError:
+                        _close_quietly(sock)   # the reader notices and detaches
+            finally:
+                self._write_lock.release()
+            # Frames queued after the batch was taken but before the release
+            # found the lock busy: they are ours to write.
+            if not outbox:
+                return
+
+    # ── Receiving ────────────────────────────────────────────────────────────
+
+    def _reader(self, sock, generation: int):
+        reader = FrameReader(sock)
+        try:
+            while not self.closed:
+                try:
+                    frame = reader.read()
+                except FrameTooLarge as e:
+                    # Already skipped, the stream is in sync: ack it without
+                    # delivering, or the peer would replay it on every resume
+                    self._last_heard = time.monotonic()
+                    self._on_frame(sock, memoryview(e.head), deliver=False)
+                    continue
+                if frame is None:
+                    break
+                self._last_heard = time.monotonic()
+                self._on_frame(sock, frame)
+        except Exception:
+            pass
+        self._detached(generation)
+
+    def _on_frame(self, sock, frame: memoryview, deliver: bool = True):
+        if len(frame) < _ENVELOPE.size:
+            return
+        kind, value = _ENVELOPE.unpack_from(frame)
+        if kind == KIND_DATA:
+            with self._cond:
+                fresh = value == self._delivered + 1
+                if fresh:
+                    self._delivered = value
+                delivered = self._delivered
+            if fresh and deliver:
+                try:
+                    # The reader reuses its buffer: the payload gets its own copy
+                    self.on_payload(bytes(frame[_ENVELOPE.size:]))
+                except Exception:
+                    pass   # a bad payload must not tear the stream down
+            # Duplicates and gaps are dropped but still acked, so the
+            # sender learns where we really are.
+            self._write(sock, _ENVELOPE.pack(KIND_ACK, delivered))
+        elif kind == KIND_ACK:
+            self._on_ack(value)
+        elif kind == KIND_RESUME:
+            self._on_resume(value)
+        elif kind == KIND_PING:
+            self._write(sock, _ENVELOPE.pack(KIND_PONG, value))
+        elif kind == KIND_PONG:
+            self._on_pong(value)
+
+    def _on_ack(self, acked: int):
+        with self._cond:
+            while self._unacked and self._unacked[0][0] <= acked:
+                self._bulk_unacked -= self._unacked.popleft()[2]
+            self._cond.notify_all()
+
+    def _on_resume(self, peer_delivered: int):
+        self._on_ack(peer_delivered)
+        with self._cond:
+            sock = self._sock
+            if sock is None:
+                return
+            # Replay and the switch to synced happen together, so frames
+            # sent from now on queue up behind the replayed ones.
+            self._outbox.extend((sock, _ENVELOPE.pack(KIND_DATA, seq) + payload)
+                                for seq, payload, _ in self._unacked)
+            self._synced = True
+        self._flush()
+        self.on_state("resumed")
+
+    # ── Heartbeat ────────────────────────────────────────────────────────────
+
+    def _reset_link(self):
+        """Per-stream RTT state; caller holds _cond (or is __init__)."""
+        self._last_heard = time.monotonic()
+        self._rtt = self._srtt = self._rttvar = None
+        self._pings = self._pongs = 0
+
+    def link_stats(self) -> LinkStats:
+        with self._cond:
+            return LinkStats(
+                *(None if v is None else v * 1000 for v in (self._rtt, self._srtt, self._rttvar)),
+                time.monotonic() - self._last_heard, self._pings, self._pongs,
+            )
+
+    def _heartbeat(self, sock, generation: int):
+        """PING every interval; drop the stream once the peer goes silent."""
+        while not self.closed:
+            with self._cond:
+                if generation != self._generation:
+                    return
+                silent = time.monotonic() - self._last_heard
+                # Only peers that have answered a PING are expected to keep talking
+                dead = self._pongs > 0 and silent > self.heartbeat * HEARTBEAT_MISSES
+                self._pings += 1
+            if dead:
+                self.on_state("dead")
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)   # wakes the reader, which detaches
+                except OSError:
+                    pass
+                _close_quietly(sock)
+                return
+            self._write(sock, _ENVELOPE.pack(KIND_PING, time.monotonic_ns()))
+            if self._closed.wait(self.heartbeat):
+                return
+
+    def _on_pong(self, sent_ns: int):
+        sample = (time.monotonic_ns() - sent_ns) / 1e9
+        if sample < 0:
+            return
+        with self._cond:
+            self._pongs += 1
+            self._rtt = sample
+            if self._srtt is None:
+                self._srtt, self._rttvar = sample, sample / 2
+            else:
+                self._rttvar += RTT_BETA * (abs(self._srtt - sample) - self._rttvar)
+                self._srtt += RTT_ALPHA * (sample - self._srtt)
+        self.on_link(self.link_stats())
+
+    # ── Reconnect ────────────────────────────────────────────────────────────
+
+    def _detached(self, generation: int):
+        with self._cond:
+            if generation != self._generation or self.closed:
+                return
+            sock, self._sock = self._sock, None
+            self._synced = False
+        if sock is not None:
+            _close_quietly(sock)
+        self.on_state("detached")
+        if self.reconnect is not None:
+            self._reconnect_loop()
+
+    def _reconnect_loop(self):
+        delay = RECONNECT_BASE_DELAY
+        for _ in range(RECONNECT_MAX_ATTEMPTS):
+            self.on_state("reconnecting")
+            if self._closed.wait(delay):
+                return
+            try:
+                sock = self.reconnect()
+            except Exception:
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            if self.closed:
+                _close_quietly(sock)
+                return
+            self.attach(sock)
+            return
+        self.on_state("lost")
+        self.close()
+
+
+def _by_stream(batch: list) -> list:
+    """[(sock, frame), ...] -> [(sock, [frame, ...]), ...], keeping the order."""
+    if len(batch) == 1:
+        return [(batch[0][0], [batch[0][1]])]
+    groups = []
+    for sock, frame in batch:
+        if groups and groups[-1][0] is sock:
+            groups[-1][1].append(frame)
+        else:
+            groups.append((sock, [frame]))
+    return groups
+
+
+def _close_quietly(sock):
+    try:
+        sock.close()
+    except Exception:
+        pass
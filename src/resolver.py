@@ -0,0 +1,98 @@
+"""
+src/resolver.py - Cached SAM NAMING LOOKUP for Argon Messenger
+
+Handles:
+  - Resolving .b32.i2p addresses (and .i2p hostnames) to the full base64
+    DEST that STREAM CONNECT and datagrams need
+  - An in-memory LRU cache with a TTL, so re-dialling a contact (reconnects,
+    racing slots, repeat joins) skips the lookup and its leaseSet fetch
+  - Passing full DESTs through untouched
+
+A .b32.i2p name is the SHA-256 of its DEST, so a cached answer cannot go
+stale; the TTL only bounds how long hostnames (and memory) are kept.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .sam import sam_hello, sam_naming_lookup, b32_address, is_b32_address
+
+# ─── Cache parameters ─────────────────────────────────────────────────────────
+RESOLVE_TTL        = 600     # seconds an answer is reused
+RESOLVE_CACHE_SIZE = 256     # names kept, least recently used dropped first
+
+
+def needs_lookup(address: str) -> bool:
+    """True for names (.b32.i2p, .i2p); False for a full base64 DEST."""
+    return address.endswith(".i2p")
+
+
+class NameResolver:
+    """Thread-safe NAMING LOOKUP front end with an LRU+TTL cache."""
+
+    def __init__(self, ttl: float = RESOLVE_TTL, max_entries: int = RESOLVE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._cache: OrderedDict = OrderedDict()   # name -> (dest, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, address: str, conn=None) -> str:
+        """
+        Full DEST for address. conn is an optional SAM control connection
+        (after HELLO, before STREAM CONNECT) to run the lookup on; without
+        it a short-lived one is opened.
+        """
+        if not needs_lookup(address):
+            return address
+        cached = self._get(address)
+        if cached is not None:
+            return cached
+        if conn is not None:
+            dest = sam_naming_lookup(conn, address)
+        else:
+            with sam_hello() as lookup_conn:
+                dest = sam_naming_lookup(lookup_conn, address)
+        # Never trust a bridge answer that does not hash to the b32 we asked for
+        if is_b32_address(address) and b32_address(dest) != address:
+            raise Exception(f"NAMING LOOKUP returned a DEST that does not match {address}")
+        self._put(address, dest)
+        return dest
+
+    def invalidate(self, address: str):
+        with self._lock:
+            self._cache.pop(address, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _get(self, address: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(address)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._cache[address]
+                self.misses += 1
+                return None
+            self._cache.move_to_end(address)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, address: str, dest: str):
+        with self._lock:
+            self._cache[address] = (dest, time.monotonic() + self.ttl)
+            self._cache.move_to_end(address)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+
+resolver = NameResolver()
+
+
+def resolve(address: str, conn=None) -> str:
+    """Full DEST for a .b32.i2p/.i2p name or DEST, through the process-wide cache."""
+    return resolver.resolve(address, conn)
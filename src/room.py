@@ -0,0 +1,279 @@
+"""
+src/room.py - Multi-peer rooms with host-side fan-out for Argon Messenger
+
+Handles:
+  - Accepting any number of peers on one hosted SAM session
+  - A MessagePipeline (src/pipeline.py) per peer, on the host side of the
+    session hello: the peer's hello must be signed by one of the member
+    keys, and the host answers it, so each peer negotiates typed frames and
+    the rest with the host as in a 1:1 chat
+  - A symmetric session (src/symmetric.py) per peer whose hello offered
+    one: messages to and from that peer are sealed under its own ratchet,
+    with no PGP operation per message
+  - Encrypting each message once for every member key (worker pool), the
+    payload shared by all peers that still use PGP
+  - A bounded send queue and writer thread per peer, so one slow I2P
+    tunnel never stalls the rest of the room
+  - A rate limit, OpenPGP recipient check and frame MAC per peer
+    (src/gate.py) before the host spends a decryption on anything
+  - Optionally, one DATAGRAM session for the whole room: short frames go to
+    each peer that offered a datagram DEST, the stream stays the fallback
+
+Every peer encrypts to the host's key, or seals to its session with the
+host. The host decrypts, shows the message and relays it to each other peer
+in that peer's session, or as one multi-recipient PGP message.
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .encrypt import pgp_encrypt_multi, pgp_wire_bytes
+from .pipeline import MessagePipeline, PgpCodec
+from .sendqueue import SendQueueFull
+from .chunking import MessageTooLarge
+from .reliable import HEARTBEAT_INTERVAL, accept_resume
+from .acceptor import StreamAcceptor, ACCEPT_CONCURRENCY
+
+# ─── Fan-out parameters ───────────────────────────────────────────────────────
+FANOUT_WORKERS    = 4     # concurrent PGP encryptions
+PEER_QUEUE_SIZE   = 256   # messages queued per peer before it is dropped as too slow
+RESUME_GRACE      = 120   # seconds a dropped peer keeps its seat to reconnect
+SHARED_PAYLOADS   = 64    # recent multi-recipient payloads kept for the peers' writers
+
+
+class _MemberCodec(PgpCodec):
+    """
+    PgpCodec for one room peer. The peer is whichever member signed its
+    hello; what we send is the room's payload for every member key.
+    """
+
+    def __init__(self, room):
+        super().__init__(room.private_key, None, room.armored)
+        self.room = room
+
+    def encode(self, data: bytes) -> bytes:
+        return self.room._shared_payload(data, self.armored)
+
+    def verify(self, body: bytes, signature: bytes) -> bool:
+        for key in self.room.member_keys:
+            if PgpCodec(self.private_key, key).verify(body, signature):
+                self.remote_pubkey = key
+                return True
+        return False
+
+
+class _Peer:
+    """
+    One room member: a MessagePipeline whose ReliableChannel survives
+    stream drops, with the Negotiated settings of its hello once it sent one.
+    A peer whose hello is not signed by a member key is dropped; until its
+    hello checks out it is sent nothing and nothing it sends is relayed.
+    """
+
+    def __init__(self, room, peer_id: int, session_id: bytes):
+        self.room = room
+        self.id = peer_id
+        self.label = f"peer{peer_id}"
+        self.pipeline = MessagePipeline(
+            _MemberCodec(room), self._on_message, self._on_state,
+            datagram_session=room.datagram_session, datagram_shared=True,
+            send_timeout=RESUME_GRACE, session_id=session_id, heartbeat=room.heartbeat,
+            queue_size=PEER_QUEUE_SIZE, frame_mac=room.frame_mac,
+            symmetric_modes=room.symmetric_modes,
+            answer_hello=True,
+        )
+        self.channel = self.pipeline.channel
+        self.closed = threading.Event()
+        self._grace: threading.Timer | None = None
+
+    @property
+    def negotiated(self):
+        return self.pipeline.negotiated
+
+    def start(self, sock, peer_delivered: int):
+        self.pipeline.attach(sock, peer_delivered)
+
+    def resume(self, sock, peer_delivered: int):
+        """The peer dialled back in after a drop: carry on over the new stream."""
+        if self._grace is not None:
+            self._grace.cancel()
+        self.pipeline.attach(sock, peer_delivered)
+
+    def send(self, text: str):
+        """Queue a message; SendQueueFull if this peer cannot keep up."""
+        if not self.closed.is_set():
+            self.pipeline.send_text(text)
+
+    def _on_message(self, text: str):
+        self.room._on_message(self, text)
+
+    def _on_state(self, state: str):
+        if state == "dead":
+            self.room.on_event("timeout", self.label, "")
+        elif state == "detached" and not self.closed.is_set():
+            # Keep the seat (and the unacked frames) for a while so the peer
+            # can resume; drop it for good if it does not come back.
+            self._grace = threading.Timer(RESUME_GRACE, self.room._drop,
+                                          args=(self, "left the room"))
+            self._grace.daemon = True
+            self._grace.start()
+        elif state == "negotiated":
+            self.room.on_event("negotiated", self.label, self.negotiated.describe())
+        elif state == "hello_rejected":
+            self.room._drop(self, "hello not signed by a member key")
+        elif state == "message_too_large":
+            self.room.on_event("error", self.label, "A message exceeded the size limit and was dropped")
+        elif state == "send_failed" and not self.closed.is_set():
+            self.room.on_event("error", self.label, f"Message not sent: {self.pipeline.send_error}")
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if self._grace is not None:
+            self._grace.cancel()
+        self.pipeline.close(drain=False)
+
+
+class Room:
+    """
+    A hosted room holding N peers.
+    on_event(kind, label, text) is called for "join", "resume", "leave",
+    "timeout" (heartbeat found the peer's stream dead), "negotiated" (text
+    describes what the peer's hello settled), "message" and "error" events
+    so the chat UI can render them.
+    """
+
+    def __init__(self, private_key, member_keys, on_event, workers: int = FANOUT_WORKERS,
+                 datagram_session=None, heartbeat: float = HEARTBEAT_INTERVAL,
+                 armored: bool = False, frame_mac: bool = True,
+                 symmetric_modes: list[str] | None = None):
+        self.private_key = private_key
+        self.heartbeat = heartbeat
+        self.armored = armored   # ASCII armor on the wire, for older peers
+        self.frame_mac = frame_mac   # ask each peer to tag its frames
+        self.symmetric_modes = symmetric_modes   # offered to each peer, None for all available
+        self.datagram_session = datagram_session   # owned: closed with the room
+        self.member_keys = list(member_keys)
+        self.on_event = on_event
+        self._peers: dict[int, _Peer] = {}
+        self._sessions: dict[bytes, _Peer] = {}   # resume session id -> peer
+        self._shared: OrderedDict = OrderedDict()   # (data, armored) -> future payload
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="room-fanout")
+        self._acceptor: StreamAcceptor | None = None
+        self._closed = threading.Event()
+
+    def peer_count(self) -> int:
+        with self._lock:
+            return len(self._peers)
+
+    # ── Accept loop ──────────────────────────────────────────────────────────
+
+    def serve(self, nickname: str, concurrency: int = ACCEPT_CONCURRENCY, mode: str = "accept"):
+        """
+        Keep accepting peers on SAM session `nickname` in the background,
+        with `concurrency` STREAM ACCEPTs armed (or one STREAM FORWARD).
+        """
+        self._acceptor = StreamAcceptor(
+            nickname, self._on_stream, concurrency, mode,
+            on_error=lambda e: self.on_event("error", "room", f"Accept failed: {e}"),
+        ).start()
+
+    def _on_stream(self, conn, peer_dest: str):
+        # Every stream opens with a RESUME frame naming its session
+        resume = accept_resume(conn)
+        if resume is None:
+            conn.close()
+            return
+        self.add_peer(conn, *resume)
+
+    def add_peer(self, sock, session_id: bytes, peer_delivered: int = 0) -> int:
+        """Seat a new peer, or resume the one that owns session_id."""
+        with self._lock:
+            if self._closed.is_set():
+                sock.close()
+                return 0
+            known = self._sessions.get(session_id)
+            if known is None:
+                peer = _Peer(self, next(self._ids), session_id)
+                self._peers[peer.id] = peer
+                self._sessions[session_id] = peer
+        if known is not None:
+            known.resume(sock, peer_delivered)
+            self.on_event("resume", known.label, "")
+            return known.id
+        peer.start(sock, peer_delivered)
+        self.on_event("join", peer.label, "")
+        return peer.id
+
+    # ── Fan-out ──────────────────────────────────────────────────────────────
+
+    def _encrypt(self, data: bytes, armored: bool) -> bytes:
+        try:
+            message = data.decode('utf-8')   # a UTF-8 literal, as older peers expect
+        except UnicodeDecodeError:
+            message = data                   # a chunk cut inside a character
+        return pgp_wire_bytes(pgp_encrypt_multi(self.member_keys, message), armored)
+
+    def _shared_payload(self, data: bytes, armored: bool) -> bytes:
+        """
+        The payload of data for every member key, encrypted once (in the
+        pool) however many peers' writers ask for it.
+        """
+        key = (bytes(data), armored)
+        with self._lock:
+            future = self._shared.get(key)
+            if future is None:
+                future = self._shared[key] = self._pool.submit(self._encrypt, *key)
+                while len(self._shared) > SHARED_PAYLOADS:
+                    self._shared.popitem(last=False)
+        return future.result()
+
+    def broadcast(self, text: str, exclude: int | None = None):
+        """
+        Queue text for every other peer whose hello checked out; each peer's
+        writer encodes it.
+        """
+        with self._lock:
+            targets = [p for pid, p in self._peers.items()
+                       if pid != exclude and p.pipeline.hello_accepted]
+        for peer in targets:
+            try:
+                peer.send(text)
+            except SendQueueFull:
+                self._drop(peer, "too slow, disconnected")
+            except MessageTooLarge as e:
+                self.on_event("error", peer.label, f"Message not relayed: {e}")
+            except ConnectionError:
+                pass   # closed meanwhile
+
+    def _on_message(self, peer: _Peer, text: str):
+        self.on_event("message", peer.label, text)
+        self.broadcast(f"{peer.label}: {text}", exclude=peer.id)
+
+    def _drop(self, peer: _Peer, reason: str):
+        with self._lock:
+            if self._peers.pop(peer.id, None) is None:
+                return
+            self._sessions.pop(peer.channel.session_id, None)
+        peer.close()
+        if not self._closed.is_set():
+            self.on_event("leave", peer.label, reason)
+
+    def close(self):
+        self._closed.set()
+        if self._acceptor is not None:
+            self._acceptor.stop()
+        with self._lock:
+            peers = list(self._peers.values())
+            self._peers.clear()
+            self._sessions.clear()
+        for peer in peers:
+            peer.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.datagram_session is not None:
+            self.datagram_session.close()
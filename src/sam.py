@@ -0,0 +1,499 @@
+"""
+src/sam.py - Buffered SAM v3 control channel for Argon Messenger
+
+Handles:
+  - One buffered reader per SAM socket (no per-byte recv syscalls)
+  - Reply parsing into KEY=VALUE options, including quoted values
+  - The blocking SAM commands used by the chat workflows
+  - Low-latency socket mode (TCP_NODELAY, sized buffers) on every SAM socket
+
+Once a STREAM CONNECT/ACCEPT succeeds, the same SamConnection is used as the
+data socket: bytes the reader already pulled past the reply line are handed
+out first by recv()/recv_into(), so nothing is lost at the protocol switch.
+"""
+
+import base64
+import hashlib
+import re
+import socket
+from typing import NamedTuple
+
+SAM_HOST     = "127.0.0.1"
+SAM_PORT     = 7656
+SAM_UDP_PORT = 7655   # where DATAGRAM/RAW sessions send their datagrams
+
+# ─── Protocol constants ───────────────────────────────────────────────────────
+HELLO_CMD       = "HELLO VERSION MIN=3.1 MAX=3.3"
+SIGNATURE_TYPE  = 7           # EdDSA-SHA512-Ed25519
+SESSION_OPTIONS = f"i2cp.leaseSetEncType=4 SIGNATURE_TYPE={SIGNATURE_TYPE}"
+
+# ─── Addresses ────────────────────────────────────────────────────────────────
+I2P_B64_ALT  = b'-~'    # I2P base64 uses '-' and '~' instead of '+' and '/'
+_B32_ADDRESS = re.compile(r'^[a-z2-7]{52,}\.b32\.i2p$')
+_DEST        = re.compile(r'^[A-Za-z0-9\-~]{516,}={0,2}$')   # 387+ bytes of I2P base64
+
+# ─── Socket tuning ────────────────────────────────────────────────────────────
+# Chat frames are small and interactive: Nagle would hold them back waiting
+# for an ACK from the bridge. Buffers sized for a burst of frames in flight.
+LOW_LATENCY_SOCKETS = True
+SOCKET_BUFFER_SIZE  = 256 * 1024   # SO_SNDBUF / SO_RCVBUF, 0 keeps the OS default
+
+# ─── Reader parameters ────────────────────────────────────────────────────────
+RECV_CHUNK    = 4096
+MAX_LINE_SIZE = 64 * 1024   # a DEST REPLY is ~1.5 KB, anything this big is junk
+
+
+class SamError(Exception):
+    """A SAM command returned something other than RESULT=OK."""
+
+    def __init__(self, message: str, result: str | None = None):
+        super().__init__(message)
+        self.result = result
+
+
+class SamReply(NamedTuple):
+    """A parsed SAM reply line, e.g. 'SESSION STATUS RESULT=OK'."""
+    topic: str
+    kind: str
+    options: dict
+
+    @property
+    def result(self) -> str | None:
+        return self.options.get("RESULT")
+
+    @property
+    def ok(self) -> bool:
+        return self.result == "OK"
+
+    def get(self, key: str, default=None):
+        return self.options.get(key, default)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Reply parsing
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _tokenize(line: str) -> list[str]:
+    """
+    Split a SAM line on whitespace, keeping double-quoted values together.
+    Backslash escapes a quote or a backslash inside a quoted value.
+    """
+    tokens = []
+    current = []
+    in_quotes = False
+    has_token = False
+    i = 0
+    n = len(line)
+    while i < n:
+        ch = line[i]
+        if in_quotes:
+            if ch == '\\' and i + 1 < n and line[i + 1] in ('"', '\\'):
+                current.append(line[i + 1])
+                i += 2
+                continue
+            if ch == '"':
+                in_quotes = False
+            else:
+                current.append(ch)
+        elif ch == '"':
+            in_quotes = True
+            has_token = True
+        elif ch in (' ', '\t'):
+            if has_token:
+                tokens.append(''.join(current))
+                current = []
+                has_token = False
+        else:
+            current.append(ch)
+            has_token = True
+        i += 1
+    if has_token:
+        tokens.append(''.join(current))
+    return tokens
+
+
+def parse_sam_reply(line: str) -> SamReply:
+    """
+    Parse 'TOPIC KIND KEY=VALUE KEY="quoted value" ...' into a SamReply.
+    Values keep everything after the first '=' (base64 DESTs contain '=').
+    A bare key without '=' is stored with an empty string value.
+    """
+    tokens = _tokenize(line.strip())
+    topic = tokens[0] if tokens else ""
+    kind = tokens[1] if len(tokens) > 1 else ""
+    options = {}
+    for token in tokens[2:]:
+        key, sep, value = token.partition('=')
+        options[key] = value if sep else ""
+    return SamReply(topic, kind, options)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Socket tuning
+# ──────────────────────────────────────────────────────────────────────────────
+
+def configure_sockets(low_latency: bool = True, buffer_size: int = SOCKET_BUFFER_SIZE):
+    """Set the mode tune_socket() applies to every socket opened from now on."""
+    global LOW_LATENCY_SOCKETS, SOCKET_BUFFER_SIZE
+    LOW_LATENCY_SOCKETS = low_latency
+    SOCKET_BUFFER_SIZE = max(0, buffer_size)
+
+
+def tune_socket(sock: socket.socket):
+    """
+    Low-latency mode: TCP_NODELAY, and SO_SNDBUF/SO_RCVBUF of
+    SOCKET_BUFFER_SIZE. Options a socket family does not have are skipped.
+    """
+    if not LOW_LATENCY_SOCKETS:
+        return
+    try:
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if SOCKET_BUFFER_SIZE:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    except OSError:
+        pass   # tuning is best effort, the socket works without it
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Buffered connection
+# ──────────────────────────────────────────────────────────────────────────────
+
+class SamConnection:
+    """
+    A SAM socket with its own read buffer.
+
+    read_line() pulls RECV_CHUNK bytes at a time and keeps whatever follows the
+    newline for the next call. After the control handshake the object behaves
+    like the underlying socket (sendall/sendmsg/recv/recv_into/close/fileno/
+    settimeout), draining the buffered bytes first.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._buf = bytearray()
+        self._scanned = 0   # bytes of _buf already searched for '\n'
+
+    @classmethod
+    def open(cls, host: str | None = None, port: int | None = None, timeout=None):
+        """Connect to the SAM bridge (defaults to SAM_HOST:SAM_PORT)."""
+        sock = socket.create_connection(
+            (host or SAM_HOST, port or SAM_PORT), timeout=timeout
+        )
+        tune_socket(sock)
+        return cls(sock)
+
+    # ── Control channel ──────────────────────────────────────────────────────
+
+    def send_line(self, line: str):
+        """Send a line that ends with \\n"""
+        self.sock.sendall((line + "\n").encode())
+
+    def read_line(self) -> str | None:
+        """
+        Return the next line without its trailing newline, or None on EOF.
+        Raises socket.timeout if the socket has a timeout and it expires.
+        """
+        while True:
+            idx = self._buf.find(b'\n', self._scanned)
+            if idx >= 0:
+                line = bytes(self._buf[:idx])
+                del self._buf[:idx + 1]
+                self._scanned = 0
+                return line.rstrip(b'\r').decode()
+            self._scanned = len(self._buf)
+            if self._scanned > MAX_LINE_SIZE:
+                raise SamError(f"SAM line exceeds {MAX_LINE_SIZE} bytes")
+            chunk = self.sock.recv(RECV_CHUNK)
+            if not chunk:
+                return None
+            self._buf += chunk
+
+    def read_reply(self) -> SamReply:
+        """Read and parse one reply line. EOF is reported as a SamError."""
+        line = self.read_line()
+        if line is None:
+            raise SamError("SAM bridge closed the connection")
+        return parse_sam_reply(line)
+
+    def command(self, line: str) -> SamReply:
+        """Send one command and return its parsed reply."""
+        self.send_line(line)
+        return self.read_reply()
+
+    def has_buffered_data(self) -> bool:
+        """True if bytes are waiting in the read buffer (select() cannot see them)."""
+        return bool(self._buf)
+
+    # ── Socket-like data phase ───────────────────────────────────────────────
+
+    def recv(self, n: int) -> bytes:
+        if self._buf:
+            data = bytes(self._buf[:n])
+            del self._buf[:n]
+            self._scanned = 0
+            return data
+        return self.sock.recv(n)
+
+    def recv_into(self, buffer, nbytes: int = 0) -> int:
+        if not nbytes:
+            nbytes = len(buffer)
+        if self._buf:
+            n = min(nbytes, len(self._buf))
+            memoryview(buffer)[:n] = self._buf[:n]
+            del self._buf[:n]
+            self._scanned = 0
+            return n
+        return self.sock.recv_into(buffer, nbytes)
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def sendmsg(self, buffers) -> int:
+        return self.sock.sendmsg(buffers)
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def gettimeout(self):
+        return self.sock.gettimeout()
+
+    def shutdown(self, how):
+        self.sock.shutdown(how)
+
+    def close(self):
+        self._buf.clear()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# SAM commands
+# ──────────────────────────────────────────────────────────────────────────────
+
+class StreamHeader(NamedTuple):
+    """First line of an accepted or forwarded stream: who connected, on which ports."""
+    dest: str
+    from_port: int
+    to_port: int
+
+
+def parse_stream_header(line: str) -> StreamHeader:
+    """
+    Parse '<dest> [FROM_PORT=n TO_PORT=n]' (ports since SAM 3.2). Raises
+    SamError for anything else, e.g. a 'STREAM STATUS RESULT=...' reply the
+    bridge sends instead when the accept fails after all.
+    """
+    dest, _, rest = line.strip().partition(' ')
+    if dest == "STREAM":
+        reply = parse_sam_reply(line)
+        raise SamError(f"Inbound stream failed: {reply.get('MESSAGE') or reply.result}",
+                       reply.result)
+    if not _DEST.match(dest):
+        raise SamError("Malformed stream header: not a destination")
+    ports = {}
+    for token in _tokenize(rest):
+        key, _, value = token.partition('=')
+        if key in ("FROM_PORT", "TO_PORT"):
+            if not value.isdigit() or int(value) > 65535:
+                raise SamError(f"Malformed stream header: {key}={value}")
+            ports[key] = int(value)
+    return StreamHeader(dest, ports.get("FROM_PORT", 0), ports.get("TO_PORT", 0))
+
+
+def check_reply(reply: SamReply, topic: str, kind: str, what: str):
+    """Raise SamError unless reply is 'topic kind RESULT=OK'."""
+    if reply.topic != topic or reply.kind != kind:
+        raise SamError(f"{what} failed: unexpected reply {reply.topic} {reply.kind}")
+    if not reply.ok:
+        detail = reply.get("MESSAGE") or reply.result
+        raise SamError(f"{what} failed: {detail}", reply.result)
+
+
+def sam_hello(host: str | None = None, port: int | None = None) -> SamConnection:
+    """Open a SAM connection and do the HELLO handshake"""
+    conn = SamConnection.open(host, port)
+    try:
+        reply = conn.command(HELLO_CMD)
+        check_reply(reply, "HELLO", "REPLY", "SAM handshake")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def dest_from_reply(reply: SamReply) -> tuple[str, str]:
+    """Extract (pub, priv) from a DEST REPLY."""
+    pub = reply.get("PUB")
+    priv = reply.get("PRIV")
+    if reply.topic != "DEST" or reply.kind != "REPLY" or not pub or not priv:
+        raise SamError(f"Invalid DEST GENERATE reply: {reply.topic} {reply.kind}")
+    return pub, priv
+
+
+def _session_options(options: str) -> str:
+    return f"{SESSION_OPTIONS} {options}" if options else SESSION_OPTIONS
+
+
+def sam_dest_generate(conn: SamConnection) -> tuple[str, str]:
+    """Generate a new I2P DEST, returns (pub, priv)"""
+    return dest_from_reply(conn.command(f"DEST GENERATE SIGNATURE_TYPE={SIGNATURE_TYPE}"))
+
+
+def sam_create_session(conn: SamConnection, nickname: str, privkey: str, options: str = ""):
+    """
+    Create a STREAM session bound to this control connection.
+    options are extra i2cp options, e.g. a tunnel profile (src/tunnels.py).
+    """
+    reply = conn.command(
+        f"SESSION CREATE STYLE=STREAM ID={nickname} DESTINATION={privkey} "
+        f"{_session_options(options)}"
+    )
+    check_reply(reply, "SESSION", "STATUS", "SESSION CREATE")
+
+
+def sam_create_primary_session(conn: SamConnection, nickname: str, privkey: str,
+                               options: str = ""):
+    """
+    Create a SAM 3.3 PRIMARY session: one destination and one tunnel set
+    that STREAM subsessions are attached to with sam_session_add().
+    """
+    reply = conn.command(
+        f"SESSION CREATE STYLE=PRIMARY ID={nickname} DESTINATION={privkey} "
+        f"{_session_options(options)}"
+    )
+    check_reply(reply, "SESSION", "STATUS", "SESSION CREATE PRIMARY")
+
+
+def sam_session_add(conn: SamConnection, sub_id: str, style: str = "STREAM",
+                    listen_port: int = 0, options: str = ""):
+    """
+    Attach a subsession to the PRIMARY session owned by conn.
+    Each subsession needs a unique (style, LISTEN_PORT) pair.
+    """
+    cmd = f"SESSION ADD STYLE={style} ID={sub_id} FROM_PORT={listen_port} LISTEN_PORT={listen_port}"
+    if options:
+        cmd += " " + options
+    check_reply(conn.command(cmd), "SESSION", "STATUS", "SESSION ADD")
+
+
+def sam_session_remove(conn: SamConnection, sub_id: str):
+    """Detach a subsession from its PRIMARY session"""
+    check_reply(conn.command(f"SESSION REMOVE ID={sub_id}"), "SESSION", "STATUS", "SESSION REMOVE")
+
+
+def sam_create_datagram_session(conn: SamConnection, nickname: str, privkey: str,
+                                forward_port: int, forward_host: str = "127.0.0.1",
+                                options: str = ""):
+    """
+    Create a repliable DATAGRAM session. Inbound datagrams are forwarded by
+    the bridge to forward_host:forward_port (UDP), each prefixed with a
+    '<dest> FROM_PORT=n TO_PORT=n' line naming the (signature-checked) sender.
+    """
+    reply = conn.command(
+        f"SESSION CREATE STYLE=DATAGRAM ID={nickname} DESTINATION={privkey} "
+        f"PORT={forward_port} HOST={forward_host} {_session_options(options)}"
+    )
+    check_reply(reply, "SESSION", "STATUS", "SESSION CREATE DATAGRAM")
+
+
+def datagram_header(nickname: str, dest_pub: str, to_port: int = 0) -> bytes:
+    """First line of a datagram sent to the bridge's UDP port"""
+    line = f"3.0 {nickname} {dest_pub}"
+    if to_port:
+        line += f" TO_PORT={to_port}"
+    return (line + "\n").encode()
+
+
+def parse_forwarded_datagram(packet: bytes) -> tuple[str, bytes] | None:
+    """Split a forwarded repliable datagram into (sender_dest, payload)."""
+    header, sep, payload = packet.partition(b'\n')
+    if not sep or not header:
+        return None
+    return header.split(b' ', 1)[0].decode('ascii', 'replace'), payload
+
+
+def i2p_b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw, altchars=I2P_B64_ALT).decode()
+
+
+def i2p_b64decode(text: str) -> bytes:
+    return base64.b64decode(text.encode(), altchars=I2P_B64_ALT, validate=True)
+
+
+def b32_address(pub: str) -> str:
+    """The .b32.i2p name of a base64 destination (SHA-256 of its bytes)."""
+    digest = hashlib.sha256(i2p_b64decode(pub)).digest()
+    return base64.b32encode(digest).decode().lower().rstrip('=') + ".b32.i2p"
+
+
+def is_b32_address(name: str) -> bool:
+    return bool(_B32_ADDRESS.match(name))
+
+
+def sam_naming_lookup(conn: SamConnection, name: str) -> str:
+    """Resolve a name (.b32.i2p, .i2p host or ME) to a full base64 DEST"""
+    reply = conn.command(f"NAMING LOOKUP NAME={name}")
+    check_reply(reply, "NAMING", "REPLY", "NAMING LOOKUP")
+    value = reply.get("VALUE")
+    if not value:
+        raise SamError(f"NAMING LOOKUP failed: no value for {name}", "KEY_NOT_FOUND")
+    return value
+
+
+def split_dest_port(raw: str) -> tuple[str, int]:
+    """
+    Split 'DEST:PORT' into (DEST, PORT). ':' is not part of the I2P base64
+    alphabet, so a bare DEST comes back with port 0.
+    """
+    dest, sep, port = raw.strip().rpartition(':')
+    if sep and port.isdigit() and 0 < int(port) < 65536:
+        return dest, int(port)
+    return raw.strip(), 0
+
+
+def sam_stream_connect(conn: SamConnection, nickname: str, dest_pub: str, to_port: int = 0):
+    """Ask for a SAM stream to the given DEST (and virtual port, if any)"""
+    cmd = f"STREAM CONNECT ID={nickname} DESTINATION={dest_pub}"
+    if to_port:
+        cmd += f" TO_PORT={to_port}"
+    check_reply(conn.command(cmd), "STREAM", "STATUS", "STREAM CONNECT")
+
+
+def sam_stream_accept(conn: SamConnection, nickname: str, timeout: float | None = None):
+    """
+    Wait for an inbound stream on the session.
+    timeout=None blocks until the bridge answers.
+    """
+    conn.send_line(f"STREAM ACCEPT ID={nickname}")
+    previous = conn.gettimeout()
+    conn.settimeout(timeout)
+    try:
+        reply = conn.read_reply()
+    except socket.timeout:
+        raise SamError(f"Timeout: No inbound connexion after {timeout:.0f}s")
+    finally:
+        conn.settimeout(previous)
+    check_reply(reply, "STREAM", "STATUS", "STREAM ACCEPT")
+
+
+def sam_stream_forward(conn: SamConnection, nickname: str, port: int,
+                       host: str = "127.0.0.1", silent: bool = False):
+    """
+    Ask the bridge to connect every inbound stream of the session to
+    host:port. The forward lasts as long as conn stays open; unless silent,
+    each forwarded stream starts with the '<dest> FROM_PORT=n TO_PORT=n' line.
+    """
+    cmd = f"STREAM FORWARD ID={nickname} PORT={port} HOST={host}"
+    if silent:
+        cmd += " SILENT=true"
+    check_reply(conn.command(cmd), "STREAM", "STATUS", "STREAM FORWARD")
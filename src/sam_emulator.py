@@ -0,0 +1,597 @@
+"""
+src/sam_emulator.py - Local SAM v3 bridge stand-in for offline tests and benchmarks
+
+Implements the subset of SAM v3.3 Argon uses, routing streams between local
+sessions in-process instead of through I2P:
+  - HELLO VERSION
+  - DEST GENERATE
+  - SESSION CREATE (STYLE=STREAM / PRIMARY / DATAGRAM), SESSION ADD / REMOVE
+  - STREAM CONNECT / ACCEPT / FORWARD
+  - Repliable datagrams sent to the UDP port, forwarded to the session's
+    PORT/HOST with the sender's DEST header line
+  - NAMING LOOKUP (ME, full DESTs, .b32.i2p of local sessions, static hosts)
+
+Artificial delays model the real router: tunnel_build_delay on every
+SESSION CREATE, plus stream_latency (per delivered chunk) and byte_latency
+(per byte) on stream data. Datagrams get stream_latency and are dropped
+with probability datagram_loss.
+
+Usage:
+  - pytest: add `pytest_plugins = ["src.sam_emulator"]` to a conftest and
+    request the `sam_bridge` fixture; src.sam is pointed at the emulator.
+  - standalone: python -m src.sam_emulator --port 7656 --build-delay 2
+"""
+
+import argparse
+import os
+import queue
+import random
+import select
+import socket
+import threading
+import time
+
+from . import sam
+from .sam import SamConnection, parse_sam_reply, i2p_b64encode, i2p_b64decode, b32_address
+
+# ─── I2P destination layout (Ed25519 signing key + key certificate) ──────────
+PUB_DEST_SIZE  = 391
+PRIV_KEY_SIZE  = 64
+
+DEFAULT_CONNECT_TIMEOUT = 30.0
+PUMP_CHUNK              = 64 * 1024
+UDP_RECV_SIZE           = 65535
+
+
+def generate_destination() -> tuple[str, str]:
+    """Return a random (pub, priv) pair; priv embeds pub as on a real router."""
+    pub_raw = os.urandom(PUB_DEST_SIZE)
+    priv_raw = pub_raw + os.urandom(PRIV_KEY_SIZE)
+    return i2p_b64encode(pub_raw), i2p_b64encode(priv_raw)
+
+
+def pub_from_priv(priv: str) -> str:
+    return i2p_b64encode(i2p_b64decode(priv)[:PUB_DEST_SIZE])
+
+
+def _peer_closed(conn: SamConnection) -> bool:
+    """True if the client hung up (readable with nothing buffered = EOF)."""
+    if conn.has_buffered_data():
+        return False
+    try:
+        readable, _, _ = select.select([conn], [], [], 0)
+        return bool(readable) and conn.sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Emulator state
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _PendingStream:
+    """An inbound STREAM CONNECT waiting for an acceptor."""
+
+    def __init__(self, conn: SamConnection, from_dest: str, from_port: int, to_port: int):
+        self.conn = conn
+        self.from_dest = from_dest
+        self.from_port = from_port
+        self.to_port = to_port
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.peer: SamConnection | None = None
+        self.abandoned = False
+
+    def claim(self, peer: SamConnection) -> bool:
+        with self.lock:
+            if self.abandoned:
+                return False
+            self.peer = peer
+            self.done.set()
+            return True
+
+    def abandon(self) -> bool:
+        """Connector gave up; False if an acceptor already claimed it."""
+        with self.lock:
+            if self.peer is not None:
+                return False
+            self.abandoned = True
+            return True
+
+
+class _Session:
+    def __init__(self, sid: str, style: str, pub: str, control: SamConnection,
+                 listen_port: int = 0, primary=None):
+        self.id = sid
+        self.style = style
+        self.pub = pub
+        self.control = control
+        self.listen_port = listen_port
+        self.primary = primary
+        self.incoming: queue.Queue = queue.Queue()
+        self.forward: tuple[str, int, bool] | None = None
+        self.udp_forward: tuple[str, int] | None = None   # DATAGRAM sessions
+        self.subsessions: list[str] = []
+
+
+class SamEmulator:
+    """A threaded SAM bridge listening on host:port (port 0 picks a free one)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 tunnel_build_delay: float = 0.0, stream_latency: float = 0.0,
+                 byte_latency: float = 0.0, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 hosts: dict | None = None, udp_port: int = 0, datagram_loss: float = 0.0):
+        self.host = host
+        self.port = port
+        self.udp_port = udp_port
+        self.datagram_loss = datagram_loss
+        self.tunnel_build_delay = tunnel_build_delay
+        self.stream_latency = stream_latency
+        self.byte_latency = byte_latency
+        self.connect_timeout = connect_timeout
+        self.hosts = dict(hosts or {})
+        self._sessions: dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._listener: socket.socket | None = None
+        self._udp: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._running = threading.Event()
+        self._clients: set = set()
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self):
+        self._listener = socket.create_server((self.host, self.port))
+        self.port = self._listener.getsockname()[1]
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((self.host, self.udp_port))
+        self.udp_port = self._udp.getsockname()[1]
+        self._running.set()
+        self._thread = threading.Thread(target=self._serve, name="sam-emulator", daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._serve_udp, name="sam-emulator-udp", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        for sock in (self._listener, self._udp):
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)   # wakes a blocked accept(), close() alone does not
+            except OSError:
+                pass
+            try:
+                sock.close()
+            except OSError:
+                pass
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.host, self.port
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self):
+        while self._running.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                break
+            conn = SamConnection(sock)
+            with self._lock:
+                self._clients.add(conn)
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    # ── Per-connection command loop ──────────────────────────────────────────
+
+    def _handle(self, conn: SamConnection):
+        owned: list[str] = []
+        detached = False
+        try:
+            line = conn.read_line()
+            if line is None:
+                return
+            hello = parse_sam_reply(line)
+            if (hello.topic, hello.kind) != ("HELLO", "VERSION"):
+                conn.send_line('HELLO REPLY RESULT=I2P_ERROR MESSAGE="HELLO expected"')
+                return
+            conn.send_line("HELLO REPLY RESULT=OK VERSION=3.3")
+
+            while self._running.is_set():
+                line = conn.read_line()
+                if line is None:
+                    return
+                cmd = parse_sam_reply(line)
+                handler = self._COMMANDS.get((cmd.topic, cmd.kind))
+                if handler is None:
+                    conn.send_line(f'{cmd.topic} STATUS RESULT=I2P_ERROR MESSAGE="unsupported command"')
+                    continue
+                # A handler returns True once the socket has become a data
+                # stream; whoever bridges the stream closes it.
+                if handler(self, conn, cmd.options, owned):
+                    detached = True
+                    return
+        except (OSError, UnicodeDecodeError):
+            pass
+        finally:
+            self._drop_sessions(owned)
+            if not detached:
+                self._close(conn)
+
+    def _drop_sessions(self, ids: list[str]):
+        with self._lock:
+            for sid in ids:
+                session = self._sessions.pop(sid, None)
+                if session is None:
+                    continue
+                for sub in session.subsessions:
+                    self._sessions.pop(sub, None)
+
+    # ── DEST / NAMING ────────────────────────────────────────────────────────
+
+    def _cmd_dest_generate(self, conn, opts, owned):
+        pub, priv = generate_destination()
+        conn.send_line(f"DEST REPLY PUB={pub} PRIV={priv}")
+
+    def _resolve(self, name: str, conn_sessions: list[str]) -> str | None:
+        with self._lock:
+            if name == "ME":
+                for sid in conn_sessions:
+                    if sid in self._sessions:
+                        return self._sessions[sid].pub
+                return None
+            if name.endswith(".b32.i2p"):
+                for session in self._sessions.values():
+                    if b32_address(session.pub) == name:
+                        return session.pub
+            if name in self.hosts:
+                return self.hosts[name]
+        if len(name) >= 516:
+            return name
+        return None
+
+    def _cmd_naming_lookup(self, conn, opts, owned):
+        name = opts.get("NAME", "")
+        value = self._resolve(name, owned)
+        if value is None:
+            conn.send_line(f"NAMING REPLY RESULT=KEY_NOT_FOUND NAME={name}")
+        else:
+            conn.send_line(f"NAMING REPLY RESULT=OK NAME={name} VALUE={value}")
+
+    # ── SESSION ──────────────────────────────────────────────────────────────
+
+    def _cmd_session_create(self, conn, opts, owned):
+        sid = opts.get("ID")
+        style = opts.get("STYLE", "STREAM")
+        dest = opts.get("DESTINATION", "TRANSIENT")
+        if not sid or style not in ("STREAM", "PRIMARY", "MASTER", "DATAGRAM"):
+            conn.send_line('SESSION STATUS RESULT=I2P_ERROR MESSAGE="bad STYLE or ID"')
+            return
+        udp_forward = None
+        if style == "DATAGRAM":
+            try:
+                udp_forward = (opts.get("HOST", "127.0.0.1"), int(opts.get("PORT", "")))
+            except ValueError:
+                conn.send_line('SESSION STATUS RESULT=I2P_ERROR MESSAGE="PORT required"')
+                return
+        if owned:
+            conn.send_line('SESSION STATUS RESULT=I2P_ERROR MESSAGE="session already created"')
+            return
+        try:
+            if dest == "TRANSIENT":
+                pub, priv = generate_destination()
+            else:
+                priv = dest
+                pub = pub_from_priv(priv)
+        except ValueError:
+            conn.send_line("SESSION STATUS RESULT=INVALID_KEY")
+            return
+        with self._lock:
+            if sid in self._sessions:
+                conn.send_line("SESSION STATUS RESULT=DUPLICATED_ID")
+                return
+            if any(s.pub == pub and s.primary is None for s in self._sessions.values()):
+                conn.send_line("SESSION STATUS RESULT=DUPLICATED_DEST")
+                return
+            session = _Session(sid, "PRIMARY" if style == "MASTER" else style, pub, conn)
+            session.udp_forward = udp_forward
+            self._sessions[sid] = session
+        owned.append(sid)
+        if self.tunnel_build_delay:
+            time.sleep(self.tunnel_build_delay)
+        conn.send_line(f"SESSION STATUS RESULT=OK DESTINATION={priv}")
+
+    def _cmd_session_add(self, conn, opts, owned):
+        with self._lock:
+            primary = next((self._sessions[s] for s in owned
+                            if s in self._sessions and self._sessions[s].style == "PRIMARY"), None)
+            sid = opts.get("ID")
+            style = opts.get("STYLE", "STREAM")
+            port = int(opts.get("LISTEN_PORT", opts.get("FROM_PORT", "0")) or 0)
+            if primary is None:
+                result = 'I2P_ERROR MESSAGE="no PRIMARY session on this socket"'
+            elif not sid or sid in self._sessions:
+                result = "DUPLICATED_ID"
+            elif style != "STREAM":
+                result = f'I2P_ERROR MESSAGE="STYLE={style} not emulated"'
+            elif any(self._sessions[s].listen_port == port for s in primary.subsessions
+                     if s in self._sessions):
+                result = 'I2P_ERROR MESSAGE="duplicate LISTEN_PORT"'
+            else:
+                self._sessions[sid] = _Session(sid, style, primary.pub, conn, port, primary)
+                primary.subsessions.append(sid)
+                result = "OK"
+        conn.send_line(f"SESSION STATUS RESULT={result} ID={sid}")
+
+    def _cmd_session_remove(self, conn, opts, owned):
+        sid = opts.get("ID")
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None or session.primary is None or session.primary.id not in owned:
+                result = 'I2P_ERROR MESSAGE="no such subsession"'
+            else:
+                del self._sessions[sid]
+                session.primary.subsessions.remove(sid)
+                result = "OK"
+        conn.send_line(f"SESSION STATUS RESULT={result} ID={sid}")
+
+    # ── STREAM ───────────────────────────────────────────────────────────────
+
+    def _stream_session(self, sid: str) -> _Session | None:
+        with self._lock:
+            session = self._sessions.get(sid)
+        if session is None or session.style != "STREAM":
+            return None
+        return session
+
+    def _find_target(self, pub: str, to_port: int) -> _Session | None:
+        with self._lock:
+            candidates = [s for s in self._sessions.values()
+                          if s.pub == pub and s.style == "STREAM"]
+        exact = [s for s in candidates if s.listen_port == to_port]
+        if exact:
+            return exact[0]
+        wildcard = [s for s in candidates if s.listen_port == 0 and s.primary is None]
+        return wildcard[0] if wildcard else None
+
+    def _cmd_stream_connect(self, conn, opts, owned):
+        session = self._stream_session(opts.get("ID", ""))
+        if session is None:
+            conn.send_line('STREAM STATUS RESULT=INVALID_ID')
+            return
+        dest = opts.get("DESTINATION", "")
+        if dest.endswith(".i2p"):
+            dest = self._resolve(dest, []) or ""
+        to_port = int(opts.get("TO_PORT", "0") or 0)
+        target = self._find_target(dest, to_port)
+        if target is None:
+            conn.send_line("STREAM STATUS RESULT=CANT_REACH_PEER")
+            return
+        pending = _PendingStream(conn, session.pub, session.listen_port, to_port)
+        if target.forward is not None:
+            threading.Thread(target=self._deliver_forward, args=(target, pending), daemon=True).start()
+        else:
+            target.incoming.put(pending)
+        if not pending.done.wait(self.connect_timeout) and pending.abandon():
+            conn.send_line("STREAM STATUS RESULT=TIMEOUT")
+            return
+        if pending.peer is None:
+            conn.send_line("STREAM STATUS RESULT=CANT_REACH_PEER")
+            return
+        conn.send_line("STREAM STATUS RESULT=OK")
+        self._bridge(conn, pending.peer)
+        return True
+
+    def _cmd_stream_accept(self, conn, opts, owned):
+        session = self._stream_session(opts.get("ID", ""))
+        if session is None:
+            conn.send_line('STREAM STATUS RESULT=INVALID_ID')
+            return
+        silent = opts.get("SILENT", "false") == "true"
+        conn.send_line("STREAM STATUS RESULT=OK")
+        while self._running.is_set():
+            try:
+                pending = session.incoming.get(timeout=0.5)
+            except queue.Empty:
+                if self._stream_session(session.id) is None or _peer_closed(conn):
+                    return
+                continue
+            if _peer_closed(conn):
+                session.incoming.put(pending)
+                return
+            if not silent:
+                conn.send_line(f"{pending.from_dest} FROM_PORT={pending.from_port} TO_PORT={pending.to_port}")
+            if pending.claim(conn):
+                return True
+
+    def _cmd_stream_forward(self, conn, opts, owned):
+        session = self._stream_session(opts.get("ID", ""))
+        if session is None:
+            conn.send_line('STREAM STATUS RESULT=INVALID_ID')
+            return
+        try:
+            port = int(opts.get("PORT", ""))
+        except ValueError:
+            conn.send_line('STREAM STATUS RESULT=I2P_ERROR MESSAGE="PORT required"')
+            return
+        host = opts.get("HOST", "127.0.0.1")
+        session.forward = (host, port, opts.get("SILENT", "false") == "true")
+        conn.send_line("STREAM STATUS RESULT=OK")
+        # The forward lives as long as this control socket stays open
+        try:
+            while conn.recv(4096):
+                pass
+        except OSError:
+            pass
+        session.forward = None
+        return True
+
+    def _deliver_forward(self, target: _Session, pending: _PendingStream):
+        host, port, silent = target.forward
+        try:
+            sock = socket.create_connection((host, port), timeout=self.connect_timeout)
+            sock.settimeout(None)
+        except OSError:
+            pending.done.set()
+            return
+        local = SamConnection(sock)
+        with self._lock:
+            self._clients.add(local)
+        if not silent:
+            local.send_line(f"{pending.from_dest} FROM_PORT={pending.from_port} TO_PORT={pending.to_port}")
+        if not pending.claim(local):
+            self._close(local)
+
+    # ── DATAGRAM ─────────────────────────────────────────────────────────────
+
+    def _serve_udp(self):
+        """Datagrams sent to the bridge: '3.0 <ID> <DEST> [opts]\\n<payload>'."""
+        while self._running.is_set():
+            try:
+                packet, _ = self._udp.recvfrom(UDP_RECV_SIZE)
+            except OSError:
+                break
+            header, sep, payload = packet.partition(b'\n')
+            fields = header.decode('ascii', 'replace').split()
+            if not sep or len(fields) < 3 or not fields[0].startswith("3."):
+                continue
+            with self._lock:
+                source = self._sessions.get(fields[1])
+                target = next((s for s in self._sessions.values()
+                               if s.pub == fields[2] and s.udp_forward is not None), None)
+            if source is None or source.style != "DATAGRAM" or target is None:
+                continue   # datagrams are fire-and-forget: no error reply
+            if self.datagram_loss and random.random() < self.datagram_loss:
+                continue
+            forwarded = f"{source.pub} FROM_PORT=0 TO_PORT=0\n".encode() + payload
+            if self.stream_latency:
+                threading.Timer(self.stream_latency, self._forward_datagram,
+                                args=(target.udp_forward, forwarded)).start()
+            else:
+                self._forward_datagram(target.udp_forward, forwarded)
+
+    def _forward_datagram(self, address: tuple[str, int], data: bytes):
+        try:
+            self._udp.sendto(data, address)
+        except OSError:
+            pass
+
+    # ── Data relay ───────────────────────────────────────────────────────────
+
+    def _close(self, conn: SamConnection):
+        with self._lock:
+            self._clients.discard(conn)
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _bridge(self, a: SamConnection, b: SamConnection):
+        """Relay both directions until both sides hit EOF, then close both."""
+        reverse = threading.Thread(target=self._pump, args=(b, a), daemon=True)
+        reverse.start()
+        self._pump(a, b)
+        reverse.join()
+        self._close(a)
+        self._close(b)
+
+    def _pump(self, src: SamConnection, dst: SamConnection):
+        """Copy src -> dst until EOF, applying the configured latency."""
+        try:
+            while True:
+                data = src.recv(PUMP_CHUNK)
+                if not data:
+                    break
+                delay = self.stream_latency + self.byte_latency * len(data)
+                if delay:
+                    time.sleep(delay)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            try:
+                dst.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    _COMMANDS = {
+        ("DEST", "GENERATE"):   _cmd_dest_generate,
+        ("NAMING", "LOOKUP"):   _cmd_naming_lookup,
+        ("SESSION", "CREATE"):  _cmd_session_create,
+        ("SESSION", "ADD"):     _cmd_session_add,
+        ("SESSION", "REMOVE"):  _cmd_session_remove,
+        ("STREAM", "CONNECT"):  _cmd_stream_connect,
+        ("STREAM", "ACCEPT"):   _cmd_stream_accept,
+        ("STREAM", "FORWARD"):  _cmd_stream_forward,
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# pytest fixture
+# ──────────────────────────────────────────────────────────────────────────────
+
+try:
+    import pytest
+except ImportError:  # pytest is only needed for the fixture
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def sam_bridge(monkeypatch):
+        """A running SamEmulator with src.sam pointed at it."""
+        with SamEmulator() as emulator:
+            monkeypatch.setattr(sam, "SAM_HOST", emulator.host)
+            monkeypatch.setattr(sam, "SAM_PORT", emulator.port)
+            monkeypatch.setattr(sam, "SAM_UDP_PORT", emulator.udp_port)
+            yield emulator
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Standalone process
+# ──────────────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local SAM v3 bridge emulator")
+    parser.add_argument("--host", default=sam.SAM_HOST)
+    parser.add_argument("--port", type=int, default=sam.SAM_PORT)
+    parser.add_argument("--udp-port", type=int, default=sam.SAM_UDP_PORT)
+    parser.add_argument("--build-delay", type=float, default=0.0,
+                        help="seconds per SESSION CREATE (tunnel build)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every relayed chunk")
+    parser.add_argument("--byte-latency", type=float, default=0.0,
+                        help="seconds added per relayed byte")
+    parser.add_argument("--datagram-loss", type=float, default=0.0,
+                        help="probability of dropping each datagram (0-1)")
+    args = parser.parse_args(argv)
+
+    emulator = SamEmulator(args.host, args.port, args.build_delay, args.latency, args.byte_latency,
+                           udp_port=args.udp_port, datagram_loss=args.datagram_loss)
+    emulator.start()
+    print(f"SAM emulator listening on {emulator.host}:{emulator.port} (UDP {emulator.udp_port})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
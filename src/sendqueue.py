@@ -0,0 +1,203 @@
+"""
+src/sendqueue.py - Prioritized outbound queue for one chat connection
+
+Handles:
+  - One writer thread per connection running the queued send jobs, so the
+    input thread never waits for an RSA encryption or a slow tunnel
+  - Priority classes, highest first: control > text > bulk. A class is only
+    skipped while its ready() check says the link cannot take it (a full
+    bulk window), so a file transfer never holds up a one-line message
+  - A bound per class: put() refuses (or blocks) once maxsize jobs of that
+    class wait, so a file transfer filling its class never refuses a typed
+    line; on_pressure(active, depth) tells the UI when the text class fills
+    past its high-water mark and when it has drained again
+  - Follow-up jobs: a job may return the next step of its work, which runs
+    next in its class, so a long message goes out chunk by chunk with
+    higher classes running in between and still leaves in one piece
+  - Per-class metrics: depth, peak depth, jobs sent and time spent queued
+
+Link-level acks and pings never go through here: the ReliableChannel reader
+writes them straight away.
+"""
+
+import threading
+import time
+from collections import deque
+
+# ─── Priority classes ─────────────────────────────────────────────────────────
+PRIORITY_CONTROL = 0
+PRIORITY_TEXT    = 1
+PRIORITY_BULK    = 2
+PRIORITY_NAMES   = ("control", "text", "bulk")
+
+# ─── Queue parameters ─────────────────────────────────────────────────────────
+SEND_QUEUE_SIZE  = 64     # jobs of one class waiting before put() refuses more
+HIGH_WATER       = 0.75   # of maxsize: tell the UI the link is not keeping up
+LOW_WATER        = 0.25   # of maxsize: tell the UI it caught up
+READY_POLL       = 0.05   # seconds between ready() checks of a held-back class
+DRAIN_TIMEOUT    = 5.0    # seconds close() waits for queued jobs to go out
+
+
+class SendQueueFull(Exception):
+    """The outbound queue is at its limit: the link is not keeping up."""
+
+
+class SendQueue:
+    """
+    Runs send jobs (zero-argument callables) on a dedicated writer thread,
+    highest priority first and in order within a class.
+
+    ready(priority) -> bool may hold a class back without blocking the
+    writer; on_error(exc) gets every exception a job raises. A job that
+    returns a callable has it run next in its class, past the class bound.
+    """
+
+    def __init__(self, maxsize: int = SEND_QUEUE_SIZE, ready=None, on_pressure=None,
+                 on_error=None, name: str = "send-queue"):
+        self.maxsize = max(1, maxsize)
+        self.ready = ready or (lambda priority: True)
+        self.on_pressure = on_pressure or (lambda active, depth: None)
+        self.on_error = on_error or (lambda error: None)
+        self._queues = tuple(deque() for _ in PRIORITY_NAMES)   # (queued_at, job)
+        self._size = 0
+        self._busy = False            # the writer is running a job
+        self._pressure = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = [{"queued": 0, "sent": 0, "peak": 0, "wait_total": 0.0, "wait_max": 0.0}
+                       for _ in PRIORITY_NAMES]
+        threading.Thread(target=self._writer, name=name, daemon=True).start()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ── Producers ────────────────────────────────────────────────────────────
+
+    def put(self, priority: int, job, block: bool = False, timeout: float | None = None):
+        """
+        Queue job. Control jobs are always taken; text and bulk raise
+        SendQueueFull when maxsize jobs of their class are waiting (after up
+        to timeout seconds if block).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        jobs = self._queues[priority]
+        with self._cond:
+            while len(jobs) >= self.maxsize and priority != PRIORITY_CONTROL and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise SendQueueFull(f"{len(jobs)} messages are still waiting to be sent")
+                self._cond.wait(remaining)
+            if self._closed:
+                raise ConnectionError("Send queue closed")
+            jobs.append((time.monotonic(), job))
+            self._size += 1
+            stats = self._stats[priority]
+            stats["queued"] += 1
+            stats["peak"] = max(stats["peak"], len(jobs))
+            pressure = self._update_pressure()
+            self._cond.notify_all()
+        if pressure is not None:
+            self.on_pressure(*pressure)
+
+    def _update_pressure(self) -> tuple[bool, int] | None:
+        """(active, text depth) if the pressure state changed; caller holds _cond."""
+        depth = len(self._queues[PRIORITY_TEXT])
+        if not self._pressure and depth >= self.maxsize * HIGH_WATER:
+            self._pressure = True
+        elif self._pressure and depth <= self.maxsize * LOW_WATER:
+            self._pressure = False
+        else:
+            return None
+        return self._pressure, depth
+
+    # ── Writer ───────────────────────────────────────────────────────────────
+
+    def _next(self):
+        """Highest-priority job whose class is ready; caller holds _cond."""
+        for priority, jobs in enumerate(self._queues):
+            if jobs and self.ready(priority):
+                return priority, jobs.popleft()
+        return None
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    picked = self._next()
+                    if picked is not None:
+                        break
+                    # Jobs held back by ready() are checked again shortly
+                    self._cond.wait(READY_POLL if self._size else None)
+                priority, (queued_at, job) = picked
+                self._size -= 1
+                self._busy = True
+                pressure = self._update_pressure()
+                self._cond.notify_all()
+            if pressure is not None:
+                self.on_pressure(*pressure)
+            waited = time.monotonic() - queued_at
+            follow_up = None
+            try:
+                follow_up = job()
+            except Exception as e:
+                self.on_error(e)
+            with self._cond:
+                self._busy = False
+                if callable(follow_up) and not self._closed:
+                    self._queues[priority].appendleft((time.monotonic(), follow_up))
+                    self._size += 1
+                stats = self._stats[priority]
+                stats["sent"] += 1
+                stats["wait_total"] += waited
+                stats["wait_max"] = max(stats["wait_max"], waited)
+                self._cond.notify_all()
+
+    # ── Shutdown ─────────────────────────────────────────────────────────────
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Wait until every queued job has run; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (self._size or self._busy) and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, drain_timeout: float = 0):
+        """Stop the writer, after up to drain_timeout seconds of draining."""
+        if drain_timeout:
+            self.drain(drain_timeout)
+        with self._cond:
+            self._closed = True
+            for jobs in self._queues:
+                jobs.clear()
+            self._size = 0
+            self._cond.notify_all()
+
+    # ── Metrics ──────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """{class: {depth, peak, queued, sent, wait_avg_ms, wait_max_ms}}"""
+        with self._cond:
+            return {
+                name: {
+                    "depth": len(self._queues[priority]),
+                    "peak": s["peak"],
+                    "queued": s["queued"],
+                    "sent": s["sent"],
+                    "wait_avg_ms": s["wait_total"] / s["sent"] * 1000 if s["sent"] else 0.0,
+                    "wait_max_ms": s["wait_max"] * 1000,
+                }
+                for priority, (name, s) in enumerate(zip(PRIORITY_NAMES, self._stats))
+            }
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} {s['sent']} sent (peak depth {s['peak']}, "
+            f"avg wait {s['wait_avg_ms']:.1f} ms, max {s['wait_max_ms']:.1f} ms)"
+            for name, s in self.stats().items() if s["queued"]
+        ) or "nothing sent"
@@ -0,0 +1,323 @@
+"""
+src/sessions.py - Shared and pre-warmed SAM sessions for Argon Messenger
+
+Handles:
+  - One SAM 3.3 PRIMARY session per process (one destination, one tunnel set)
+  - A STREAM subsession per hosted room, each on its own virtual port
+  - One shared outbound STREAM subsession used by every joined room
+  - A background pre-warmer that builds dynamic sessions while the user is
+    still in the menus, so tunnel build time overlaps with think time
+
+Sharing is opt-in (SHARE_TUNNELS in settings.ini): every room opened while it
+is enabled is reachable through the same destination, which links them.
+Shared and pre-warmed sessions are built with the configured tunnel profile
+(TUNNEL_PROFILE), so only rooms using that profile can take them.
+"""
+
+import random
+import select
+import string
+import threading
+import time
+
+from .sam import (
+    sam_hello, sam_dest_generate, sam_create_session, sam_create_primary_session,
+    sam_session_add, sam_session_remove, SamConnection,
+)
+from .tunnels import profile_options
+
+# ─── Virtual ports ────────────────────────────────────────────────────────────
+CLIENT_PORT    = 0      # outbound-only subsession, never accepts
+ROOM_PORT_BASE = 1024   # hosted rooms get ROOM_PORT_BASE, +1, +2, ...
+
+# ─── Pre-warming ──────────────────────────────────────────────────────────────
+PREWARM_RETRY_DELAY     = 5     # seconds before retrying when SAM is unreachable
+PREWARM_MAX_RETRY_DELAY = 120
+
+
+def _random_id(prefix: str, length: int = 6) -> str:
+    return prefix + ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+
+
+class PrimarySession:
+    """
+    A PRIMARY session and its subsessions.
+    All SESSION ADD/REMOVE commands go through the primary control socket,
+    so they are serialised with a lock.
+    """
+
+    def __init__(self, conn: SamConnection, nickname: str, pub: str):
+        self.conn = conn
+        self.nickname = nickname
+        self.pub = pub
+        self._lock = threading.RLock()
+        self._subsessions: dict[str, int] = {}   # sub_id -> listen port
+        self._client_id: str | None = None
+        self._next_port = ROOM_PORT_BASE
+        self.closed = False
+
+    @classmethod
+    def create(cls, privkey: str | None = None, options: str | None = None):
+        """
+        Open a PRIMARY session, generating a fresh DEST when privkey is None.
+        options default to the configured tunnel profile.
+        """
+        conn = sam_hello()
+        try:
+            pub = None
+            if privkey is None:
+                pub, privkey = sam_dest_generate(conn)
+            nickname = _random_id("primary_")
+            sam_create_primary_session(conn, nickname, privkey,
+                                       profile_options() if options is None else options)
+        except Exception:
+            conn.close()
+            raise
+        return cls(conn, nickname, pub)
+
+    def add_stream(self, listen_port: int, prefix: str = "sub_") -> str:
+        """Add a STREAM subsession on listen_port and return its ID."""
+        sub_id = _random_id(prefix)
+        with self._lock:
+            sam_session_add(self.conn, sub_id, "STREAM", listen_port)
+            self._subsessions[sub_id] = listen_port
+        return sub_id
+
+    def add_room(self) -> tuple[str, int]:
+        """Add a subsession for a hosted room. Returns (sub_id, port)."""
+        with self._lock:
+            port = self._next_port
+            self._next_port += 1
+        return self.add_stream(port, "host_"), port
+
+    def client_subsession(self) -> str:
+        """The shared outbound subsession, created on first use."""
+        with self._lock:
+            if self._client_id is None:
+                self._client_id = self.add_stream(CLIENT_PORT, "client_")
+            return self._client_id
+
+    def remove(self, sub_id: str):
+        """Detach a subsession; the primary tunnels stay up for the others."""
+        with self._lock:
+            if sub_id not in self._subsessions or self.closed:
+                return
+            del self._subsessions[sub_id]
+            if sub_id == self._client_id:
+                self._client_id = None
+            try:
+                sam_session_remove(self.conn, sub_id)
+            except Exception:
+                pass
+
+    def close(self):
+        """Closing the control socket destroys the primary and all subsessions."""
+        with self._lock:
+            self.closed = True
+            self._subsessions.clear()
+            self._client_id = None
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Process-wide shared session
+# ──────────────────────────────────────────────────────────────────────────────
+
+_shared: PrimarySession | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_session() -> PrimarySession:
+    """Return the process-wide PRIMARY session, creating it on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared.closed:
+            _shared = PrimarySession.create()
+        return _shared
+
+
+def close_shared_session():
+    """Tear down the shared PRIMARY session (if any)."""
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+            _shared = None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Speculative pre-warming
+# ──────────────────────────────────────────────────────────────────────────────
+
+class WarmSession:
+    """A dynamic STREAM session whose tunnels were built ahead of time."""
+
+    def __init__(self, conn: SamConnection, nickname: str, pub: str):
+        self.conn = conn
+        self.nickname = nickname
+        self.pub = pub
+        self.created = time.monotonic()
+
+    def is_alive(self) -> bool:
+        """
+        An idle control socket has nothing to read; if it turns readable the
+        bridge either closed it or dropped the session.
+        """
+        try:
+            readable, _, _ = select.select([self.conn], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class SessionPrewarmer:
+    """
+    Keeps pool_size dynamic sessions (DEST GENERATE + SESSION CREATE) ready
+    in a background thread. take() hands one over and triggers a refill;
+    sessions nobody took within idle_timeout seconds are rotated so a
+    destination never sits published for long without being used.
+    """
+
+    def __init__(self, pool_size: int = 1, idle_timeout: float = 600.0,
+                 warm_shared: bool = False):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.warm_shared = warm_shared
+        self._pool: list[WarmSession] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sam-prewarmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for warm in pool:
+            warm.close()
+
+    def take(self) -> WarmSession | None:
+        """Hand over a ready session (the caller owns it), or None."""
+        taken = None
+        with self._lock:
+            while self._pool and taken is None:
+                warm = self._pool.pop(0)
+                if warm.is_alive():
+                    taken = warm
+                else:
+                    warm.close()
+        self._wake.set()
+        return taken
+
+    # ── Worker ───────────────────────────────────────────────────────────────
+
+    def _build(self) -> WarmSession:
+        conn = sam_hello()
+        try:
+            pub, priv = sam_dest_generate(conn)
+            nickname = _random_id("warm_")
+            sam_create_session(conn, nickname, priv, profile_options())
+        except Exception:
+            conn.close()
+            raise
+        return WarmSession(conn, nickname, pub)
+
+    def _rotate_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [w for w in self._pool
+                       if now - w.created >= self.idle_timeout or not w.is_alive()]
+            self._pool = [w for w in self._pool if w not in expired]
+        for warm in expired:
+            warm.close()
+
+    def _fill(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._pool) >= self.pool_size:
+                    return
+            warm = self._build()
+            with self._lock:
+                if self._stop.is_set():
+                    warm.close()
+                    return
+                self._pool.append(warm)
+
+    def _next_wait(self) -> float:
+        with self._lock:
+            if not self._pool:
+                return self.idle_timeout
+            oldest = min(w.created for w in self._pool)
+        return max(1.0, self.idle_timeout - (time.monotonic() - oldest))
+
+    def _run(self):
+        delay = PREWARM_RETRY_DELAY
+        while not self._stop.is_set():
+            try:
+                if self.warm_shared:
+                    get_shared_session().client_subsession()
+                else:
+                    self._rotate_idle()
+                    self._fill()
+                delay = PREWARM_RETRY_DELAY
+                wait = self._next_wait()
+            except Exception:
+                # Router not up yet or SAM refused: back off quietly, the
+                # room flows fall back to building their own session.
+                wait = delay
+                delay = min(delay * 2, PREWARM_MAX_RETRY_DELAY)
+            self._wake.wait(wait)
+            self._wake.clear()
+
+
+_prewarmer: SessionPrewarmer | None = None
+
+
+def start_prewarmer(pool_size: int = 1, idle_timeout: float = 600.0, warm_shared: bool = False):
+    """Start (or reconfigure) the process-wide pre-warmer. pool_size=0 disables it."""
+    global _prewarmer
+    if _prewarmer is not None and (
+        _prewarmer.pool_size != pool_size
+        or _prewarmer.idle_timeout != idle_timeout
+        or _prewarmer.warm_shared != warm_shared
+    ):
+        stop_prewarmer()
+    if pool_size <= 0:
+        return
+    if _prewarmer is None:
+        _prewarmer = SessionPrewarmer(pool_size, idle_timeout, warm_shared)
+    _prewarmer.start()
+
+
+def take_warm_session() -> WarmSession | None:
+    """A pre-built dynamic session, or None if none is ready."""
+    if _prewarmer is None:
+        return None
+    return _prewarmer.take()
+
+
+def stop_prewarmer():
+    """Stop the pre-warmer and close every session it still holds."""
+    global _prewarmer
+    if _prewarmer is not None:
+        _prewarmer.stop()
+        _prewarmer = None
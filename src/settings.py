@@ -24,12 +24,38 @@ def ensure_settings_exists():
     if not os.path.exists(SETTINGS_FILE):
         config = configparser.ConfigParser()
         config["CRYPTOGRAPHY & OPSEC"] = {
-            "DISABLE_ARGON2": "false"
+            "DISABLE_ARGON2": "false",
+            "ARMORED_WIRE": "false",
+            "FRAME_MAC": "true",
+            "INBOUND_RATE": "100",
+            "INBOUND_BURST": "200",
+            "SYMMETRIC_MODES": "auto"
         }
         config["I2P Network"] = {
             "PERSISTENCE": "false",
             "RANDOM_I2P_ID": "true",
-            "ENCRYPT_I2P_COMM": "true"
+            "ENCRYPT_I2P_COMM": "true",
+            "SHARE_TUNNELS": "false",
+            "PREWARM_SESSIONS": "1",
+            "PREWARM_IDLE_TIMEOUT": "600",
+            "TRANSPORT": "stream",
+            "ACCEPT_CONCURRENCY": "2",
+            "ACCEPT_MODE": "accept",
+            "HEARTBEAT_INTERVAL": "10",
+            "TUNNEL_PROFILE": "balanced",
+            "ADDRESS_FORMAT": "b32",
+            "LOW_LATENCY_SOCKETS": "true",
+            "SOCKET_BUFFER_KB": "256"
+        }
+        # Extra or overridden profiles: name = space-separated i2cp options
+        config["Tunnel Profiles"] = {}
+        config["Compression"] = {
+            "METHODS": "auto",
+            "THRESHOLD": "256"
+        }
+        config["Diagnostics"] = {
+            "SHOW_TIMINGS": "false",
+            "METRICS_FILE": ""
         }
         with open(SETTINGS_FILE, "w") as f:
             config.write(f)
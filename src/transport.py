@@ -0,0 +1,390 @@
+"""
+src/transport.py - Byte-stream transports for Argon Messenger
+
+Handles:
+  - The wire framing shared by every chat mode ([4 bytes BE length][payload])
+  - send_frames(): a burst of frames in one sendmsg() call, large payloads
+    passed next to their header instead of being copied into one buffer
+  - FrameReader: a recv_into() frame reader with one reusable buffer per
+    stream, handing out memoryviews instead of building bytes objects
+  - Oversized frames are read off the stream and discarded (FrameTooLarge),
+    so the frames after them still parse
+  - A backend interface (listen / accept / connect) with three backends:
+      sam  : I2P streams through the SAM bridge (what users run)
+      tcp  : plain loopback TCP
+      unix : Unix domain sockets, plus an in-process socket pair
+  - get_backend() to pick one by name
+
+The loopback backends carry exactly the same frames as SAM streams, so the
+message pipeline (src/pipeline.py) can be profiled without I2P latency.
+"""
+
+import os
+import socket
+import tempfile
+
+from .sam import sam_hello, sam_stream_accept, tune_socket, parse_stream_header
+from .connector import race_connect
+
+# ─── Framing ──────────────────────────────────────────────────────────────────
+FRAME_HEADER_SIZE    = 4
+MAX_FRAME_SIZE       = 1_000_000
+FRAME_BUFFER_INITIAL = 4096   # FrameReader buffer, doubled as bigger frames arrive
+FRAME_COPY_LIMIT     = 4096   # payloads up to this size are joined to their header
+SENDMSG_MAX_BUFFERS  = 512    # per sendmsg() call, well under IOV_MAX (1024 on Linux)
+HAS_SENDMSG          = hasattr(socket.socket, 'sendmsg')   # not on Windows
+DISCARD_CHUNK        = 64 * 1024   # read size while skipping an oversized frame
+FRAME_HEAD_KEPT      = 16          # bytes of a discarded frame kept for the caller
+
+
+class FrameTooLarge(ValueError):
+    """
+    A frame over the size limit. Its payload has been consumed, so the
+    stream is still in sync; head holds its first bytes.
+    """
+
+    def __init__(self, length: int, limit: int, head: bytes):
+        super().__init__(f"Frame of {length} bytes exceeds limit ({limit})")
+        self.length = length
+        self.head = head
+
+
+def _recv_into_exact(sock, view: memoryview, n: int) -> bool:
+    """Fill view[:n] from sock (short reads included); False on EOF."""
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:n], n - got)
+        if not k:
+            return False
+        got += k
+    return True
+
+
+def _discard_exact(sock, n: int) -> bytes | None:
+    """Read n bytes off sock without keeping them; their head, or None on EOF."""
+    buf = bytearray(min(n, DISCARD_CHUNK))
+    view = memoryview(buf)
+    head = None
+    while n:
+        k = min(n, len(buf))
+        if not _recv_into_exact(sock, view, k):
+            return None
+        if head is None:
+            head = bytes(view[:FRAME_HEAD_KEPT])
+        n -= k
+    return head or b''
+
+
+def recv_exact(sock, n):
+    """read exactly n octets from socket, or none if EOF"""
+    buf = bytearray(n)
+    if not _recv_into_exact(sock, memoryview(buf), n):
+        return None
+    return buf
+
+
+def send_framed_message(sock, payload_bytes):
+    """
+    Send: [4 bytes BE length][payload_bytes]
+    This prevent TCP fragmentation bt specifing the number of bytes
+    """
+    send_frames(sock, (payload_bytes,))
+
+
+def send_frames(sock, payloads):
+    """
+    Send each payload as [4 bytes BE length][payload], all of them in one
+    sendmsg() call when the kernel takes it. Small payloads are copied next
+    to their header (cheaper than an extra iovec entry); bigger ones are
+    passed as they are.
+    """
+    buffers = []
+    total = 0
+    for payload in payloads:
+        length = len(payload)
+        header = length.to_bytes(FRAME_HEADER_SIZE, 'big')
+        if length <= FRAME_COPY_LIMIT:
+            buffers.append(header + payload)
+        else:
+            buffers += (header, payload)
+        total += FRAME_HEADER_SIZE + length
+    if len(buffers) == 1 or not HAS_SENDMSG:
+        # One small frame (the interactive case) needs no scatter-gather
+        sock.sendall(buffers[0] if len(buffers) == 1 else b''.join(buffers))
+        return
+    sent = sock.sendmsg(buffers) if len(buffers) <= SENDMSG_MAX_BUFFERS else 0
+    if sent != total:
+        _sendmsg_all(sock, buffers, sent)
+
+
+def _sendmsg_all(sock, buffers, skip: int = 0):
+    """
+    sendall() for a list of buffers, the first `skip` bytes of which were
+    already sent: retries short writes where they stopped.
+    """
+    views = [memoryview(buf).cast('B') for buf in buffers if len(buf)]
+    i = 0
+    sent = skip
+    while True:
+        while sent:
+            if sent >= len(views[i]):
+                sent -= len(views[i])
+                i += 1
+            else:
+                views[i] = views[i][sent:]
+                sent = 0
+        if i == len(views):
+            return
+        sent = sock.sendmsg(views[i:i + SENDMSG_MAX_BUFFERS])
+
+
+def recv_framed_message(sock):
+    """
+    read the header 4 bytes,
+    return the bytes of the payload, or None if socket got closed.
+    Raises FrameTooLarge on a frame over MAX_FRAME_SIZE, after skipping it.
+    """
+    hdr = recv_exact(sock, FRAME_HEADER_SIZE)
+    if hdr is None:
+        return None
+    length = int.from_bytes(hdr, 'big')
+    if length > MAX_FRAME_SIZE:
+        head = _discard_exact(sock, length)
+        if head is None:
+            return None
+        raise FrameTooLarge(length, MAX_FRAME_SIZE, head)
+    if length == 0:
+        return b''
+    data = recv_exact(sock, length)
+    return data
+
+
+class FrameReader:
+    """
+    Reads frames from one stream into a preallocated buffer.
+
+    read() returns a memoryview of the payload that stays valid until the
+    next read(); copy whatever must outlive it. The buffer grows
+    geometrically up to max_size and is then reused, so a steady stream of
+    frames costs no allocation at all.
+    """
+
+    def __init__(self, sock, max_size: int = MAX_FRAME_SIZE,
+                 initial: int = FRAME_BUFFER_INITIAL):
+        self.sock = sock
+        self.max_size = max_size
+        self._buf = bytearray(max(initial, FRAME_HEADER_SIZE))
+        self._view = memoryview(self._buf)
+
+    def read(self) -> memoryview | None:
+        """
+        Next payload, or None on EOF. A frame over max_size is skipped and
+        reported with FrameTooLarge; read() can be called again after it.
+        """
+        if not _recv_into_exact(self.sock, self._view, FRAME_HEADER_SIZE):
+            return None
+        length = int.from_bytes(self._view[:FRAME_HEADER_SIZE], 'big')
+        if length > self.max_size:
+            head = _discard_exact(self.sock, length)
+            if head is None:
+                return None
+            raise FrameTooLarge(length, self.max_size, head)
+        if length > len(self._buf):
+            self._grow(length)
+        if not _recv_into_exact(self.sock, self._view, length):
+            return None
+        return self._view[:length]
+
+    def _grow(self, needed: int):
+        size = len(self._buf)
+        while size < needed:
+            size *= 2
+        # Views handed out earlier keep the old buffer alive: no resize in place
+        self._buf = bytearray(min(size, self.max_size))
+        self._view = memoryview(self._buf)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Backends
+# ──────────────────────────────────────────────────────────────────────────────
+
+class Backend:
+    """
+    Opens byte streams between two chat endpoints. Every stream returned by
+    accept()/connect() is socket-like: recv, recv_into, sendall, sendmsg,
+    settimeout, close.
+    """
+
+    name = "base"
+
+    def listen(self) -> str:
+        """Start accepting; returns the address peers pass to connect()."""
+        raise NotImplementedError
+
+    def accept(self, timeout: float | None = None):
+        """Wait for one inbound stream (listen() must have been called)."""
+        raise NotImplementedError
+
+    def connect(self, address: str):
+        """Open a stream to address."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SamBackend(Backend):
+    """
+    Streams of an existing SAM STREAM session (or subsession). Creating the
+    session stays with the caller: shared, pre-warmed and static sessions
+    are all built differently.
+
+    connect() takes one 'DEST[:PORT]' per line and races them (see
+    src/connector.py); race_width/max_attempts > 1 add parallel and retried
+    attempts.
+    """
+
+    name = "sam"
+
+    def __init__(self, nickname: str, pub: str | None = None, port: int = 0,
+                 race_width: int = 1, max_attempts: int = 1, on_attempt=None):
+        self.nickname = nickname
+        self.pub = pub
+        self.port = port
+        self.race_width = race_width
+        self.max_attempts = max_attempts
+        self.on_attempt = on_attempt
+
+    def listen(self) -> str:
+        if self.pub is None:
+            raise Exception("SAM session has no known public DEST")
+        return f"{self.pub}:{self.port}" if self.port else self.pub
+
+    def accept(self, timeout: float | None = None):
+        conn = sam_hello()
+        try:
+            sam_stream_accept(conn, self.nickname, timeout=timeout)
+            # The bridge sends '<dest> FROM_PORT=n TO_PORT=n' once a peer connects
+            line = conn.read_line()
+            if line is None:
+                raise ConnectionError("STREAM ACCEPT closed before a peer connected")
+            parse_stream_header(line)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def connect(self, address: str):
+        targets = [line.strip() for line in address.splitlines() if line.strip()]
+        conn, _ = race_connect(self.nickname, targets, self.race_width,
+                               self.max_attempts, on_attempt=self.on_attempt)
+        return conn
+
+
+class _ListeningBackend(Backend):
+    """Common accept/close for the backends that own a listening socket."""
+
+    def __init__(self):
+        self._listener: socket.socket | None = None
+
+    def accept(self, timeout: float | None = None):
+        if self._listener is None:
+            raise Exception(f"{self.name} backend is not listening")
+        self._listener.settimeout(timeout)
+        sock, _ = self._listener.accept()
+        sock.settimeout(None)
+        tune_socket(sock)
+        return sock
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+class TcpBackend(_ListeningBackend):
+    """Plain TCP, loopback by default. Addresses are 'host:port'."""
+
+    name = "tcp"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__()
+        self.host = host
+        self.port = port
+
+    def listen(self) -> str:
+        self._listener = socket.create_server((self.host, self.port))
+        self.port = self._listener.getsockname()[1]
+        return f"{self.host}:{self.port}"
+
+    def connect(self, address: str):
+        host, _, port = address.rpartition(':')
+        sock = socket.create_connection((host or self.host, int(port)))
+        tune_socket(sock)
+        return sock
+
+
+class UnixBackend(_ListeningBackend):
+    """Unix domain sockets; the address is the socket path."""
+
+    name = "unix"
+
+    def __init__(self, path: str | None = None):
+        super().__init__()
+        self.path = path
+        self._owns_dir = None
+
+    def listen(self) -> str:
+        if self.path is None:
+            self._owns_dir = tempfile.mkdtemp(prefix="argon-")
+            self.path = os.path.join(self._owns_dir, "chat.sock")
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen()
+        return self.path
+
+    def connect(self, address: str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def pair():
+        """Two connected streams in this process (no listener, no path)."""
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    def close(self):
+        super().close()
+        if self._owns_dir is not None:
+            try:
+                os.unlink(self.path)
+                os.rmdir(self._owns_dir)
+            except OSError:
+                pass
+            self._owns_dir = None
+
+
+BACKENDS = {
+    SamBackend.name: SamBackend,
+    TcpBackend.name: TcpBackend,
+    UnixBackend.name: UnixBackend,
+}
+
+
+def get_backend(name: str, *args, **kwargs) -> Backend:
+    """Instantiate a backend by name ('sam', 'tcp' or 'unix')."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise Exception(f"Unknown transport backend: {name}")
+    return cls(*args, **kwargs)
@@ -292,12 +292,53 @@ def render_info(msg: str):
     console.print(f"[{MUTED}]  [-] {msg}[/]")
 
 
-def render_chat_header(encrypted: bool):
-    """Render the header for the chat session"""
+def render_timings(flow: str, spans):
+    """Render the per-phase timings of a connection flow (src/metrics.py spans)"""
+    table = Table(
+        title=f"Timings // {flow}",
+        box=box.ROUNDED,
+        border_style=ACCENT,
+        title_style=f"bold {ACCENT}",
+        padding=(0, 1),
+    )
+    table.add_column("Phase", style="bold white")
+    table.add_column("Duration", style=f"bold {CYAN}", justify="right")
+    table.add_column("Status", justify="center")
+
+    total = 0.0
+    for span in spans:
+        total += span.duration
+        status = f"[{OK}]ok[/]" if span.ok else f"[{ERR}]failed[/]"
+        table.add_row(span.phase, f"{span.duration * 1000:.0f} ms", status)
+    table.add_row("[dim]total[/dim]", f"[bold]{total * 1000:.0f} ms[/]", "")
+
+    console.print(table)
+
+
+SLOW_RTT_MS = 5000   # above this smoothed RTT the link is shown as slow
+
+
+def link_label(stats) -> str:
+    """One-line summary of a stream's heartbeat LinkStats"""
+    if stats is None or stats.srtt_ms is None:
+        return "measuring..."
+    label = f"RTT {stats.srtt_ms:.0f} ms ± {stats.jitter_ms:.0f} ms"
+    return f"{label} (slow)" if stats.srtt_ms > SLOW_RTT_MS else label
+
+
+def render_link_title(stats):
+    """Show the latest link measurement in the terminal title"""
+    from .helpers import set_terminal_title
+    set_terminal_title(f"Argon · Chat · {link_label(stats)}")
+
+
+def render_chat_header(encrypted: bool, link=None):
+    """Render the header for the chat session (link: heartbeat LinkStats, if any)"""
     enc_label = f"[bold {OK}]End-to-End Encrypted (PGP)[/]" if encrypted else f"[bold {ERR}]UNENCRYPTED[/]"
+    link_line = f"  //  [{CYAN}]Link: {link_label(link)}[/]" if link is not None else ""
     panel = Panel(
         Align.center(Text.from_markup(
-            f"Chat Session  //  {enc_label}\n"
+            f"Chat Session  //  {enc_label}{link_line}\n"
             f"[dim]Type your message and press Enter  //  Ctrl+C to exit  //  Ctrl+Q actions[/dim]"
         )),
         border_style=ACCENT,
@@ -317,6 +358,19 @@ def confirm_action(message: str, default=False) -> bool:
     ).execute()
 
 
+def select_tunnel_profile(names, default: str) -> str:
+    """Pick the tunnel profile for one room; the configured one comes first"""
+    ordered = [default] + [name for name in names if name != default]
+    return inquirer.select(
+        message="Tunnel Profile:",
+        choices=[{"name": f"  {name}" + ("  (default)" if name == default else ""), "value": name}
+                 for name in ordered],
+        pointer=">",
+        qmark=">>",
+        style=INQUIRER_STYLE,
+    ).execute()
+
+
 def text_prompt(message: str, qmark=">") -> str:
     """Ask for text input"""
     return inquirer.text(
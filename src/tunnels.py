@@ -0,0 +1,207 @@
+"""
+src/tunnels.py - Tunnel profiles (i2cp options) for Argon Messenger sessions
+
+Handles:
+  - Named presets trading anonymity for latency, translated to the SAM
+    session options the router understands (inbound.length, quantity, ...)
+      low-latency : 1-hop tunnels, more of them (fast, weakest anonymity)
+      balanced    : the router's usual 3 hops, plus a backup tunnel
+      paranoid    : 3 hops with up to one random extra hop
+  - User profiles in settings.ini ([Tunnel Profiles], one option string each)
+    which override or extend the presets
+  - A benchmark of session build time, connect time and RTT per profile:
+      python -m src.tunnels --profiles low-latency balanced paranoid --rounds 3
+
+Option names and values are checked before they reach a SAM command line,
+so a profile cannot smuggle extra SAM arguments in.
+"""
+
+import argparse
+import re
+import statistics
+import threading
+
+from .helpers import read_setting, read_section
+
+# ─── Profiles ─────────────────────────────────────────────────────────────────
+DEFAULT_PROFILE = "balanced"
+
+PROFILES = {
+    "low-latency": {
+        "inbound.length": 1, "outbound.length": 1,
+        "inbound.lengthVariance": 0, "outbound.lengthVariance": 0,
+        "inbound.quantity": 4, "outbound.quantity": 4,
+        "inbound.backupQuantity": 1, "outbound.backupQuantity": 1,
+    },
+    "balanced": {
+        "inbound.length": 3, "outbound.length": 3,
+        "inbound.lengthVariance": 0, "outbound.lengthVariance": 0,
+        "inbound.quantity": 2, "outbound.quantity": 2,
+        "inbound.backupQuantity": 1, "outbound.backupQuantity": 1,
+    },
+    "paranoid": {
+        "inbound.length": 3, "outbound.length": 3,
+        "inbound.lengthVariance": 1, "outbound.lengthVariance": 1,
+        "inbound.quantity": 2, "outbound.quantity": 2,
+        "inbound.backupQuantity": 0, "outbound.backupQuantity": 0,
+    },
+}
+
+_OPTION_KEY   = re.compile(r'^(?:(?:inbound|outbound)\.[A-Za-z]+|i2cp\.[A-Za-z.]+)$')
+_OPTION_VALUE = re.compile(r'^[A-Za-z0-9.\-]{1,32}$')
+
+
+def parse_options(text: str) -> dict:
+    """'inbound.length=2 outbound.length=2' -> {'inbound.length': '2', ...}"""
+    options = {}
+    for item in text.split():
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise Exception(f"Invalid tunnel option (expected key=value): {item}")
+        options[key] = value
+    return options
+
+
+def _validate(name: str, options: dict) -> dict:
+    checked = {}
+    for key, value in options.items():
+        value = str(value)
+        if not _OPTION_KEY.match(key) or not _OPTION_VALUE.match(value):
+            raise Exception(f"Invalid option in tunnel profile '{name}': {key}={value}")
+        checked[key] = value
+    return checked
+
+
+def load_profiles() -> dict:
+    """Built-in presets, overridden/extended by [Tunnel Profiles] in settings.ini."""
+    profiles = {name: dict(options) for name, options in PROFILES.items()}
+    for name, text in read_section('Tunnel Profiles').items():
+        profiles[name.lower()] = parse_options(text)
+    return profiles
+
+
+def profile_names() -> list[str]:
+    return list(load_profiles())
+
+
+def default_profile() -> str:
+    """The profile set in settings.ini ([I2P Network] tunnel_profile)."""
+    name = str(read_setting('I2P Network', 'tunnel_profile', DEFAULT_PROFILE)).strip().lower()
+    return name if name in load_profiles() else DEFAULT_PROFILE
+
+
+def profile_options(name: str | None = None) -> str:
+    """The SAM option string for profile `name` (default: the configured one)."""
+    name = (name or default_profile()).lower()
+    profiles = load_profiles()
+    if name not in profiles:
+        raise Exception(f"Unknown tunnel profile: {name}")
+    options = _validate(name, profiles[name])
+    return " ".join(f"{key}={value}" for key, value in options.items())
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Benchmark
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _bench_round(timer, profile: str, options: str, pings: int):
+    """Host + client session with `options`, one connect, then `pings` echoes."""
+    from .sam import sam_hello, sam_dest_generate, sam_create_session
+    from .transport import SamBackend, send_framed_message, recv_framed_message
+    from .connector import RACE_WIDTH, MAX_ATTEMPTS
+
+    to_close = []
+    try:
+        sessions = []
+        for role in ("host", "client"):
+            conn = sam_hello()
+            to_close.append(conn)
+            pub, priv = sam_dest_generate(conn)
+            nickname = f"bench_{role}_{timer.flow_id}"
+            with timer.phase("session_create", profile=profile, role=role):
+                sam_create_session(conn, nickname, priv, options)
+            sessions.append((nickname, pub))
+
+        (host_id, host_pub), (client_id, _) = sessions
+        accepted = {}
+        acceptor = threading.Thread(
+            target=lambda: accepted.setdefault("sock", SamBackend(host_id).accept(300)),
+            daemon=True)
+        acceptor.start()
+        with timer.phase("stream_connect", profile=profile):
+            client = SamBackend(client_id, race_width=RACE_WIDTH,
+                                max_attempts=MAX_ATTEMPTS).connect(host_pub)
+        to_close.append(client)
+        acceptor.join()
+        server = accepted["sock"]
+        to_close.append(server)
+
+        def echo():
+            try:
+                while (frame := recv_framed_message(server)) is not None:
+                    send_framed_message(server, frame)
+            except OSError:
+                pass   # closed at the end of the round
+
+        threading.Thread(target=echo, daemon=True).start()
+        for i in range(pings):
+            with timer.phase("rtt", profile=profile):
+                send_framed_message(client, str(i).encode())
+                if recv_framed_message(client) is None:
+                    raise ConnectionError("Echo stream closed")
+    finally:
+        for item in to_close:
+            try:
+                item.close()
+            except Exception:
+                pass
+
+
+def run_benchmark(profiles: list[str], rounds: int = 3, pings: int = 10) -> dict:
+    """{profile: {phase: median_ms}} over `rounds` fresh session pairs."""
+    from .metrics import MetricsRegistry, FlowTimer
+
+    reg = MetricsRegistry()
+    for profile in profiles:
+        options = profile_options(profile)
+        for _ in range(rounds):
+            _bench_round(FlowTimer("tunnel_bench", reg), profile, options, pings)
+
+    results = {}
+    for span in reg.spans():
+        results.setdefault(span.labels["profile"], {}).setdefault(span.phase, []).append(
+            span.duration * 1000)
+    return {
+        profile: {phase: statistics.median(values) for phase, values in phases.items()}
+        for profile, phases in results.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare tunnel profiles on the local SAM bridge")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    parser.add_argument("--rounds", type=int, default=3, help="session pairs built per profile")
+    parser.add_argument("--pings", type=int, default=10, help="echo round trips per connection")
+    parser.add_argument("--emulator", action="store_true",
+                        help="run against the in-process SAM emulator (smoke test only)")
+    args = parser.parse_args(argv)
+
+    if args.emulator:
+        from . import sam
+        from .sam_emulator import SamEmulator
+        with SamEmulator() as emulator:
+            sam.SAM_HOST, sam.SAM_PORT = emulator.host, emulator.port
+            results = run_benchmark(args.profiles, args.rounds, args.pings)
+    else:
+        results = run_benchmark(args.profiles, args.rounds, args.pings)
+
+    print(f"{'profile':>12} {'session_create':>15} {'stream_connect':>15} {'rtt':>10}   (median ms)")
+    for profile, phases in results.items():
+        print(f"{profile:>12} " + " ".join(
+            f"{phases.get(phase, float('nan')):>{width}.1f}"
+            for phase, width in (("session_create", 15), ("stream_connect", 15), ("rtt", 10))
+        ))
+
+
+if __name__ == "__main__":
+    main()
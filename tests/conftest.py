@@ -0,0 +1,46 @@
+"""
+Shared fixtures: sam_bridge (src/sam_emulator.py) runs a local SAM bridge
+and points src.sam at it, so tests never need an I2P router.
+"""
+
+import threading
+
+import pytest
+
+from src.sam import (
+    parse_stream_header, sam_hello, sam_dest_generate, sam_create_session,
+    sam_stream_connect, sam_stream_accept,
+)
+
+pytest_plugins = ["src.sam_emulator"]
+
+
+@pytest.fixture
+def stream_pair(sam_bridge):
+    """
+    A function returning (outbound, inbound): the two ends of a new I2P
+    stream between sessions "alice" and "bob" on the emulated bridge.
+    """
+    sessions = []
+    streams = []
+    for nickname in ("alice", "bob"):
+        control = sam_hello()
+        pub, priv = sam_dest_generate(control)
+        sam_create_session(control, nickname, priv)
+        sessions.append((control, pub))
+    bob_pub = sessions[1][1]
+
+    def open_pair():
+        inbound = sam_hello()
+        armed = threading.Thread(target=sam_stream_accept, args=(inbound, "bob", 5))
+        armed.start()
+        outbound = sam_hello()
+        sam_stream_connect(outbound, "alice", bob_pub)
+        armed.join(5)
+        parse_stream_header(inbound.read_line())
+        streams.extend((outbound, inbound))
+        return outbound, inbound
+
+    yield open_pair
+    for conn in streams + [control for control, _ in sessions]:
+        conn.close()
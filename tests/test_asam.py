@@ -0,0 +1,94 @@
+"""The asyncio SAM client against the emulated bridge."""
+
+import asyncio
+
+import pytest
+
+from src import asam
+from src.sam import SamError
+from src.sam_emulator import generate_destination
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+def test_session_with_given_key_knows_its_dest(sam_bridge):
+    pub, priv = generate_destination()
+
+    async def main():
+        async with await asam.AsyncSamSession.create("alice", priv) as session:
+            return session.pub
+
+    assert _run(main()) == pub
+
+
+def test_stream_connect_accept_frames(sam_bridge):
+    async def main():
+        async with await asam.AsyncSamSession.create("alice") as alice, \
+                await asam.AsyncSamSession.create("bob") as bob:
+            accept = asyncio.create_task(bob.accept())
+            await asyncio.sleep(0.05)   # ACCEPT armed before the CONNECT
+            outbound = await alice.connect(bob.pub)
+            inbound, peer = await accept
+            await asam.write_frame(outbound, b"ping")
+            assert await asam.read_frame(inbound) == b"ping"
+            await asam.write_frame(inbound, b"pong")
+            assert await asam.read_frame(outbound) == b"pong"
+            await outbound.close()
+            assert await asam.read_frame(inbound) is None
+            await inbound.close()
+            return peer, alice.pub
+
+    peer, alice_pub = _run(main())
+    assert peer == alice_pub
+
+
+def test_forward_serves_every_stream(sam_bridge):
+    async def main():
+        async with await asam.AsyncSamSession.create("alice") as alice, \
+                await asam.AsyncSamSession.create("bob") as bob:
+            peers = []
+
+            async def on_stream(conn, peer_dest):
+                peers.append(peer_dest)
+                payload = await asam.read_frame(conn)
+                await asam.write_frame(conn, payload.upper())
+                await conn.close()
+
+            server, forward = await bob.forward(on_stream)
+            try:
+                replies = []
+                for text in (b"one", b"two"):
+                    conn = await alice.connect(bob.pub)
+                    await asam.write_frame(conn, text)
+                    replies.append(await asam.read_frame(conn))
+                    await conn.close()
+            finally:
+                await forward.close()
+                server.close()
+            return replies, peers, alice.pub
+
+    replies, peers, alice_pub = _run(main())
+    assert replies == [b"ONE", b"TWO"]
+    assert peers == [alice_pub, alice_pub]
+
+
+def test_oversized_frame_is_skipped(sam_bridge):
+    async def main():
+        async with await asam.AsyncSamSession.create("alice") as alice, \
+                await asam.AsyncSamSession.create("bob") as bob:
+            accept = asyncio.create_task(bob.accept())
+            await asyncio.sleep(0.05)
+            outbound = await alice.connect(bob.pub)
+            inbound, _ = await accept
+            await asam.write_frame(outbound, b"x" * 100)
+            await asam.write_frame(outbound, b"ok")
+            with pytest.raises(SamError):
+                await asam.read_frame(inbound, max_size=10)
+            frame = await asam.read_frame(inbound, max_size=10)
+            await outbound.close()
+            await inbound.close()
+            return frame
+
+    assert _run(main()) == b"ok"
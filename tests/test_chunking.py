@@ -0,0 +1,68 @@
+"""Splitting long messages and the Reassembler's limits."""
+
+import pytest
+
+from src.chunking import MessageTooLarge, Reassembler, pack_chunk, split, unpack_chunk
+
+
+def test_split_covers_the_message():
+    data = bytes(range(256)) * 10
+    chunks = list(split(data, 1000))
+    assert [last for _, last in chunks] == [False, False, True]
+    assert b"".join(bytes(chunk) for chunk, _ in chunks) == data
+
+
+def test_chunk_header_round_trip():
+    message_id, payload = unpack_chunk(pack_chunk(7, b"payload"))
+    assert message_id == 7
+    assert bytes(payload) == b"payload"
+    with pytest.raises(ValueError):
+        unpack_chunk(b"\x00\x00")
+
+
+def test_character_cut_between_chunks():
+    data = "héllo wörld €".encode()
+    reassembler = Reassembler()
+    texts = [reassembler.feed(1, bytes(chunk), last) for chunk, last in split(data, 3)]
+    assert texts[:-1] == [None] * (len(texts) - 1)
+    assert texts[-1] == "héllo wörld €"
+    assert len(reassembler) == 0
+
+
+def test_interleaved_messages():
+    reassembler = Reassembler()
+    assert reassembler.feed(1, b"ab", False) is None
+    assert reassembler.feed(2, b"xy", False) is None
+    assert reassembler.feed(2, b"z", True) == "xyz"
+    assert reassembler.feed(1, b"c", True) == "abc"
+
+
+def test_message_over_the_size_limit_is_dropped():
+    reassembler = Reassembler(max_size=10)
+    reassembler.feed(1, b"x" * 6, False)
+    with pytest.raises(MessageTooLarge):
+        reassembler.feed(1, b"x" * 6, False)
+    # The rest of the message is ignored, never delivered in part
+    assert reassembler.feed(1, b"x", True) is None
+    assert len(reassembler) == 0
+    assert reassembler.feed(1, b"new", True) == "new"   # the id is free again
+
+
+def test_oldest_unfinished_message_is_evicted():
+    reassembler = Reassembler(max_assembling=2)
+    reassembler.feed(1, b"a", False)
+    reassembler.feed(2, b"b", False)
+    reassembler.feed(3, b"c", False)
+    assert len(reassembler) == 2
+    assert reassembler.feed(1, b"!", True) is None   # evicted
+    assert reassembler.feed(2, b"b", True) == "bb"
+    assert reassembler.feed(3, b"c", True) == "cc"
+
+
+def test_invalid_utf8_is_dropped():
+    reassembler = Reassembler()
+    with pytest.raises(UnicodeDecodeError):
+        reassembler.feed(1, b"\xff", False)
+    assert reassembler.feed(1, b"tail", True) is None
+    with pytest.raises(UnicodeDecodeError):
+        reassembler.feed(2, "é".encode()[:1], True)   # ends inside a character
@@ -0,0 +1,99 @@
+"""The compression stage: methods, threshold, escapes and decoding limits."""
+
+import zlib
+
+import pytest
+
+from src import compression
+from src.compression import (
+    COMPRESSED_PREFIX, METHOD_STORED, METHOD_ZLIB, MAX_DECOMPRESSED, Compressor,
+)
+
+TEXT = ("let me know when you are ready, I think the connection dropped again. " * 20).encode()
+
+
+def _pair(method: str, threshold: int = compression.COMPRESS_THRESHOLD):
+    sender, receiver = Compressor(threshold=threshold), Compressor(threshold=threshold)
+    sender.negotiate(method)
+    receiver.negotiate(method)
+    return sender, receiver
+
+
+@pytest.mark.parametrize("method", ["zlib", "zlib-dict1"])
+def test_zlib_round_trip(method):
+    sender, receiver = _pair(method)
+    packed = sender.pack(TEXT)
+    assert packed.startswith(COMPRESSED_PREFIX)
+    assert len(packed) < len(TEXT)
+    assert receiver.unpack(packed) == TEXT
+    assert sender.stats["sent_compressed"] == receiver.stats["received_compressed"] == 1
+
+
+def test_dictionary_shrinks_mid_sized_text():
+    text = "thank you, did you get my message? let me know when you are ready".encode()
+    plain, _ = _pair("zlib", threshold=0)
+    primed, receiver = _pair("zlib-dict1", threshold=0)
+    packed = primed.pack(text)
+    assert len(packed) < len(plain.pack(text))
+    assert receiver.unpack(packed) == text
+
+
+@pytest.mark.parametrize("method", ["zstd", "zstd-dict1"])
+def test_zstd_round_trip(method):
+    pytest.importorskip("zstandard")
+    sender, receiver = _pair(method)
+    packed = sender.pack(TEXT)
+    assert len(packed) < len(TEXT)
+    assert receiver.unpack(packed) == TEXT
+
+
+def test_zstd_is_only_offered_when_installed(monkeypatch):
+    monkeypatch.setattr(compression, "_zstd", lambda: None)
+    assert Compressor().methods == ["zlib-dict1", "zlib"]
+
+
+def test_below_threshold_is_sent_unchanged():
+    sender, receiver = _pair("zlib")
+    short = TEXT[:compression.COMPRESS_THRESHOLD - 1]
+    assert sender.pack(short) == short
+    assert receiver.unpack(short) == short
+    assert sender.stats["sent_compressed"] == 0
+
+
+def test_text_with_the_prefix_is_escaped():
+    sender, receiver = _pair("zlib")
+    data = COMPRESSED_PREFIX + b"\x01 not really compressed"
+    packed = sender.pack(data)
+    assert packed == COMPRESSED_PREFIX + bytes([METHOD_STORED]) + data
+    assert receiver.unpack(packed) == data
+
+
+def test_nothing_is_compressed_or_decoded_before_a_method_is_agreed():
+    sender, receiver = Compressor(), Compressor()
+    assert sender.pack(TEXT) == TEXT
+    compressed = COMPRESSED_PREFIX + bytes([METHOD_ZLIB]) + zlib.compress(TEXT)
+    # A peer without compression: bytes that look compressed are its text
+    assert receiver.unpack(compressed) == compressed
+    assert receiver.stats["received_compressed"] == 0
+
+
+def test_method_the_peer_does_not_share_is_not_used():
+    sender = Compressor(methods=["zlib"])
+    sender.negotiate("zstd-dict1")
+    assert sender.method is None
+    assert sender.pack(TEXT) == TEXT
+
+
+def test_oversized_output_is_refused():
+    _, receiver = _pair("zlib")
+    bomb = COMPRESSED_PREFIX + bytes([METHOD_ZLIB]) + zlib.compress(b"\x00" * (MAX_DECOMPRESSED + 1))
+    with pytest.raises(ValueError, match="exceeds"):
+        receiver.unpack(bomb)
+
+
+def test_malformed_payloads_are_refused():
+    _, receiver = _pair("zlib")
+    with pytest.raises(ValueError):
+        receiver.unpack(COMPRESSED_PREFIX)
+    with pytest.raises(ValueError):
+        receiver.unpack(COMPRESSED_PREFIX + b"\x7f" + b"data")
@@ -0,0 +1,108 @@
+"""ConnectRace against the emulated bridge: winners, losers, stagger, backoff."""
+
+import threading
+import time
+
+import pytest
+
+from src import connector
+from src.connector import ConnectRace
+from src.sam import SamError, sam_hello, sam_dest_generate, sam_create_session, sam_stream_accept
+from src.sam_emulator import generate_destination
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Every SAM connection the race opens, in order."""
+    conns = []
+
+    def hello(*args, **kwargs):
+        conn = sam_hello(*args, **kwargs)
+        conns.append(conn)
+        return conn
+    monkeypatch.setattr(connector, "sam_hello", hello)
+    return conns
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(connector, "RETRY_BASE_DELAY", 0.1)
+
+
+def _session(nickname: str):
+    control = sam_hello()
+    pub, priv = sam_dest_generate(control)
+    sam_create_session(control, nickname, priv)
+    return control, pub
+
+
+def _attempts():
+    """on_attempt callback recording (index, attempt, monotonic time)."""
+    log = []
+    return log, lambda index, attempt: log.append((index, attempt, time.monotonic()))
+
+
+def test_first_stream_wins_and_losers_are_closed(sam_bridge, opened):
+    sam_bridge.connect_timeout = 5   # the silent host keeps its attempt in flight
+    controls = [_session(nickname) for nickname in ("alice", "bob", "carol")]
+    bob_pub, carol_pub = controls[1][1], controls[2][1]
+    inbound = sam_hello()
+    armed = threading.Thread(target=sam_stream_accept, args=(inbound, "bob", 5))
+    armed.start()
+    try:
+        conn, target = ConnectRace("alice", [carol_pub, bob_pub], width=2, stagger=0.05).run(5)
+        armed.join(5)
+        assert target == bob_pub
+        assert conn in opened
+        losers = [other for other in opened if other is not conn]
+        deadline = time.monotonic() + 2   # a slot may still be closing its own
+        while any(other.sock.fileno() != -1 for other in losers) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert losers and all(other.sock.fileno() == -1 for other in losers)
+        assert conn.sock.fileno() != -1
+        conn.close()
+    finally:
+        inbound.close()
+        for control, _ in controls:
+            control.close()
+
+
+def test_retries_back_off_then_raise_the_last_error(sam_bridge, fast_retries):
+    control, _ = _session("alice")
+    unreachable, _ = generate_destination()
+    log, on_attempt = _attempts()
+    try:
+        with pytest.raises(SamError) as info:
+            ConnectRace("alice", [unreachable], width=1, max_attempts=3,
+                        on_attempt=on_attempt).run(10)
+        assert info.value.result == "CANT_REACH_PEER"
+        assert [attempt for _, attempt, _ in log] == [1, 2, 3]
+        gaps = [b[2] - a[2] for a, b in zip(log, log[1:])]
+        assert 0.1 <= gaps[0] < 0.2 <= gaps[1]   # the delay doubles
+    finally:
+        control.close()
+
+
+def test_second_slot_starts_after_the_stagger(sam_bridge, fast_retries):
+    control, _ = _session("alice")
+    unreachable, _ = generate_destination()
+    log, on_attempt = _attempts()
+    try:
+        with pytest.raises(SamError):
+            ConnectRace("alice", [unreachable], width=2, max_attempts=2, stagger=0.3,
+                        on_attempt=on_attempt).run(10)
+        assert len(log) == 4   # max_attempts per slot
+        first_tries = [t for _, attempt, t in log if attempt == 1]
+        assert first_tries[1] - first_tries[0] >= 0.3
+    finally:
+        control.close()
+
+
+def test_unretryable_error_stops_at_once(sam_bridge, fast_retries):
+    unreachable, _ = generate_destination()
+    log, on_attempt = _attempts()
+    with pytest.raises(SamError) as info:
+        ConnectRace("no-such-session", [unreachable], width=1, max_attempts=3,
+                    on_attempt=on_attempt).run(10)
+    assert info.value.result == "INVALID_ID"
+    assert len(log) == 1
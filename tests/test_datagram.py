@@ -0,0 +1,139 @@
+"""DatagramChannel over the emulated bridge: acks, retransmits, stream fallback, dedup."""
+
+import threading
+import time
+
+import pytest
+
+from src import datagram
+from src.datagram import (
+    DatagramChannel, DatagramSession, DATAGRAM_MAX_PAYLOAD, DEDUP_WINDOW, KIND_ACK, KIND_DATA,
+    RESENT_PREFIX, RETRY_LIMIT,
+)
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class _Link:
+    """Two DatagramChannels on their own DATAGRAM sessions, offers exchanged."""
+
+    def __init__(self):
+        self.received = []    # payloads b delivered
+        self.fallback = []    # stream copies a handed back
+        self.sessions = [DatagramSession.create(), DatagramSession.create()]
+        self.a = DatagramChannel(self.sessions[0], lambda payload: None, self.fallback.append)
+        self.b = DatagramChannel(self.sessions[1], self.received.append, lambda payload: None)
+        self.a.handle_offer(self.b.offer())
+        self.b.handle_offer(self.a.offer())
+
+    def filter(self, index: int, keep):
+        """Only send the datagrams of session index for which keep(kind) is true."""
+        session = self.sessions[index]
+        send = session.send
+        session.send = lambda dest, data: send(dest, data) if keep(data[0]) else None
+
+    def close(self):
+        for channel in (self.a, self.b):
+            channel.close()
+        for session in self.sessions:
+            session.close()
+
+
+@pytest.fixture
+def link(sam_bridge, monkeypatch):
+    monkeypatch.setattr(datagram, "RETRY_TIMEOUT", 0.05)
+    pair = _Link()
+    yield pair
+    pair.close()
+
+
+def test_acked_datagram_is_delivered_once(link):
+    assert link.a.send(b"hello")
+    assert _wait_for(lambda: link.received == [b"hello"])
+    time.sleep(0.3)   # past several retry timeouts: nothing resent
+    assert link.received == [b"hello"]
+    assert link.fallback == []
+
+
+def test_lost_acks_deliver_once(link):
+    link.filter(1, lambda kind: kind != KIND_ACK)   # b's acks never arrive
+    assert link.a.send(b"hello")
+    assert _wait_for(lambda: link.fallback)
+    # b got every retransmit but delivered the first only
+    assert link.received == [b"hello"]
+    assert link.fallback == [RESENT_PREFIX + (1).to_bytes(8, 'big') + b"hello"]
+    assert link.b.handle_resent(link.fallback[0])
+    assert link.received == [b"hello"]
+
+
+def test_retransmits_until_the_limit(link):
+    copies = []
+    link.sessions[0].send = lambda dest, data: copies.append(data[0])   # every datagram lost
+    assert link.a.send(b"hello")
+    assert _wait_for(lambda: link.fallback)
+    assert copies == [KIND_DATA] * RETRY_LIMIT
+
+
+def test_stream_fallback_when_no_ack_ever_arrives(link):
+    link.filter(0, lambda kind: False)
+    assert link.a.send(b"over the stream")
+    assert _wait_for(lambda: link.fallback)
+    assert link.received == []
+    assert link.b.handle_resent(link.fallback[0])
+    assert link.received == [b"over the stream"]
+
+
+def test_datagram_arriving_after_its_stream_copy_is_dropped(link):
+    held = []
+    session = link.sessions[0]
+    send = session.send
+    session.send = lambda dest, data: held.append((dest, data))
+    assert link.a.send(b"late")
+    assert _wait_for(lambda: link.fallback)
+    assert link.b.handle_resent(link.fallback[0])
+    assert link.received == [b"late"]
+    for dest, data in held:   # the datagrams get through after all
+        send(dest, data)
+    time.sleep(0.3)
+    assert link.received == [b"late"]
+
+
+def test_payloads_that_must_take_the_stream(link):
+    assert not link.a.send(b"x" * (DATAGRAM_MAX_PAYLOAD + 1))
+    lonely = DatagramChannel(link.sessions[0], lambda payload: None, lambda payload: None)
+    assert not lonely.send(b"no offer from the peer yet")
+    assert not link.b.handle_resent(b"an ordinary payload")
+
+
+def test_gap_older_than_the_dedup_window_is_given_up():
+    delivered = []
+    channel = DatagramChannel(None, delivered.append, None)
+
+    def resent(seq: int) -> bytes:
+        return RESENT_PREFIX + seq.to_bytes(8, 'big') + str(seq).encode()
+    # seq 1 never arrives; everything after it is held as out of order
+    for seq in range(2, DEDUP_WINDOW + 3):
+        channel.handle_resent(resent(seq))
+    assert len(delivered) == DEDUP_WINDOW + 1
+    channel.handle_resent(resent(1))   # too late: the window moved past it
+    channel.handle_resent(resent(DEDUP_WINDOW + 2))
+    assert len(delivered) == DEDUP_WINDOW + 1
+    channel.handle_resent(resent(DEDUP_WINDOW + 3))
+    assert delivered[-1] == str(DEDUP_WINDOW + 3).encode()
+
+
+def test_concurrent_senders_get_distinct_seqs(link):
+    threads = [threading.Thread(target=link.a.send, args=(f"m{i}".encode(),)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _wait_for(lambda: len(link.received) == 20)
+    assert sorted(link.received) == sorted(f"m{i}".encode() for i in range(20))
@@ -0,0 +1,196 @@
+"""The inbound gate: rate limit, OpenPGP screening, armor heads and the frame MAC."""
+
+import base64
+import time
+
+import pytest
+
+from src.gate import (
+    ARMOR_BEGIN, MAC_TAG_SIZE, InboundGate, TokenBucket, frame_tag, pgp_key_ids,
+)
+
+OUR_ID = bytes.fromhex("1111111111111111")
+OTHER_ID = bytes.fromhex("2222222222222222")
+MAC_KEY = bytes(range(32))
+CONTEXT = bytes(16) + b"\x00\x01"
+
+
+def _pkesk(key_id: bytes) -> bytes:
+    """A new-format PKESK packet (v3, RSA) naming key_id."""
+    body = b"\x03" + key_id + b"\x01" + b"\x00\x08\xff"
+    return bytes([0xC0 | 1, len(body)]) + body
+
+
+def _seipd(size: int = 32) -> bytes:
+    return bytes([0xC0 | 18, size + 1, 1]) + bytes(size)
+
+
+def _armor(data: bytes, end: bool = True) -> bytes:
+    lines = ARMOR_BEGIN + b"\n\n" + base64.b64encode(data) + b"\n"
+    return lines + (b"=AAAA\n-----END PGP MESSAGE-----\n" if end else b"")
+
+
+def _gate(**kwargs) -> InboundGate:
+    return InboundGate(frozenset({OUR_ID}), **kwargs)
+
+
+# ─── Rate limit ───────────────────────────────────────────────────────────────
+
+def test_bucket_refuses_without_blocking():
+    bucket = TokenBucket(rate=1, burst=2)
+    started = time.monotonic()
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+    assert time.monotonic() - started < 0.1
+
+
+def test_payloads_over_the_rate_are_dropped():
+    gate = _gate(rate=1, burst=3)
+    message = _pkesk(OUR_ID) + _seipd()
+    started = time.monotonic()
+    passed = [gate.screen(message) is not None for _ in range(10)]
+    assert time.monotonic() - started < 0.1
+    assert passed == [True] * 3 + [False] * 7
+    assert gate.stats["rate_limited"] == 7 and gate.stats["passed"] == 3
+
+
+def test_rate_zero_is_unlimited():
+    gate = _gate(rate=0, burst=1)
+    assert all(gate.admit(1 << 20) for _ in range(1000))
+
+
+# ─── OpenPGP screening ────────────────────────────────────────────────────────
+
+def test_pkesk_for_us_passes():
+    gate = _gate()
+    assert gate.screen(_pkesk(OTHER_ID) + _pkesk(OUR_ID) + _seipd()) is not None
+    assert gate.stats["passed"] == 1
+
+
+def test_pkesk_for_another_key_is_wrong_recipient():
+    gate = _gate()
+    assert gate.screen(_pkesk(OTHER_ID) + _seipd()) is None
+    assert gate.screen(_seipd()) is None   # no session key packet at all
+    assert gate.stats["wrong_recipient"] == 2
+
+
+def test_real_message_for_another_key():
+    from pgpy import PGPMessage
+    from src.pipeline import _ephemeral_key
+    ours, theirs = _ephemeral_key(), _ephemeral_key()
+    message = theirs.pubkey.encrypt(PGPMessage.new("not for us"))
+    gate = InboundGate(pgp_key_ids(ours))
+    assert gate.screen(bytes(message)) is None
+    assert gate.screen(str(message).encode()) is None
+    assert gate.stats["wrong_recipient"] == 2
+    assert InboundGate(pgp_key_ids(theirs)).screen(str(message).encode()) is not None
+
+
+def test_malformed_packets():
+    gate = _gate()
+    for payload in (b"hello", b"\x00" * 16, _pkesk(OUR_ID)[:6], bytes([0xC0 | 11, 4]) + b"text"):
+        assert gate.screen(payload) is None
+    assert gate.stats["malformed"] == 4
+
+
+# ─── Armor heads ──────────────────────────────────────────────────────────────
+
+def test_armored_message_is_screened_like_binary():
+    gate = _gate()
+    assert gate.screen(_armor(_pkesk(OUR_ID) + _seipd())) is not None
+    assert gate.screen(_armor(_pkesk(OTHER_ID) + _seipd())) is None
+    assert gate.stats["wrong_recipient"] == 1
+
+
+def test_malformed_armor_heads():
+    gate = _gate()
+    for payload in (
+        ARMOR_BEGIN + b"\nno blank line before the body",
+        ARMOR_BEGIN + b"\n\n!!!! not base64 !!!!\n=AAAA\n",
+        _armor(b"plain text, not packets"),
+    ):
+        assert gate.screen(payload) is None
+    assert gate.stats["malformed"] == 3
+
+
+def test_truncated_armor_heads():
+    gate = _gate()
+    cut = (_pkesk(OUR_ID) + _seipd())[:5]
+    assert gate.screen(_armor(cut)) is None             # it ends, inside the first packet
+    assert gate.screen(_armor(_pkesk(OUR_ID) + _seipd(), end=False)) is None
+    assert gate.screen(ARMOR_BEGIN + b"\n\n") is None
+    assert gate.stats["malformed"] == 3
+
+
+# ─── Frame MAC ────────────────────────────────────────────────────────────────
+
+def _tagged(body: bytes, key: bytes = MAC_KEY) -> bytes:
+    return body + frame_tag(key, CONTEXT, body)
+
+
+def test_good_tag_passes_and_is_stripped():
+    gate = _gate(mac_key=MAC_KEY)
+    body = _pkesk(OUR_ID) + _seipd()
+    assert bytes(gate.screen(_tagged(body), True, CONTEXT)) == body
+    assert gate.mac_seen
+
+
+def test_bad_tags_are_dropped():
+    gate = _gate(mac_key=MAC_KEY)
+    body = _pkesk(OUR_ID) + _seipd()
+    forged = bytearray(_tagged(body))
+    forged[-1] ^= 1
+    for payload, context in (
+        (bytes(forged), CONTEXT),
+        (_tagged(body, bytes(32)), CONTEXT),   # another key
+        (_tagged(body), bytes(18)),            # another session or channel
+        (body[:MAC_TAG_SIZE - 1], CONTEXT),    # shorter than a tag
+    ):
+        assert gate.screen(payload, True, context) is None
+    assert gate.stats["bad_mac"] == 4
+    assert _gate().screen(_tagged(body), True, CONTEXT) is None   # we never offered a key
+
+
+def test_untagged_frames_are_refused_once_a_tag_checked_out():
+    gate = _gate(mac_key=MAC_KEY)
+    body = _pkesk(OUR_ID) + _seipd()
+    assert gate.screen(body) is not None   # the peer may not have our key yet
+    assert gate.screen(_tagged(body), True, CONTEXT) is not None
+    assert gate.screen(body) is None
+    assert gate.stats["bad_mac"] == 1
+
+
+def test_untagged_frames_are_refused_once_the_mac_is_required():
+    gate = _gate(mac_key=MAC_KEY)
+    gate.mac_required = True
+    body = _pkesk(OUR_ID) + _seipd()
+    assert gate.screen(body) is None
+    assert gate.stats["bad_mac"] == 1
+    assert gate.screen(_tagged(body), True, CONTEXT) is not None
+
+
+def test_pipeline_requires_the_mac_after_both_hellos():
+    pytest.importorskip("argon2")   # PgpCodec encrypts through src.encrypt
+    from src.pipeline import MessagePipeline, PgpCodec, _ephemeral_key
+    from src.transport import UnixBackend
+    key_a, key_b = _ephemeral_key(), _ephemeral_key()
+    got = []
+    a = MessagePipeline(PgpCodec(key_a, key_b.pubkey), lambda text: None, symmetric_modes=[])
+    b = MessagePipeline(PgpCodec(key_b, key_a.pubkey), got.append,
+                        session_id=a.channel.session_id, symmetric_modes=[])
+    sock_a, sock_b = UnixBackend.pair()
+    try:
+        a.attach(sock_a)
+        a.send_text("typed before the hellos")   # held until a has b's MAC key
+        b.attach(sock_b)
+        deadline = time.monotonic() + 30
+        while len(got) < 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert got == ["typed before the hellos"]
+        assert b.gate.mac_required and b.gate.stats["bad_mac"] == 0
+        b._on_payload(a.codec.encode(b"bare"))   # an untagged payload on the stream
+        assert got == ["typed before the hellos"]
+        assert b.gate.stats["bad_mac"] == 1
+    finally:
+        a.close(drain=False)
+        b.close(drain=False)
@@ -0,0 +1,101 @@
+"""Session hello packing, checking and negotiation."""
+
+import pytest
+
+from src.handshake import (
+    HELLO_PREFIX, HandshakeError, Hello, PAYLOAD_ARMORED, PAYLOAD_BINARY, MAX_HELLO_SIZE,
+    is_control, is_hello, negotiate, pack_hello, parse_hello,
+)
+from src.pipeline import PlainCodec
+
+SESSION = bytes(range(16))
+
+
+def _hello(**fields) -> Hello:
+    defaults = dict(
+        version=1, session=SESSION.hex(), frames=1, compression=["zlib"],
+        payloads=[PAYLOAD_BINARY, PAYLOAD_ARMORED], symmetric=[], max_frame=64 * 1024,
+        max_message=1024 * 1024,
+    )
+    defaults.update(fields)
+    return Hello(**defaults)
+
+
+def _raw_hello(body: bytes) -> bytes:
+    """An unsigned hello payload around a hand-written JSON body."""
+    return HELLO_PREFIX + len(body).to_bytes(2, "big") + body
+
+
+# ─── Wire format ──────────────────────────────────────────────────────────────
+
+def test_unsigned_hello_round_trip():
+    codec = PlainCodec()
+    payload = pack_hello(_hello(), codec.sign)
+    assert is_control(payload) and is_hello(payload)
+    assert parse_hello(payload, codec.verify, SESSION) == _hello()
+
+
+def test_signature_is_checked():
+    payload = pack_hello(_hello(), lambda body: b"sig:" + body[:8])
+    assert parse_hello(payload, lambda body, sig: sig == b"sig:" + body[:8], SESSION)
+    with pytest.raises(HandshakeError):
+        parse_hello(payload, lambda body, sig: False, SESSION)
+
+
+def test_hello_for_another_session():
+    payload = pack_hello(_hello())
+    with pytest.raises(HandshakeError):
+        parse_hello(payload, None, bytes(16))
+
+
+def test_malformed_hellos():
+    payload = pack_hello(_hello())
+    with pytest.raises(HandshakeError):
+        parse_hello(payload[:len(payload) // 2])
+    with pytest.raises(HandshakeError):
+        parse_hello(payload + b"x" * MAX_HELLO_SIZE)
+    with pytest.raises(HandshakeError):   # no version
+        parse_hello(_raw_hello(b'{"session":"00"}'))
+    with pytest.raises(HandshakeError):
+        parse_hello(_raw_hello(b'not json'))
+
+
+def test_missing_fields_get_defaults():
+    body = b'{"session":"%s","version":1}' % SESSION.hex().encode()
+    hello = parse_hello(_raw_hello(body), None, SESSION)
+    assert hello.frames == 0
+    assert hello.payloads == [PAYLOAD_ARMORED]
+    assert hello.max_message == 0 and hello.mac == ""
+
+
+# ─── Negotiation ──────────────────────────────────────────────────────────────
+
+def test_negotiate_common_settings():
+    ours = _hello(compression=["zstd", "zlib"], mac="key")
+    theirs = _hello(compression=["zlib"], max_frame=32 * 1024, mac="key")
+    negotiated = negotiate(ours, theirs)
+    assert negotiated.compression == "zlib"
+    assert not negotiated.armored
+    assert negotiated.max_frame == 32 * 1024
+    assert negotiated.max_message == 1024 * 1024
+    assert negotiated.mac
+
+
+def test_negotiate_with_a_bare_payload_peer():
+    negotiated = negotiate(_hello(mac="key"), _hello(frames=0, payloads=[PAYLOAD_ARMORED], mac="key"))
+    assert negotiated.frames == 0
+    assert negotiated.armored
+    assert negotiated.max_message == 0   # chunks need typed frames
+    assert not negotiated.mac            # so do tags
+
+
+def test_negotiate_symmetric_needs_both_keys():
+    modes = ["x25519-aes256gcm", "x25519-chacha20poly1305"]
+    ours = _hello(symmetric=modes, ephemeral="a")
+    assert negotiate(ours, _hello(symmetric=modes[1:], ephemeral="b")).symmetric == modes[1]
+    assert negotiate(ours, _hello(symmetric=modes)).symmetric is None
+    assert negotiate(ours, _hello(ephemeral="b")).symmetric is None
+
+
+def test_negotiate_no_common_compression():
+    assert negotiate(_hello(compression=["zstd"]), _hello(compression=[])).compression is None
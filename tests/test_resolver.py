@@ -0,0 +1,77 @@
+"""NameResolver cache (LRU, TTL) and b32 checks against the emulated bridge."""
+
+import types
+
+import pytest
+
+from src import resolver as resolver_module
+from src.resolver import NameResolver
+from src.sam import b32_address, sam_hello, sam_dest_generate, sam_create_session
+from src.sam_emulator import generate_destination
+
+
+def _session(nickname: str):
+    control = sam_hello()
+    pub, priv = sam_dest_generate(control)
+    sam_create_session(control, nickname, priv)
+    return control, pub
+
+
+def test_full_dest_is_not_looked_up():
+    pub, _ = generate_destination()
+    resolver = NameResolver()
+    assert resolver.resolve(pub) == pub
+    assert (resolver.hits, resolver.misses) == (0, 0)
+
+
+def test_b32_lookup_hashes_back_to_the_name(sam_bridge):
+    control, pub = _session("alice")
+    try:
+        resolver = NameResolver()
+        name = b32_address(pub)
+        assert resolver.resolve(name) == pub
+        assert resolver.resolve(name) == pub
+        assert (resolver.hits, resolver.misses) == (1, 1)
+    finally:
+        control.close()
+
+
+def test_b32_answer_for_another_dest_is_rejected(sam_bridge):
+    pub, _ = generate_destination()
+    other, _ = generate_destination()
+    name = b32_address(pub)
+    sam_bridge.hosts[name] = other   # a bridge answering with the wrong DEST
+    resolver = NameResolver()
+    with pytest.raises(Exception, match="does not match"):
+        resolver.resolve(name)
+    sam_bridge.hosts[name] = pub
+    assert resolver.resolve(name) == pub   # nothing was cached
+
+
+def test_least_recently_used_name_is_evicted(sam_bridge):
+    dests = {name: generate_destination()[0] for name in ("a.i2p", "b.i2p", "c.i2p")}
+    sam_bridge.hosts.update(dests)
+    resolver = NameResolver(max_entries=2)
+    resolver.resolve("a.i2p")
+    resolver.resolve("b.i2p")
+    resolver.resolve("a.i2p")   # b is now the least recently used
+    resolver.resolve("c.i2p")
+    # Changed answers only show for names that are no longer cached
+    sam_bridge.hosts.update({name: generate_destination()[0] for name in dests})
+    assert resolver.resolve("a.i2p") == dests["a.i2p"]
+    assert resolver.resolve("c.i2p") == dests["c.i2p"]
+    assert resolver.resolve("b.i2p") == sam_bridge.hosts["b.i2p"]
+
+
+def test_answers_expire_after_the_ttl(sam_bridge, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resolver_module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    first, second = generate_destination()[0], generate_destination()[0]
+    sam_bridge.hosts["room.i2p"] = first
+    resolver = NameResolver(ttl=60)
+    assert resolver.resolve("room.i2p") == first
+    sam_bridge.hosts["room.i2p"] = second
+    now[0] += 59
+    assert resolver.resolve("room.i2p") == first
+    now[0] += 2
+    assert resolver.resolve("room.i2p") == second
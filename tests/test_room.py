@@ -0,0 +1,243 @@
+"""Room fan-out over the emulated bridge: membership, relaying, slow peers, resume."""
+
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("argon2")     # src.room encrypts through src.encrypt
+pytest.importorskip("colorama")
+
+from src import reliable, room as room_module
+from src.datagram import DatagramSession
+from src.pipeline import MessagePipeline, PgpCodec, _ephemeral_key
+from src.reliable import ReliableChannel
+from src.room import Room
+from src.sam import sam_hello, sam_dest_generate, sam_create_session, sam_stream_connect
+
+MEMBERS = ("alice", "bob", "carol")
+
+
+def _wait_for(condition, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def _session(nickname: str):
+    control = sam_hello()
+    pub, priv = sam_dest_generate(control)
+    sam_create_session(control, nickname, priv)
+    return control, pub
+
+
+@pytest.fixture(scope="module")
+def keys():
+    """The host's key, the members' and an outsider's (RSA: made once)."""
+    return {name: _ephemeral_key() for name in ("host", "mallory") + MEMBERS}
+
+
+class _Host:
+    """
+    A Room serving SAM session "room", as create_room() sets it up; peers
+    dial in from session "guests" and resume by dialling again.
+    """
+
+    def __init__(self, keys, **options):
+        self.keys = keys
+        self.events = []
+        control, self.dest = _session("room")
+        self.controls = [control, _session("guests")[0]]
+        self.room = Room(keys["host"], [keys[name].pubkey for name in MEMBERS],
+                         lambda *event: self.events.append(event), **options)
+        self.room.serve("room")
+        self.streams = []    # every stream a peer opened, oldest first
+        self.to_close = []   # the peers' ends
+
+    def dial(self):
+        conn = sam_hello()
+        sam_stream_connect(conn, "guests", self.dest)
+        self.streams.append(conn)
+        return conn
+
+    def join(self, name: str, resume: bool = False, **options) -> MessagePipeline:
+        """A peer signing its hello with `name`'s key; pipeline.received has its messages."""
+        received = []
+        pipeline = MessagePipeline(PgpCodec(self.keys[name], self.keys["host"].pubkey),
+                                   received.append, reconnect=self.dial if resume else None,
+                                   **options)
+        pipeline.received = received
+        self.to_close.append(lambda: pipeline.close(drain=False))
+        self.seat(pipeline.attach, pipeline)
+        return pipeline
+
+    def seat(self, attach, peer):
+        """Dial in with attach(sock) and wait until the room seats the stream."""
+        joined = len(self.labels("join"))
+        attach(self.dial())
+        assert _wait_for(lambda: len(self.labels("join")) > joined)
+        peer.label = self.labels("join")[-1]
+
+    def labels(self, kind: str) -> list:
+        return [who for event, who, _ in self.events if event == kind]
+
+    def messages_from(self, label: str) -> list:
+        return [text for kind, who, text in self.events if kind == "message" and who == label]
+
+    def close(self):
+        for close in self.to_close:
+            close()
+        self.room.close()
+        for conn in self.streams + self.controls:
+            conn.close()
+
+
+@pytest.fixture
+def open_room(keys, sam_bridge):
+    hosts = []
+
+    def open_room(**options) -> _Host:
+        hosts.append(_Host(keys, **options))
+        return hosts[-1]
+    yield open_room
+    for host in hosts:
+        host.close()
+
+
+@pytest.fixture
+def host(open_room):
+    return open_room()
+
+
+def _negotiated(*peers) -> bool:
+    return _wait_for(lambda: all(peer.negotiated for peer in peers))
+
+
+# ─── Membership ───────────────────────────────────────────────────────────────
+
+def test_members_are_seated(host):
+    peers = [host.join(name) for name in MEMBERS]
+    assert _negotiated(*peers)
+    assert host.room.peer_count() == 3
+    assert host.labels("join") == [peer.label for peer in peers]
+    assert _wait_for(lambda: len(host.labels("negotiated")) == 3)
+
+
+def test_non_member_is_dropped_and_never_relayed(host):
+    alice, bob = host.join("alice"), host.join("bob")
+    assert _negotiated(alice, bob)
+    mallory = host.join("mallory")
+    mallory.send_text("let me in")   # right behind its hello
+    assert _wait_for(lambda: ("leave", mallory.label, "hello not signed by a member key")
+                     in host.events)
+    assert host.room.peer_count() == 2
+    alice.send_text("who was that?")
+    assert _wait_for(lambda: bob.received == [f"{alice.label}: who was that?"])
+    assert host.messages_from(mallory.label) == []
+    assert alice.received == [] and mallory.received == []
+    assert mallory.negotiated is None   # the host never answered
+
+
+def test_peer_without_a_hello_is_sent_nothing(host):
+    alice = host.join("alice")
+    # A member's key, but no hello: a bare PGP payload straight on the stream
+    received = []
+    silent = ReliableChannel(received.append)
+    host.seat(silent.attach, silent)
+    host.to_close.append(silent.close)
+    codec = PgpCodec(host.keys["bob"], host.keys["host"].pubkey)
+    silent.send(codec.encode(b"unannounced"))
+    assert _negotiated(alice)
+    alice.send_text("anyone there?")
+    assert _wait_for(lambda: host.messages_from(alice.label) == ["anyone there?"])
+    time.sleep(0.5)
+    assert host.messages_from(silent.label) == []
+    assert alice.received == [] and received == []
+
+
+# ─── Fan-out ──────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("datagrams", [False, True], ids=["streams", "datagrams"])
+def test_each_message_reaches_every_other_peer_once(open_room, datagrams):
+    def datagram_session():
+        return DatagramSession.create() if datagrams else None
+    host = open_room(datagram_session=datagram_session())
+    peers = [host.join(name, datagram_session=datagram_session()) for name in MEMBERS]
+    assert _negotiated(*peers)
+    for peer in peers:
+        peer.send_text(f"hi from {peer.label}")
+    assert _wait_for(lambda: all(len(peer.received) >= 2 for peer in peers))
+    time.sleep(0.5)   # nothing more arrives: no second copy, no echo
+    for peer in peers:
+        assert sorted(peer.received) == sorted(f"{other.label}: hi from {other.label}"
+                                               for other in peers if other is not peer)
+    assert len(host.labels("message")) == 3
+
+
+def test_shared_payload_is_encrypted_once(open_room, monkeypatch):
+    # Without symmetric sessions every peer gets the room's PGP payload
+    host = open_room(symmetric_modes=[])
+    encrypted = []
+    encrypt = host.room._encrypt
+    monkeypatch.setattr(host.room, "_encrypt",
+                        lambda data, armored: encrypted.append(data) or encrypt(data, armored))
+    peers = [host.join(name, symmetric_modes=[]) for name in MEMBERS]
+    assert _negotiated(*peers)
+    assert all(peer.session is None for peer in peers)
+    host.room.broadcast("one payload for everyone")
+    assert _wait_for(lambda: all(peer.received == ["one payload for everyone"] for peer in peers))
+    assert encrypted == [b"one payload for everyone"]
+
+
+def test_symmetric_peers_get_their_own_sessions(host):
+    peers = [host.join(name) for name in MEMBERS]
+    assert _negotiated(*peers)
+    host.room.broadcast("sealed per peer")
+    assert _wait_for(lambda: all(peer.received == ["sealed per peer"] for peer in peers))
+    assert all(peer.session is not None and peer.session.stats["opened"] == 1 for peer in peers)
+
+
+# ─── Slow peers and resume ────────────────────────────────────────────────────
+
+def test_peer_whose_queue_overflows_is_dropped(open_room, monkeypatch):
+    monkeypatch.setattr(room_module, "PEER_QUEUE_SIZE", 4)
+    host = open_room()
+    peers = [host.join(name) for name in MEMBERS]
+    assert _negotiated(*peers)
+    seats = [host.room._peers[int(peer.label[len("peer"):])] for peer in peers]
+    healthy, slow = seats[:2], seats[2]
+    slow.pipeline.queue.ready = lambda priority: False   # its writer never gets to send
+    for i in range(6):
+        host.room.broadcast(f"m{i}")
+        assert _wait_for(lambda: all(len(peer.pipeline.queue) == 0 for peer in healthy))
+    assert ("leave", peers[2].label, "too slow, disconnected") in host.events
+    assert host.room.peer_count() == 2
+    expected = [f"m{i}" for i in range(6)]
+    assert _wait_for(lambda: all(peer.received == expected for peer in peers[:2]))
+
+
+def test_peer_resumes_within_the_grace_period(host, monkeypatch):
+    monkeypatch.setattr(reliable, "RECONNECT_BASE_DELAY", 0.1)
+    alice, bob = host.join("alice", resume=True), host.join("bob")
+    assert _negotiated(alice, bob)
+    host.streams[0].sock.shutdown(socket.SHUT_RDWR)   # alice's stream drops
+    bob.send_text("did you get this?")
+    assert _wait_for(lambda: alice.label in host.labels("resume"))
+    assert _wait_for(lambda: alice.received == [f"{bob.label}: did you get this?"])
+    alice.send_text("yes")
+    assert _wait_for(lambda: bob.received == [f"{alice.label}: yes"])
+    assert host.room.peer_count() == 2
+    assert host.labels("join") == [alice.label, bob.label]
+    assert not host.labels("leave")
+
+
+def test_peer_that_does_not_return_loses_its_seat(host, monkeypatch):
+    monkeypatch.setattr(room_module, "RESUME_GRACE", 0.5)
+    alice, bob = host.join("alice"), host.join("bob")
+    assert _negotiated(alice, bob)
+    host.streams[0].sock.shutdown(socket.SHUT_RDWR)
+    assert _wait_for(lambda: ("leave", alice.label, "left the room") in host.events)
+    assert host.room.peer_count() == 1
@@ -0,0 +1,114 @@
+"""SAM reply parsing, and sessions and streams against the emulated bridge."""
+
+import threading
+
+import pytest
+
+from src.sam import (
+    SamError, parse_sam_reply, parse_stream_header, sam_hello, sam_dest_generate,
+    sam_create_session, sam_naming_lookup, sam_stream_connect, sam_stream_accept,
+)
+
+
+# ─── Reply parsing ────────────────────────────────────────────────────────────
+
+def test_reply_keeps_equals_in_values():
+    reply = parse_sam_reply("DEST REPLY PUB=abc== PRIV=def=")
+    assert (reply.topic, reply.kind) == ("DEST", "REPLY")
+    assert reply.get("PUB") == "abc=="
+    assert reply.get("PRIV") == "def="
+
+
+def test_reply_quoted_values():
+    reply = parse_sam_reply('SESSION STATUS RESULT=I2P_ERROR MESSAGE="tunnel build failed"')
+    assert not reply.ok
+    assert reply.result == "I2P_ERROR"
+    assert reply.get("MESSAGE") == "tunnel build failed"
+
+
+def test_reply_escaped_quotes_and_backslashes():
+    reply = parse_sam_reply(r'STREAM STATUS RESULT=OK MESSAGE="say \"hi\" \\ bye"')
+    assert reply.ok
+    assert reply.get("MESSAGE") == r'say "hi" \ bye'
+
+
+def test_reply_bare_key_and_empty_quotes():
+    reply = parse_sam_reply('HELLO REPLY RESULT=OK SILENT MESSAGE=""')
+    assert reply.get("SILENT") == ""
+    assert reply.get("MESSAGE") == ""
+
+
+def test_stream_header_failure_reply():
+    with pytest.raises(SamError) as info:
+        parse_stream_header('STREAM STATUS RESULT=CANT_REACH_PEER MESSAGE="no route"')
+    assert info.value.result == "CANT_REACH_PEER"
+
+
+# ─── Emulated bridge ──────────────────────────────────────────────────────────
+
+def _session(nickname: str):
+    """(control connection, pub) of a new STREAM session."""
+    control = sam_hello()
+    pub, priv = sam_dest_generate(control)
+    sam_create_session(control, nickname, priv)
+    return control, pub
+
+
+def test_session_create(sam_bridge):
+    control, pub = _session("alice")
+    try:
+        assert sam_naming_lookup(control, "ME") == pub
+    finally:
+        control.close()
+
+
+def test_session_create_duplicate_id(sam_bridge):
+    control, _ = _session("alice")
+    other = sam_hello()
+    try:
+        _, priv = sam_dest_generate(other)
+        with pytest.raises(SamError):
+            sam_create_session(other, "alice", priv)
+    finally:
+        other.close()
+        control.close()
+
+
+def test_stream_connect_accept(stream_pair):
+    outbound, inbound = stream_pair()
+    outbound.sendall(b"hello")
+    assert inbound.recv(5) == b"hello"
+    inbound.sendall(b"back")
+    assert outbound.recv(4) == b"back"
+
+
+def test_stream_accept_header(sam_bridge):
+    alice, alice_pub = _session("alice")
+    bob, bob_pub = _session("bob")
+    inbound = sam_hello()
+    outbound = sam_hello()
+    try:
+        armed = threading.Thread(target=sam_stream_accept, args=(inbound, "bob", 5))
+        armed.start()
+        sam_stream_connect(outbound, "alice", bob_pub, to_port=7)
+        armed.join(5)
+        header = parse_stream_header(inbound.read_line())
+        assert header.dest == alice_pub
+        assert header.to_port == 7
+    finally:
+        outbound.close()
+        inbound.close()
+        alice.close()
+        bob.close()
+
+
+def test_stream_connect_unknown_peer(sam_bridge):
+    alice, _ = _session("alice")
+    nobody, _ = sam_dest_generate(alice)   # no session holds it
+    outbound = sam_hello()
+    try:
+        with pytest.raises(SamError):
+            sam_stream_connect(outbound, "alice", nobody)
+    finally:
+        outbound.close()
+        alice.close()
@@ -0,0 +1,145 @@
+"""SendQueue: priority order, per-class bounds, backpressure and follow-up jobs."""
+
+import threading
+
+import pytest
+
+from src.sendqueue import (
+    SendQueue, SendQueueFull, PRIORITY_CONTROL, PRIORITY_TEXT, PRIORITY_BULK,
+)
+
+
+class _Ready:
+    """A ready() whose classes the test opens and closes."""
+
+    def __init__(self):
+        self.held = set()
+
+    def __call__(self, priority: int) -> bool:
+        return priority not in self.held
+
+
+@pytest.fixture
+def ran():
+    return []
+
+
+def _job(ran, name, result=None):
+    def job():
+        ran.append(name)
+        return result
+    return job
+
+
+def _blocker(queue: SendQueue) -> threading.Event:
+    """Occupy the writer until the returned event is set."""
+    release, started = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+    queue.put(PRIORITY_CONTROL, job)
+    assert started.wait(5)
+    return release
+
+
+def test_highest_priority_runs_first(ran):
+    queue = SendQueue()
+    release = _blocker(queue)
+    queue.put(PRIORITY_BULK, _job(ran, "bulk"))
+    queue.put(PRIORITY_TEXT, _job(ran, "text1"))
+    queue.put(PRIORITY_CONTROL, _job(ran, "control"))
+    queue.put(PRIORITY_TEXT, _job(ran, "text2"))
+    release.set()
+    assert queue.drain(5)
+    assert ran == ["control", "text1", "text2", "bulk"]
+    queue.close()
+
+
+def test_held_back_class_does_not_block_the_others(ran):
+    ready = _Ready()
+    ready.held.add(PRIORITY_BULK)
+    queue = SendQueue(ready=ready)
+    queue.put(PRIORITY_BULK, _job(ran, "bulk"))
+    queue.put(PRIORITY_TEXT, _job(ran, "text"))
+    assert not queue.drain(0.3)
+    assert ran == ["text"]
+    ready.held.clear()
+    assert queue.drain(5)
+    assert ran == ["text", "bulk"]
+    queue.close()
+
+
+def test_bound_is_per_class(ran):
+    ready = _Ready()
+    ready.held.update({PRIORITY_TEXT, PRIORITY_BULK})
+    queue = SendQueue(maxsize=4, ready=ready)
+    for i in range(4):
+        queue.put(PRIORITY_TEXT, _job(ran, f"text{i}"))
+    with pytest.raises(SendQueueFull):
+        queue.put(PRIORITY_TEXT, _job(ran, "refused"))
+    with pytest.raises(SendQueueFull):
+        queue.put(PRIORITY_TEXT, _job(ran, "refused"), block=True, timeout=0.05)
+    # A full text class refuses neither bulk nor control jobs
+    queue.put(PRIORITY_BULK, _job(ran, "bulk"))
+    for i in range(8):
+        queue.put(PRIORITY_CONTROL, _job(ran, f"control{i}"))
+    ready.held.clear()
+    assert queue.drain(5)
+    assert "refused" not in ran and len(ran) == 13
+    queue.close()
+
+
+def test_backpressure_turns_on_and_off():
+    ready = _Ready()
+    ready.held.add(PRIORITY_TEXT)
+    events = []
+    queue = SendQueue(maxsize=8, ready=ready,
+                      on_pressure=lambda active, depth: events.append((active, depth)))
+    for _ in range(5):
+        queue.put(PRIORITY_TEXT, lambda: None)
+    assert events == []
+    queue.put(PRIORITY_TEXT, lambda: None)   # 6 of 8: past the high-water mark
+    queue.put(PRIORITY_TEXT, lambda: None)
+    assert events == [(True, 6)]
+    ready.held.clear()
+    assert queue.drain(5)
+    assert events == [(True, 6), (False, 2)]
+    queue.close()
+
+
+def test_follow_up_runs_next_in_its_class(ran):
+    queue = SendQueue()
+    release = _blocker(queue)
+
+    def first_chunk():
+        ran.append("chunk1")
+        queue.put(PRIORITY_TEXT, _job(ran, "typed"))   # typed while the message goes out
+        return _job(ran, "chunk2", _job(ran, "chunk3"))
+    queue.put(PRIORITY_BULK, first_chunk)
+    queue.put(PRIORITY_BULK, _job(ran, "next message"))
+    release.set()
+    assert queue.drain(5)
+    assert ran == ["chunk1", "typed", "chunk2", "chunk3", "next message"]
+    queue.close()
+
+
+def test_failing_job_is_reported_and_the_writer_goes_on(ran):
+    errors = []
+
+    def fail():
+        raise OSError("stream gone")
+    queue = SendQueue(on_error=errors.append)
+    queue.put(PRIORITY_TEXT, fail)
+    queue.put(PRIORITY_TEXT, _job(ran, "after"))
+    assert queue.drain(5)
+    assert [str(e) for e in errors] == ["stream gone"]
+    assert ran == ["after"]
+    queue.close()
+
+
+def test_closed_queue_refuses_jobs():
+    queue = SendQueue()
+    queue.close()
+    with pytest.raises(ConnectionError):
+        queue.put(PRIORITY_TEXT, lambda: None)
@@ -0,0 +1,127 @@
+"""SymmetricSession: both directions, the ratchet's skip window, replays and tampering."""
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from src.symmetric import (
+    MAX_SKIP, MODES, EphemeralKey, SymmetricSession, _HEADER, _step, available_modes, is_sealed,
+)
+
+SESSION = bytes(range(16))
+
+
+def _pair(mode: str = "x25519-aes256gcm", session_b: bytes = SESSION, modes=None):
+    a, b = EphemeralKey(), EphemeralKey()
+    return (SymmetricSession(mode, a, b.public, SESSION, modes),
+            SymmetricSession(mode, b, a.public, session_b, modes))
+
+
+@pytest.mark.parametrize("mode", available_modes())
+def test_round_trip_both_ways(mode):
+    alice, bob = _pair(mode)
+    for i in range(3):
+        sealed = alice.seal(f"to bob {i}".encode())
+        assert is_sealed(sealed) and sealed[0] == MODES[mode]
+        assert bob.open(sealed) == f"to bob {i}".encode()
+        assert alice.open(bob.seal(f"to alice {i}".encode())) == f"to alice {i}".encode()
+    assert alice.stats == bob.stats == {"sealed": 3, "opened": 3, "rejected": 0}
+
+
+def test_own_payloads_do_not_open():
+    alice, _ = _pair()
+    with pytest.raises(ValueError):
+        alice.open(alice.seal(b"echoed back"))
+
+
+def test_out_of_order_within_max_skip():
+    alice, bob = _pair()
+    sealed = [alice.seal(f"m{i}".encode()) for i in range(MAX_SKIP + 1)]
+    # The last one first: every key before it is kept for later
+    assert bob.open(sealed[-1]) == f"m{MAX_SKIP}".encode()
+    for i in reversed(range(MAX_SKIP)):
+        assert bob.open(sealed[i]) == f"m{i}".encode()
+
+
+def test_too_far_ahead_is_rejected():
+    alice, bob = _pair()
+    sealed = [alice.seal(f"m{i}".encode()) for i in range(MAX_SKIP + 2)]
+    with pytest.raises(ValueError, match="too far ahead"):
+        bob.open(sealed[-1])
+    assert bob.open(sealed[0]) == b"m0"   # the chain did not move
+    assert bob.open(sealed[-1]) == f"m{MAX_SKIP + 1}".encode()
+
+
+def test_skipped_keys_are_bounded():
+    alice, bob = _pair()
+    sealed = [alice.seal(f"m{i}".encode()) for i in range(2 * MAX_SKIP + 2)]
+    bob.open(sealed[MAX_SKIP])
+    bob.open(sealed[2 * MAX_SKIP + 1])   # skips MAX_SKIP more: the oldest keys go
+    with pytest.raises(ValueError, match="expired"):
+        bob.open(sealed[0])
+    assert bob.open(sealed[2 * MAX_SKIP]) == f"m{2 * MAX_SKIP}".encode()
+
+
+def test_replay_is_rejected():
+    alice, bob = _pair()
+    first, second = alice.seal(b"once"), alice.seal(b"twice")
+    assert bob.open(second) == b"twice"
+    assert bob.open(first) == b"once"   # late, but its key was kept
+    for replay in (first, second):
+        with pytest.raises(ValueError, match="Replayed"):
+            bob.open(replay)
+
+
+def _tampered(sealed: bytes, index: int) -> bytes:
+    out = bytearray(sealed)
+    out[index] ^= 1
+    return bytes(out)
+
+
+def test_modified_payload_fails_and_moves_nothing():
+    alice, bob = _pair(modes=available_modes())
+    sealed = alice.seal(b"intact")
+    other_mode = next(m for m in MODES.values() if m != sealed[0])
+    for forged in (
+        _tampered(sealed, _HEADER.size - 1),   # the counter
+        bytes([other_mode]) + sealed[1:],      # the mode byte
+        _tampered(sealed, _HEADER.size),       # the ciphertext
+        _tampered(sealed, len(sealed) - 1),    # the tag
+    ):
+        with pytest.raises(ValueError, match="authentication"):
+            bob.open(forged)
+    assert bob.stats["rejected"] == 4
+    assert bob.open(sealed) == b"intact"
+
+
+def test_mode_that_was_not_negotiated_is_refused():
+    alice, bob = _pair()
+    sealed = alice.seal(b"x")
+    other_mode = next(m for m in MODES.values() if m != sealed[0])
+    with pytest.raises(ValueError, match="not negotiated"):
+        bob.open(bytes([other_mode]) + sealed[1:])
+
+
+def test_another_session_id_fails():
+    alice, bob = _pair(session_b=bytes(16))   # other chain keys
+    with pytest.raises(ValueError, match="authentication"):
+        bob.open(alice.seal(b"bound to the session"))
+    alice, bob = _pair()
+    bob.session_id = bytes(16)   # same keys, other associated data
+    with pytest.raises(ValueError, match="authentication"):
+        bob.open(alice.seal(b"bound to the session"))
+
+
+def test_every_message_gets_its_own_key_and_nonce():
+    alice, bob = _pair()
+    keys, chain = [], alice._send_chain
+    for _ in range(50):
+        key, chain = _step(chain)
+        keys.append(key)
+    assert len(set(keys)) == 50
+    sealed = [alice.seal(b"same text") for _ in range(50)]
+    assert [_HEADER.unpack_from(s)[1] for s in sealed] == list(range(50))   # the nonces
+    assert len({s[_HEADER.size:] for s in sealed}) == 50
+    # Counter 0 both ways: the directions have their own chains
+    alice, bob = _pair()
+    assert alice.seal(b"x")[_HEADER.size:] != bob.seal(b"x")[_HEADER.size:]